@@ -5,7 +5,66 @@ cimport numpy as np
 ctypedef unsigned char CHAR
 
 
+# Growable native array
+cdef struct vec_t:
+	char* data
+	np.intp_t size
+	np.intp_t capacity
+	np.intp_t itemsize
+
+# Kinds of k-mer sink
+cdef enum:
+	SINK_INDICES = 0
+	SINK_DENSE = 1
+	SINK_BITSET = 2
+	SINK_COUNTS = 3
+	SINK_COUNT_TABLE = 4
+
+# Destination for k-mer indices found by scanner
+cdef struct sink_t:
+	int kind
+	# SINK_INDICES
+	vec_t indices
+	bint track_positions
+	vec_t positions
+	vec_t reverse
+	np.intp_t dedup_at  # Sort and remove duplicates when this many indices are buffered (0 = never)
+	int key_bits        # Maximum number of significant bits in indices
+	# SINK_DENSE, SINK_COUNTS
+	np.uint8_t* dense
+	np.intp_t dense_len
+	# SINK_BITSET
+	np.uint64_t* bits
+	np.intp_t bits_len
+	# SINK_COUNT_TABLE (open addressing with linear probing, slots with count 0 are empty)
+	np.uint64_t* table_keys
+	np.uint8_t* table_counts
+	np.intp_t table_cap  # Power of 2
+	np.intp_t table_size
+
+# Parameters for a single k-mer spec for c_scan_encoded()
+cdef struct scan_spec_t:
+	int p
+	int k
+	np.uint64_t prefix_code
+	int prefix_shift
+	int kmer_shift
+	int inv_shift
+	# One past the index of the last spec in group sharing this spec's prefix as a stem
+	int group_end
+	sink_t* sink
+
+
 cpdef np.uint64_t kmer_to_index(const CHAR[:]) nogil except? 0
 cpdef np.uint64_t kmer_to_index_rc(const CHAR[:]) nogil except? 0
 cdef void c_index_to_kmer(np.uint64_t, CHAR[:]) nogil
 cdef void c_revcomp(const CHAR[:], CHAR[:]) nogil
+cdef int vec_reserve(vec_t*, np.intp_t) nogil
+cdef int c_sort_unique(vec_t*, int) nogil
+cdef bint c_scan_bytes(const CHAR*, np.intp_t, const CHAR*, const CHAR*, int, int, sink_t*) nogil
+cdef bint c_scan_encoded(const CHAR*, np.intp_t, scan_spec_t*, int, bint) nogil
+
+
+cdef class KmerSink:
+	cdef sink_t sink
+	cdef int check_k(self, int k) except -1
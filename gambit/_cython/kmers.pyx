@@ -2,6 +2,36 @@
 
 """Cython module for working with DNA sequences and k-mers."""
 
+from libc.stdlib cimport malloc, realloc, free
+from libc.string cimport memcpy, memset
+from cython.parallel import prange, threadid
+
+cdef extern from *:
+	int popcount64 "__builtin_popcountll"(unsigned long long) nogil
+	int ctz64 "__builtin_ctzll"(unsigned long long) nogil
+
+import numpy as np
+
+
+# Maps ASCII bytes to 2-bit nucleotide codes (case-insensitive), invalid nucleotides map to 4
+cdef np.uint8_t NUC_CODES[256]
+
+for _i in range(256):
+	NUC_CODES[_i] = 4
+for _i, _nuc in enumerate(b'ACGT'):
+	NUC_CODES[_nuc] = _i
+	NUC_CODES[_nuc | 0x20] = _i
+del _i, _nuc
+
+# Whitespace characters which may be skipped in sequence data (spaces, tabs and line breaks)
+cdef np.uint8_t IS_SPACE[256]
+
+for _i in range(256):
+	IS_SPACE[_i] = 0
+for _c in b' \t\r\n':
+	IS_SPACE[_c] = 1
+del _i, _c
+
 
 cpdef np.uint64_t kmer_to_index(const CHAR[:] kmer) nogil except? 0:
 	"""kmer_to_index(kmer)
@@ -162,3 +192,1249 @@ cdef void c_revcomp(const CHAR[:] seq, CHAR[:] out) nogil:
 			nuc2 =  nuc
 
 		out[n - i - 1] = nuc2
+
+
+################################################################################
+# K-mer scanning
+################################################################################
+
+cdef int vec_reserve(vec_t* vec, np.intp_t n) nogil:
+	"""Ensure a growable vector has capacity for at least n more elements.
+
+	Returns 0 on success, -1 if memory could not be allocated.
+	"""
+	cdef:
+		np.intp_t capacity
+		void* data
+
+	if vec.size + n <= vec.capacity:
+		return 0
+
+	capacity = max(vec.capacity * 2, vec.size + n, 1024)
+	data = realloc(vec.data, capacity * vec.itemsize)
+	if data == NULL:
+		return -1
+
+	vec.data = <char*>data
+	vec.capacity = capacity
+	return 0
+
+
+cdef void vec_free(vec_t* vec) nogil:
+	free(vec.data)
+	vec.data = NULL
+	vec.size = vec.capacity = 0
+
+
+cdef inline np.intp_t table_find(const np.uint64_t* keys, const np.uint8_t* counts, np.intp_t cap,
+                                 np.uint64_t key) nogil:
+	"""Find the slot containing a key in a count table, or the empty slot where it would be inserted."""
+	cdef np.uint64_t h = key * <np.uint64_t>0x9E3779B97F4A7C15
+	cdef np.intp_t slot = <np.intp_t>((h ^ (h >> 32)) & <np.uint64_t>(cap - 1))
+
+	while counts[slot] != 0 and keys[slot] != key:
+		slot = (slot + 1) & (cap - 1)
+
+	return slot
+
+
+cdef int table_reserve(sink_t* sink, np.intp_t n) nogil:
+	"""Ensure a count table has room for n more keys while staying at most half full.
+
+	Returns 0 on success, -1 if memory could not be allocated.
+	"""
+	cdef:
+		np.intp_t cap, i, slot
+		np.uint64_t* keys
+		np.uint8_t* counts
+
+	if 2 * (sink.table_size + n) <= sink.table_cap:
+		return 0
+
+	cap = max(sink.table_cap, 1024)
+	while 2 * (sink.table_size + n) > cap:
+		cap *= 2
+
+	keys = <np.uint64_t*>malloc(cap * sizeof(np.uint64_t))
+	counts = <np.uint8_t*>malloc(cap * sizeof(np.uint8_t))
+	if keys == NULL or counts == NULL:
+		free(keys)
+		free(counts)
+		return -1
+	memset(counts, 0, cap * sizeof(np.uint8_t))
+
+	for i in range(sink.table_cap):
+		if sink.table_counts[i] != 0:
+			slot = table_find(keys, counts, cap, sink.table_keys[i])
+			keys[slot] = sink.table_keys[i]
+			counts[slot] = sink.table_counts[i]
+
+	free(sink.table_keys)
+	free(sink.table_counts)
+	sink.table_keys = keys
+	sink.table_counts = counts
+	sink.table_cap = cap
+	return 0
+
+
+cdef bint table_remove(sink_t* sink, np.uint64_t key) nogil:
+	"""Remove a key from a count table, returning False if it was not present.
+
+	Uses backward shift deletion, so no tombstones are needed.
+	"""
+	cdef:
+		np.intp_t mask = sink.table_cap - 1
+		np.intp_t hole, slot, home
+		np.uint64_t h
+
+	if sink.table_size == 0:
+		return False
+
+	hole = table_find(sink.table_keys, sink.table_counts, sink.table_cap, key)
+	if sink.table_counts[hole] == 0:
+		return False
+
+	slot = hole
+	while True:
+		slot = (slot + 1) & mask
+		if sink.table_counts[slot] == 0:
+			break
+		h = sink.table_keys[slot] * <np.uint64_t>0x9E3779B97F4A7C15
+		home = <np.intp_t>((h ^ (h >> 32)) & <np.uint64_t>mask)
+		# Move entry into the hole unless its home slot lies cyclically in (hole, slot]
+		if ((slot - home) & mask) >= ((slot - hole) & mask):
+			sink.table_keys[hole] = sink.table_keys[slot]
+			sink.table_counts[hole] = sink.table_counts[slot]
+			hole = slot
+
+	sink.table_counts[hole] = 0
+	sink.table_size -= 1
+	return True
+
+
+cdef inline bint sink_emit(sink_t* sink, np.uint64_t index, np.intp_t pos, bint reverse) nogil:
+	"""Send a single k-mer found by the scanner to a sink.
+
+	Returns False if memory could not be allocated.
+	"""
+	cdef np.intp_t i
+
+	if sink.kind == SINK_BITSET:
+		sink.bits[index >> 6] |= (<np.uint64_t>1) << (index & 63)
+		return True
+
+	if sink.kind == SINK_DENSE:
+		sink.dense[index] = 1
+		return True
+
+	if sink.kind == SINK_COUNTS:
+		if sink.dense[index] < 255:
+			sink.dense[index] += 1
+		return True
+
+	if sink.kind == SINK_COUNT_TABLE:
+		if table_reserve(sink, 1) < 0:
+			return False
+		i = table_find(sink.table_keys, sink.table_counts, sink.table_cap, index)
+		if sink.table_counts[i] == 0:
+			sink.table_keys[i] = index
+			sink.table_size += 1
+		if sink.table_counts[i] < 255:
+			sink.table_counts[i] += 1
+		return True
+
+	i = sink.indices.size
+	if sink.dedup_at > 0 and i >= sink.dedup_at:
+		if c_sort_unique(&sink.indices, sink.key_bits) < 0:
+			return False
+		i = sink.indices.size
+		# Avoid sorting again too soon if there were few duplicates
+		if i > sink.dedup_at // 2:
+			sink.dedup_at = 2 * i
+
+	if vec_reserve(&sink.indices, 1) < 0:
+		return False
+	(<np.uint64_t*>sink.indices.data)[i] = index
+	sink.indices.size += 1
+
+	if sink.track_positions:
+		if vec_reserve(&sink.positions, 1) < 0 or vec_reserve(&sink.reverse, 1) < 0:
+			return False
+		(<np.intp_t*>sink.positions.data)[i] = pos
+		(<np.uint8_t*>sink.reverse.data)[i] = reverse
+		sink.positions.size += 1
+		sink.reverse.size += 1
+
+	return True
+
+
+cdef class KmerSink:
+	"""Base class for native destinations of k-mer indices found by :func:`scan_kmers`.
+
+	Not instantiated directly, use one of the subclasses.
+	"""
+
+	def __cinit__(self, *args, **kwargs):
+		self.sink.indices.itemsize = sizeof(np.uint64_t)
+		self.sink.positions.itemsize = sizeof(np.intp_t)
+		self.sink.reverse.itemsize = sizeof(np.uint8_t)
+
+	def __dealloc__(self):
+		vec_free(&self.sink.indices)
+		vec_free(&self.sink.positions)
+		vec_free(&self.sink.reverse)
+		free(self.sink.table_keys)
+		free(self.sink.table_counts)
+
+	cdef int check_k(self, int k) except -1:
+		"""Check the sink can accept indices of k-mers of the given length."""
+		return 0
+
+
+cdef class IndexBuffer(KmerSink):
+	"""Sink which appends found k-mer indices to a growable native buffer.
+
+	Indices are stored in the order they are found and may contain duplicates, unless
+	:meth:`sort_unique` is called or a ``dedup_threshold`` is given.
+
+	Parameters
+	----------
+	positions : bool
+		Also record the position and strand of each match.
+	dedup_threshold : Optional[int]
+		If not None, sort the buffer and remove duplicates whenever it contains this many indices.
+		This bounds the memory used when many duplicate k-mers are found. Incompatible with
+		``positions``.
+	key_bits : int
+		Maximum number of significant bits in the indices to be stored (``2 * k``). Used to speed
+		up sorting.
+	"""
+
+	def __init__(self, bint positions=False, dedup_threshold=None, int key_bits=64):
+		if positions and dedup_threshold is not None:
+			raise ValueError('dedup_threshold cannot be used with positions=True')
+		if not 1 <= key_bits <= 64:
+			raise ValueError('key_bits must be between 1 and 64')
+
+		self.sink.kind = SINK_INDICES
+		self.sink.track_positions = positions
+		self.sink.dedup_at = 0 if dedup_threshold is None else max(<np.intp_t>dedup_threshold, 1)
+		self.sink.key_bits = key_bits
+
+	def __len__(self):
+		return self.sink.indices.size
+
+	def clear(self):
+		"""Remove all indices from the buffer (capacity is retained)."""
+		self.sink.indices.size = 0
+		self.sink.positions.size = 0
+		self.sink.reverse.size = 0
+
+	def extend(self, const np.uint64_t[:] indices):
+		"""extend(indices: numpy.ndarray)
+
+		Append contents of a ``uint64`` array to the buffer.
+		"""
+		cdef:
+			np.intp_t i
+			bint ok = True
+
+		if self.sink.track_positions:
+			raise RuntimeError('Cannot add indices without positions to buffer created with positions=True')
+
+		with nogil:
+			for i in range(indices.shape[0]):
+				if not sink_emit(&self.sink, indices[i], 0, False):
+					ok = False
+					break
+
+		if not ok:
+			raise MemoryError()
+
+	def sort_unique(self):
+		"""Sort the contents of the buffer in place and remove duplicates."""
+		if self.sink.track_positions:
+			raise RuntimeError('Cannot sort buffer created with positions=True')
+
+		cdef int result
+		with nogil:
+			result = c_sort_unique(&self.sink.indices, self.sink.key_bits)
+		if result < 0:
+			raise MemoryError()
+
+	def indices(self, dtype=np.uint64):
+		"""indices(dtype=numpy.uint64) -> numpy.ndarray
+
+		Get copy of the buffer contents as an array.
+		"""
+		cdef np.intp_t n = self.sink.indices.size
+		if n == 0:
+			return np.empty(0, dtype=dtype)
+		cdef np.uint64_t[:] view = <np.uint64_t[:n]><np.uint64_t*>self.sink.indices.data
+		return np.array(view, dtype=dtype)
+
+	def positions(self):
+		"""positions() -> Tuple[numpy.ndarray, numpy.ndarray]
+
+		Get copies of the recorded match positions and strands.
+
+		Positions follow the convention of :attr:`gambit.kmers.KmerMatch.pos`. Only available if
+		the instance was created with ``positions=True``.
+
+		Returns
+		-------
+		Tuple[numpy.ndarray, numpy.ndarray]
+			``(positions, reverse)`` tuple of ``intp`` and ``bool`` arrays.
+		"""
+		if not self.sink.track_positions:
+			raise RuntimeError('Buffer was not created with positions=True')
+
+		cdef np.intp_t n = self.sink.positions.size
+		pos = np.empty(n, dtype=np.intp)
+		rev = np.empty(n, dtype=np.uint8)
+		cdef np.intp_t[:] pos_view = pos
+		cdef np.uint8_t[:] rev_view = rev
+		if n > 0:
+			memcpy(&pos_view[0], self.sink.positions.data, n * sizeof(np.intp_t))
+			memcpy(&rev_view[0], self.sink.reverse.data, n * sizeof(np.uint8_t))
+		return pos, rev.view(bool)
+
+
+cdef class DenseSink(KmerSink):
+	"""Sink which marks found k-mers in a dense array of flags, indexed by k-mer index.
+
+	Parameters
+	----------
+	array : numpy.ndarray
+		Contiguous 1-dimensional array of ``uint8`` or ``bool`` to write to. Its length must be at
+		least ``4 ** k``. The sink keeps a reference to the array and writes into it directly.
+	"""
+	cdef readonly object array
+
+	def __init__(self, array):
+		cdef np.uint8_t[::1] view = array.view(np.uint8)
+		self.array = array
+		self.sink.kind = SINK_DENSE
+		self.sink.dense = &view[0] if view.shape[0] > 0 else NULL
+		self.sink.dense_len = view.shape[0]
+
+	cdef int check_k(self, int k) except -1:
+		if k > 31 or (<np.intp_t>1 << (2 * k)) > self.sink.dense_len:
+			raise ValueError(f'Array is too small to hold indices for k={k}')
+		return 0
+
+
+cdef class BitsetSink(KmerSink):
+	"""Sink which sets the bits corresponding to found k-mers in a bit set.
+
+	The bit for k-mer index ``i`` is bit ``i % 64`` of element ``i // 64`` of the array.
+
+	Parameters
+	----------
+	bits : numpy.ndarray
+		Contiguous 1-dimensional ``uint64`` array to write to. Must contain at least ``4 ** k`` bits.
+		The sink keeps a reference to the array and writes into it directly.
+	"""
+	cdef readonly object bits
+
+	def __init__(self, bits):
+		cdef np.uint64_t[::1] view = bits
+		self.bits = bits
+		self.sink.kind = SINK_BITSET
+		self.sink.bits = &view[0] if view.shape[0] > 0 else NULL
+		self.sink.bits_len = view.shape[0]
+
+	cdef int check_k(self, int k) except -1:
+		if k > 31 or (<np.intp_t>1 << (2 * k)) > self.sink.bits_len * 64:
+			raise ValueError(f'Bit set is too small to hold indices for k={k}')
+		return 0
+
+
+cdef class CountSink(KmerSink):
+	"""Sink which counts occurrences of found k-mers in a dense array indexed by k-mer index.
+
+	Counts are stored as ``uint8`` and saturate at 255 rather than overflowing.
+
+	Parameters
+	----------
+	counts : numpy.ndarray
+		Contiguous 1-dimensional ``uint8`` array to write to. Its length must be at least ``4 ** k``.
+		The sink keeps a reference to the array and writes into it directly.
+	"""
+	cdef readonly object counts
+
+	def __init__(self, counts):
+		cdef np.uint8_t[::1] view = counts
+		self.counts = counts
+		self.sink.kind = SINK_COUNTS
+		self.sink.dense = &view[0] if view.shape[0] > 0 else NULL
+		self.sink.dense_len = view.shape[0]
+
+	cdef int check_k(self, int k) except -1:
+		if k > 31 or (<np.intp_t>1 << (2 * k)) > self.sink.dense_len:
+			raise ValueError(f'Array is too small to hold counts for k={k}')
+		return 0
+
+	def add(self, const np.uint64_t[:] indices):
+		"""add(indices: numpy.ndarray)
+
+		Increment the counts of k-mers by index (given as a ``uint64`` array).
+		"""
+		cdef:
+			np.intp_t i
+			np.uint64_t idx
+
+		with nogil:
+			for i in range(indices.shape[0]):
+				idx = indices[i]
+				if idx >= <np.uint64_t>self.sink.dense_len:
+					with gil:
+						raise IndexError(f'Index {idx} out of range')
+				sink_emit(&self.sink, idx, 0, False)
+
+
+cdef class CountTable(KmerSink):
+	"""Sink which counts occurrences of found k-mers in a native hash table.
+
+	Memory use is proportional to the number of distinct k-mers found (about 18 bytes each) rather
+	than the number of possible k-mers, so this is suitable for any value of ``k``. Counts saturate
+	at 255.
+	"""
+
+	def __init__(self):
+		self.sink.kind = SINK_COUNT_TABLE
+
+	def __len__(self):
+		return self.sink.table_size
+
+	def add(self, const np.uint64_t[:] indices):
+		"""add(indices: numpy.ndarray)
+
+		Increment the counts of k-mers by index (given as a ``uint64`` array).
+		"""
+		cdef:
+			np.intp_t i
+			bint ok = True
+
+		with nogil:
+			for i in range(indices.shape[0]):
+				if not sink_emit(&self.sink, indices[i], 0, False):
+					ok = False
+					break
+
+		if not ok:
+			raise MemoryError()
+
+	def get(self, np.uint64_t index):
+		"""get(index: int) -> int
+
+		Get the count of a single k-mer.
+		"""
+		if self.sink.table_size == 0:
+			return 0
+		cdef np.intp_t slot = table_find(self.sink.table_keys, self.sink.table_counts, self.sink.table_cap, index)
+		return self.sink.table_counts[slot]
+
+	def remove(self, np.uint64_t index):
+		"""remove(index: int) -> bool
+
+		Remove a k-mer from the table, returning False if it was not present.
+		"""
+		return table_remove(&self.sink, index)
+
+	def clear(self):
+		"""Remove all k-mers from the table (capacity is retained)."""
+		if self.sink.table_cap > 0:
+			memset(self.sink.table_counts, 0, self.sink.table_cap * sizeof(np.uint8_t))
+		self.sink.table_size = 0
+
+	def items(self, int min_count=1, dtype=np.uint64):
+		"""items(min_count=1, dtype=numpy.uint64) -> Tuple[numpy.ndarray, numpy.ndarray]
+
+		Get the k-mers in the table with at least the given count.
+
+		Returns
+		-------
+		Tuple[numpy.ndarray, numpy.ndarray]
+			``(indices, counts)`` tuple of arrays, sorted by index.
+		"""
+		cdef:
+			np.intp_t i, j = 0
+			np.uint8_t c
+			np.uint8_t threshold = max(min(min_count, 255), 1)
+
+		keys = np.empty(self.sink.table_size, dtype=np.uint64)
+		counts = np.empty(self.sink.table_size, dtype=np.uint8)
+		cdef np.uint64_t[:] keys_view = keys
+		cdef np.uint8_t[:] counts_view = counts
+
+		with nogil:
+			for i in range(self.sink.table_cap):
+				c = self.sink.table_counts[i]
+				if c >= threshold:
+					keys_view[j] = self.sink.table_keys[i]
+					counts_view[j] = c
+					j += 1
+
+		order = np.argsort(keys[:j])
+		return keys[order].astype(dtype), counts[order]
+
+
+cdef int c_sort_unique(vec_t* vec, int key_bits) nogil:
+	"""Sort a vector of uint64 values in place and remove duplicates.
+
+	Uses a least significant digit radix sort on the lowest ``key_bits`` bits (higher bits must be
+	zero), 8 bits at a time.
+
+	Returns 0 on success, -1 if memory could not be allocated.
+	"""
+	cdef:
+		np.intp_t n = vec.size
+		np.intp_t i, j
+		np.uint64_t* data = <np.uint64_t*>vec.data
+		np.uint64_t* src = data
+		np.uint64_t* dst
+		np.uint64_t* tmp
+		np.intp_t counts[256]
+		np.intp_t total, c
+		int shift
+
+	if n <= 1:
+		return 0
+
+	tmp = <np.uint64_t*>malloc(n * sizeof(np.uint64_t))
+	if tmp == NULL:
+		return -1
+	dst = tmp
+
+	for shift in range(0, key_bits, 8):
+		memset(counts, 0, sizeof(counts))
+		for i in range(n):
+			counts[(src[i] >> shift) & 0xFF] += 1
+
+		# Skip pass if all values have the same digit
+		if counts[(src[0] >> shift) & 0xFF] == n:
+			continue
+
+		total = 0
+		for i in range(256):
+			c = counts[i]
+			counts[i] = total
+			total += c
+
+		for i in range(n):
+			c = (src[i] >> shift) & 0xFF
+			dst[counts[c]] = src[i]
+			counts[c] += 1
+
+		src, dst = dst, src
+
+	if src != data:
+		memcpy(data, src, n * sizeof(np.uint64_t))
+	free(tmp)
+
+	# Remove duplicates
+	j = 0
+	for i in range(1, n):
+		if data[i] != data[j]:
+			j += 1
+			data[j] = data[i]
+	vec.size = j + 1
+
+	return 0
+
+
+cdef inline bint c_kmer_index(const CHAR* kmer, int k, np.uint64_t* out) nogil:
+	"""Get index of k-mer, returning False if it contains an invalid nucleotide."""
+	cdef:
+		np.uint64_t idx = 0
+		np.uint8_t code
+		int i
+
+	for i in range(k):
+		code = NUC_CODES[kmer[i]]
+		if code > 3:
+			return False
+		idx = (idx << 2) | code
+
+	out[0] = idx
+	return True
+
+
+cdef inline bint c_kmer_index_rc(const CHAR* kmer, int k, np.uint64_t* out) nogil:
+	"""Get index of k-mer's reverse complement, returning False if it contains an invalid nucleotide."""
+	cdef:
+		np.uint64_t idx = 0
+		np.uint8_t code
+		int i
+
+	for i in range(k - 1, -1, -1):
+		code = NUC_CODES[kmer[i]]
+		if code > 3:
+			return False
+		idx = (idx << 2) | (3 - code)
+
+	out[0] = idx
+	return True
+
+
+cdef inline bint c_prefix_match(const CHAR* seq, const CHAR* prefix, int p) nogil:
+	"""Check for (upper case) prefix match, case-insensitive."""
+	cdef int i
+	for i in range(p):
+		if (seq[i] & 0b11011111) != prefix[i]:
+			return False
+	return True
+
+
+cdef bint c_scan_bytes(const CHAR* seq, np.intp_t n, const CHAR* prefix, const CHAR* prefix_rc,
+                       int p, int k, sink_t* sink) nogil:
+	"""Find k-mers on both strands of a sequence in a single pass and send them to a sink.
+
+	Matches whose k-mer contains an invalid nucleotide are skipped.
+
+	Returns False if memory could not be allocated.
+	"""
+	cdef:
+		np.intp_t i
+		np.uint64_t idx
+
+	for i in range(n - p - k + 1):
+		# Forward - prefix at i followed by k-mer
+		if c_prefix_match(seq + i, prefix, p) and c_kmer_index(seq + i + p, k, &idx):
+			if not sink_emit(sink, idx, i, False):
+				return False
+
+		# Reverse - k-mer at i followed by reverse complement of prefix
+		if c_prefix_match(seq + i + k, prefix_rc, p) and c_kmer_index_rc(seq + i, k, &idx):
+			if not sink_emit(sink, idx, i + p + k - 1, True):
+				return False
+
+	return True
+
+
+cdef bint c_scan_encoded(const CHAR* seq, np.intp_t n, scan_spec_t* specs, int nspecs, bint skip_space) nogil:
+	"""Find k-mers on both strands of a sequence using 2-bit nucleotide codes.
+
+	Each nucleotide is encoded exactly once and shifted into two 64-bit registers holding the 2-bit
+	codes of the last 32 nucleotides read. ``fwd`` is read "forwards" with its oldest nucleotide in
+	the highest bits, so a forward match starting 31 positions back has the prefix in the top ``2p``
+	bits followed by the k-mer. ``rev`` holds the complements of the same nucleotides in reverse
+	order, so it reads as the reverse complement of the sequence ending at the current position and
+	a reverse match ending here has the same layout. K-mer indices are then extracted with shifts.
+	Invalid nucleotides are tracked with a bit mask for each register.
+
+	Any number of k-mer specs are searched for in the same pass. Because the prefix is always
+	aligned to the top of the registers, specs whose prefixes start with the prefix of the first
+	spec in their group (see :c:member:`scan_spec_t.group_end`) are only checked when it matches.
+
+	Requires ``1 <= p`` and ``p + k <= 32`` for all specs. Finds exactly the same matches as
+	:c:func:`c_scan_bytes`.
+
+	If ``skip_space`` is true, whitespace characters (e.g. the line breaks of sequence data in a
+	FASTA file) are skipped entirely, as if they had been removed from the sequence first. Positions
+	sent to the sinks are then also relative to the sequence without whitespace.
+
+	Returns False if memory could not be allocated.
+	"""
+	cdef:
+		np.uint64_t fwd = 0, rev = 0
+		np.uint32_t fwd_inv = 0xFFFFFFFF, rev_inv = 0xFFFFFFFF
+		np.uint64_t code
+		np.intp_t j, pos = 0
+		int g, i
+		bint fwd_stem, rev_stem
+		scan_spec_t* spec
+
+	for j in range(n + 31):
+		if j < n:
+			if skip_space and IS_SPACE[seq[j]]:
+				continue
+			code = NUC_CODES[seq[j]]
+		else:
+			code = 4
+
+		fwd = (fwd << 2) | (code & 3)
+		rev = (rev >> 2) | ((3 - (code & 3)) << 62)
+		fwd_inv = (fwd_inv << 1) | (code >> 2)
+		rev_inv = (rev_inv >> 1) | ((code >> 2) << 31)
+
+		g = 0
+		while g < nspecs:
+			spec = &specs[g]
+			fwd_stem = (fwd >> spec.prefix_shift) == spec.prefix_code
+			rev_stem = (rev >> spec.prefix_shift) == spec.prefix_code
+
+			if fwd_stem or rev_stem:
+				for i in range(g, spec.group_end):
+					if not c_check_match(&specs[i], fwd, fwd_inv, fwd_stem, pos - 31, False):
+						return False
+					if not c_check_match(&specs[i], rev, rev_inv, rev_stem, pos, True):
+						return False
+
+			g = spec.group_end
+
+		pos += 1
+
+	return True
+
+
+cdef inline bint c_check_match(scan_spec_t* spec, np.uint64_t reg, np.uint32_t inv, bint stem,
+                               np.intp_t pos, bint reverse) nogil:
+	"""Check a register of c_scan_encoded for a match to a single spec and emit it."""
+	if stem and (reg >> spec.prefix_shift) == spec.prefix_code and (inv >> spec.inv_shift) == 0:
+		return sink_emit(spec.sink, (reg << (2 * spec.p)) >> spec.kmer_shift, pos, reverse)
+	return True
+
+
+cdef int init_scan_spec(scan_spec_t* spec, const CHAR[:] prefix, int k, sink_t* sink) except -1:
+	spec.p = prefix.shape[0]
+	spec.k = k
+	spec.prefix_code = kmer_to_index(prefix)
+	spec.prefix_shift = 64 - 2 * spec.p
+	spec.kmer_shift = 64 - 2 * k
+	spec.inv_shift = 32 - spec.p - k
+	spec.group_end = 0
+	spec.sink = sink
+	return 0
+
+
+def scan_kmers(const CHAR[:] seq, const CHAR[:] prefix, int k, KmerSink sink, *, bint encoded=True,
+               bint skip_whitespace=False):
+	"""scan_kmers(seq: bytes, prefix: bytes, k: int, sink: KmerSink, *, encoded: bool = True, skip_whitespace: bool = False)
+
+	Find k-mers with the given prefix in both strands of a sequence and send their indices to a sink.
+
+	Runs without the GIL. Matches whose k-mer contains an invalid nucleotide code are skipped.
+
+	Parameters
+	----------
+	seq : bytes
+		ASCII-encoded nucleotide sequence. Case does not matter.
+	prefix : bytes
+		Upper-case k-mer prefix.
+	k : int
+		Number of nucleotides after prefix.
+	sink : .KmerSink
+		Sink to send k-mer indices to.
+	encoded : bool
+		Use the faster scanner based on 2-bit nucleotide codes if the prefix is non-empty and
+		its length plus ``k`` is at most 32, otherwise compare bytes directly. Results are identical.
+	skip_whitespace : bool
+		Ignore whitespace (spaces, tabs and line breaks) in the sequence, so that e.g. the raw
+		sequence lines of a FASTA record can be searched without joining them first. Only the
+		encoded scanner does this without making a copy of the sequence.
+	"""
+	scan_kmers_multi(seq, [(prefix, k)], [sink], encoded=encoded, skip_whitespace=skip_whitespace)
+
+
+def scan_kmers_multi(const CHAR[:] seq, specs, sinks, *, bint encoded=True, bint skip_whitespace=False):
+	"""scan_kmers_multi(seq: bytes, specs: Sequence[Tuple[bytes, int]], sinks: Sequence[KmerSink], *, encoded: bool = True, skip_whitespace: bool = False)
+
+	Search for k-mers with several different prefixes and/or values of k in a single pass.
+
+	Like :func:`.scan_kmers` but takes a sequence of ``(prefix, k)`` pairs and a sink for each. All
+	specs eligible for the encoded scanner are searched for in a single pass over the sequence.
+	Specs with prefixes that start with the prefix of another spec share its prefix search work.
+	"""
+	cdef:
+		np.intp_t n = seq.shape[0]
+		int i, g, nspecs
+		scan_spec_t* c_specs
+		bint ok = True
+		KmerSink sink
+		const CHAR[:] byte_seq
+
+	specs = [(bytes(prefix), k) for prefix, k in specs]
+	sinks = list(sinks)
+	if len(specs) != len(sinks):
+		raise ValueError('Number of specs and sinks must match')
+
+	for (prefix, k), sink in zip(specs, sinks):
+		if k < 1 or k > 32:
+			raise ValueError('k must be between 1 and 32')
+		sink.check_k(k)
+
+	# Specs for encoded scanner, sorted by prefix so that ones starting with the same stem are adjacent
+	if encoded:
+		order = sorted(
+			(i for i, (prefix, k) in enumerate(specs) if 1 <= len(prefix) and len(prefix) + k <= 32),
+			key=lambda i: specs[i][0],
+		)
+	else:
+		order = []
+
+	# Specs for byte scanner, which needs a copy of the sequence with whitespace removed
+	order_set = set(order)
+	byte_specs = [i for i in range(len(specs)) if i not in order_set]
+	if byte_specs:
+		if skip_whitespace:
+			filtered = bytearray(n)
+			byte_seq = memoryview(filtered)[:filter_whitespace(seq, filtered)]
+		else:
+			byte_seq = seq
+
+		for i in byte_specs:
+			prefix, k = specs[i]
+			if byte_seq.shape[0] >= len(prefix) + k:
+				if not _scan_bytes(byte_seq, prefix, revcomp(prefix), k, sinks[i]):
+					raise MemoryError()
+
+	nspecs = len(order)
+	if nspecs == 0 or n == 0:
+		return
+
+	c_specs = <scan_spec_t*>malloc(nspecs * sizeof(scan_spec_t))
+	if c_specs == NULL:
+		raise MemoryError()
+
+	try:
+		g = 0
+		for i in range(nspecs):
+			prefix, k = specs[order[i]]
+			sink = sinks[order[i]]
+			init_scan_spec(&c_specs[i], prefix, k, &sink.sink)
+			if not prefix.startswith(specs[order[g]][0]):
+				c_specs[g].group_end = i
+				g = i
+		c_specs[g].group_end = nspecs
+
+		with nogil:
+			ok = c_scan_encoded(&seq[0], n, c_specs, nspecs, skip_whitespace)
+
+	finally:
+		free(c_specs)
+
+	if not ok:
+		raise MemoryError()
+
+
+cdef bint _scan_bytes(const CHAR[:] seq, const CHAR[:] prefix, const CHAR[:] prefix_rc, int k, KmerSink sink):
+	cdef:
+		int p = prefix.shape[0]
+		bint ok
+
+	with nogil:
+		ok = c_scan_bytes(&seq[0], seq.shape[0], &prefix[0] if p > 0 else NULL,
+		                  &prefix_rc[0] if p > 0 else NULL, p, k, &sink.sink)
+
+	return ok
+
+
+# Contiguous piece of a sequence scanned by a single thread
+cdef struct chunk_t:
+	const CHAR* seq
+	np.intp_t n
+
+
+def scan_kmers_parallel(seqs, const CHAR[:] prefix, int k, sinks, *, np.intp_t chunk_size=2 ** 20,
+                        bint encoded=True):
+	"""scan_kmers_parallel(seqs: Sequence[bytes], prefix: bytes, k: int, sinks: Sequence[KmerSink], *, chunk_size: int = 2 ** 20, encoded: bool = True)
+
+	Find k-mers in a set of sequences using multiple threads.
+
+	Sequences are split into chunks of ``chunk_size`` nucleotides, which overlap by
+	``len(prefix) + k - 1`` so that no match spanning a chunk boundary is missed. Chunks are then
+	scanned in parallel by OpenMP threads without the GIL. One sink must be given for each thread,
+	each thread sends k-mers to its own sink only. The union of the k-mers sent to all sinks is the
+	same as if the sequences were scanned with :func:`.scan_kmers`.
+
+	Parameters
+	----------
+	seqs : Sequence[bytes]
+		ASCII-encoded nucleotide sequences.
+	prefix : bytes
+		Upper-case k-mer prefix.
+	k : int
+		Number of nucleotides after prefix.
+	sinks : Sequence[KmerSink]
+		Distinct sinks, the number of sinks is the maximum number of threads used. Sinks may not
+		track k-mer positions.
+	chunk_size : int
+		Maximum number of positions in each sequence chunk.
+	encoded : bool
+		Use the scanner based on 2-bit nucleotide codes if possible (see :func:`.scan_kmers`).
+	"""
+	cdef:
+		int p = prefix.shape[0]
+		int nthreads, t, tid
+		np.intp_t overlap = p + k - 1
+		np.intp_t nchunks = 0, c, start, end, n
+		const CHAR[:] view
+		const CHAR[:] prefix_rc
+		chunk_t* chunks = NULL
+		scan_spec_t* c_specs = NULL
+		const CHAR* c_prefix = NULL
+		const CHAR* c_prefix_rc = NULL
+		bint use_encoded, ok
+		int nfailed = 0
+		KmerSink sink
+
+	if k < 1 or k > 32:
+		raise ValueError('k must be between 1 and 32')
+	if chunk_size < 1:
+		raise ValueError('chunk_size must be positive')
+
+	sinks = list(sinks)
+	nthreads = len(sinks)
+	if nthreads == 0:
+		raise ValueError('At least one sink is required')
+	if len(set(map(id, sinks))) != nthreads:
+		raise ValueError('Sinks must be distinct')
+	for sink in sinks:
+		sink.check_k(k)
+		if sink.sink.track_positions:
+			raise ValueError('Sinks may not track k-mer positions')
+
+	# Keep references to buffers while their pointers are in use
+	views = list(seqs)
+	prefix_rc = revcomp(prefix)
+	use_encoded = encoded and 1 <= p and p + k <= 32
+
+	try:
+		# Split sequences into chunks
+		for seq in views:
+			view = seq
+			n = view.shape[0]
+			if n >= p + k:
+				nchunks += (n - overlap - 1) // chunk_size + 1
+
+		chunks = <chunk_t*>malloc(max(nchunks, 1) * sizeof(chunk_t))
+		c_specs = <scan_spec_t*>malloc(nthreads * sizeof(scan_spec_t))
+		if chunks == NULL or c_specs == NULL:
+			raise MemoryError()
+
+		c = 0
+		for seq in views:
+			view = seq
+			n = view.shape[0]
+			if n < p + k:
+				continue
+			start = 0
+			while True:
+				end = min(start + chunk_size + overlap, n)
+				chunks[c].seq = &view[start]
+				chunks[c].n = end - start
+				c += 1
+				if end == n:
+					break
+				start += chunk_size
+
+		for t in range(nthreads):
+			sink = sinks[t]
+			init_scan_spec(&c_specs[t], prefix, k, &sink.sink)
+			c_specs[t].group_end = 1
+
+		if p > 0:
+			c_prefix = &prefix[0]
+			c_prefix_rc = &prefix_rc[0]
+
+		for c in prange(nchunks, nogil=True, schedule='dynamic', num_threads=nthreads):
+			tid = threadid()
+			if use_encoded:
+				ok = c_scan_encoded(chunks[c].seq, chunks[c].n, &c_specs[tid], 1, False)
+			else:
+				ok = c_scan_bytes(chunks[c].seq, chunks[c].n, c_prefix, c_prefix_rc, p, k, c_specs[tid].sink)
+			if not ok:
+				nfailed += 1
+
+	finally:
+		free(chunks)
+		free(c_specs)
+
+	if nfailed > 0:
+		raise MemoryError()
+
+
+def scan_kmers_batch(seqs, const CHAR[:] prefix, int k, *, int nthreads=1, bint encoded=True):
+	"""scan_kmers_batch(seqs: Sequence[bytes], prefix: bytes, k: int, *, nthreads: int = 1, encoded: bool = True) -> Tuple[numpy.ndarray, numpy.ndarray]
+
+	Find the k-mer signatures of many sequences using multiple threads.
+
+	Each sequence is scanned separately (like :func:`.scan_kmers`), its k-mer indices sorted and
+	deduplicated to form its signature. Sequences are distributed dynamically between OpenMP
+	threads which run without the GIL. Sequence data is read directly from the buffers of the
+	arguments without copying.
+
+	Parameters
+	----------
+	seqs : Sequence
+		ASCII-encoded nucleotide sequences, each of which may be any object supporting the buffer
+		protocol with a contiguous 1-dimensional byte buffer (``bytes``, ``bytearray``, ``uint8``
+		arrays, etc.)
+	prefix : bytes
+		Upper-case k-mer prefix.
+	k : int
+		Number of nucleotides after prefix.
+	nthreads : int
+		Maximum number of threads to use.
+	encoded : bool
+		Use the scanner based on 2-bit nucleotide codes if possible (see :func:`.scan_kmers`).
+
+	Returns
+	-------
+	Tuple[numpy.ndarray, numpy.ndarray]
+		``(values, bounds)`` tuple. The signature of sequence ``i`` is the ``uint64`` array
+		``values[bounds[i]:bounds[i + 1]]``.
+	"""
+	cdef:
+		int p = prefix.shape[0]
+		int t, tid
+		np.intp_t nseqs, i, total = 0
+		const CHAR[::1] view
+		const CHAR[:] prefix_rc
+		chunk_t* chunks = NULL
+		vec_t* results = NULL
+		sink_t* thread_sinks = NULL
+		scan_spec_t* c_specs = NULL
+		const CHAR* c_prefix = NULL
+		const CHAR* c_prefix_rc = NULL
+		bint use_encoded, ok
+		int nfailed = 0
+		np.uint64_t[:] values_view
+		np.intp_t[:] bounds_view
+
+	if k < 1 or k > 32:
+		raise ValueError('k must be between 1 and 32')
+	if nthreads < 1:
+		raise ValueError('nthreads must be positive')
+
+	# Keep references to buffers while their pointers are in use
+	views = list(seqs)
+	nseqs = len(views)
+	prefix_rc = revcomp(prefix)
+	use_encoded = encoded and 1 <= p and p + k <= 32
+	nthreads = min(nthreads, max(nseqs, 1))
+
+	try:
+		chunks = <chunk_t*>malloc(max(nseqs, 1) * sizeof(chunk_t))
+		results = <vec_t*>malloc(max(nseqs, 1) * sizeof(vec_t))
+		thread_sinks = <sink_t*>malloc(nthreads * sizeof(sink_t))
+		c_specs = <scan_spec_t*>malloc(nthreads * sizeof(scan_spec_t))
+		if chunks == NULL or results == NULL or thread_sinks == NULL or c_specs == NULL:
+			raise MemoryError()
+
+		memset(results, 0, max(nseqs, 1) * sizeof(vec_t))
+		memset(thread_sinks, 0, nthreads * sizeof(sink_t))
+
+		for i in range(nseqs):
+			view = views[i]
+			results[i].itemsize = sizeof(np.uint64_t)
+			chunks[i].seq = &view[0] if view.shape[0] > 0 else NULL
+			chunks[i].n = view.shape[0]
+
+		for t in range(nthreads):
+			thread_sinks[t].kind = SINK_INDICES
+			thread_sinks[t].indices.itemsize = sizeof(np.uint64_t)
+			thread_sinks[t].key_bits = 2 * k
+			init_scan_spec(&c_specs[t], prefix, k, &thread_sinks[t])
+			c_specs[t].group_end = 1
+
+		if p > 0:
+			c_prefix = &prefix[0]
+			c_prefix_rc = &prefix_rc[0]
+
+		for i in prange(nseqs, nogil=True, schedule='dynamic', num_threads=nthreads):
+			tid = threadid()
+			if chunks[i].n < p + k:
+				continue
+
+			# The thread's buffer is reused between sequences, deduplicating it periodically
+			# bounds its size for sequences with many repeated k-mers.
+			thread_sinks[tid].indices.size = 0
+			thread_sinks[tid].dedup_at = 2 ** 20
+
+			if use_encoded:
+				ok = c_scan_encoded(chunks[i].seq, chunks[i].n, &c_specs[tid], 1, False)
+			else:
+				ok = c_scan_bytes(chunks[i].seq, chunks[i].n, c_prefix, c_prefix_rc, p, k, &thread_sinks[tid])
+
+			if ok:
+				ok = c_sort_unique(&thread_sinks[tid].indices, 2 * k) == 0
+			if ok and thread_sinks[tid].indices.size > 0:
+				ok = vec_reserve(&results[i], thread_sinks[tid].indices.size) == 0
+				if ok:
+					results[i].size = thread_sinks[tid].indices.size
+					memcpy(results[i].data, thread_sinks[tid].indices.data, results[i].size * sizeof(np.uint64_t))
+			if not ok:
+				nfailed += 1
+
+		if nfailed > 0:
+			raise MemoryError()
+
+		bounds = np.zeros(nseqs + 1, dtype=np.intp)
+		bounds_view = bounds
+		for i in range(nseqs):
+			total += results[i].size
+			bounds_view[i + 1] = total
+
+		values = np.empty(total, dtype=np.uint64)
+		if total > 0:
+			values_view = values
+			for i in range(nseqs):
+				if results[i].size > 0:
+					memcpy(&values_view[bounds_view[i]], results[i].data, results[i].size * sizeof(np.uint64_t))
+
+	finally:
+		if results != NULL:
+			for i in range(nseqs):
+				vec_free(&results[i])
+		if thread_sinks != NULL:
+			for t in range(nthreads):
+				vec_free(&thread_sinks[t].indices)
+		free(chunks)
+		free(results)
+		free(thread_sinks)
+		free(c_specs)
+
+	return values, bounds
+
+
+def filter_whitespace(const CHAR[:] src, CHAR[:] dst):
+	"""filter_whitespace(src: bytes, dst: bytearray) -> int
+
+	Copy bytes to a destination buffer, skipping whitespace (spaces, tabs and line breaks).
+
+	Runs without the GIL. ``dst`` must be at least as long as ``src``.
+
+	Returns
+	-------
+	int
+		Number of bytes written to ``dst``.
+	"""
+	cdef:
+		np.intp_t i, j = 0
+		CHAR c
+
+	if dst.shape[0] < src.shape[0]:
+		raise ValueError('Destination buffer is too small')
+
+	with nogil:
+		for i in range(src.shape[0]):
+			c = src[i]
+			if not IS_SPACE[c]:
+				dst[j] = c
+				j += 1
+
+	return j
+
+
+def nucleotide_counts(const CHAR[:] seq, np.int64_t[:] counts, *, bint skip_whitespace=False):
+	"""nucleotide_counts(seq: bytes, counts: numpy.ndarray, *, skip_whitespace: bool = False) -> int
+
+	Count occurrences of each nucleotide in a sequence, adding them to an existing array.
+
+	Runs without the GIL. Lower case characters are counted as upper case.
+
+	Parameters
+	----------
+	seq : bytes
+		ASCII-encoded nucleotide sequence.
+	counts : numpy.ndarray
+		``int64`` array of length 5 which the counts of ``A``, ``C``, ``G``, ``T`` and all other
+		characters are added to.
+	skip_whitespace : bool
+		Don't count whitespace (spaces, tabs and line breaks).
+
+	Returns
+	-------
+	int
+		Total number of characters counted.
+	"""
+	cdef:
+		np.intp_t i, total = 0
+		np.int64_t c_counts[5]
+
+	if counts.shape[0] != 5:
+		raise ValueError('counts must have length 5')
+
+	memset(c_counts, 0, sizeof(c_counts))
+
+	with nogil:
+		for i in range(seq.shape[0]):
+			if skip_whitespace and IS_SPACE[seq[i]]:
+				continue
+			c_counts[NUC_CODES[seq[i]]] += 1
+
+	for i in range(5):
+		counts[i] += c_counts[i]
+		total += c_counts[i]
+
+	return total
+
+
+################################################################################
+# Bit sets
+################################################################################
+
+ctypedef fused INDEX_T:
+	np.uint8_t
+	np.uint16_t
+	np.uint32_t
+	np.uint64_t
+
+
+def bitset_count(const np.uint64_t[:] bits):
+	"""bitset_count(bits: numpy.ndarray) -> int
+
+	Count the number of set bits in a bit set stored as a ``uint64`` array.
+	"""
+	cdef:
+		np.intp_t i
+		np.intp_t count = 0
+
+	with nogil:
+		for i in range(bits.shape[0]):
+			count += popcount64(bits[i])
+
+	return count
+
+
+def bitset_add(np.uint64_t[:] bits, const np.uint64_t[:] indices):
+	"""bitset_add(bits: numpy.ndarray, indices: numpy.ndarray)
+
+	Set bits of a bit set at the given indices.
+	"""
+	cdef:
+		np.intp_t i
+		np.uint64_t idx
+		np.uint64_t nbits = bits.shape[0] * 64
+
+	with nogil:
+		for i in range(indices.shape[0]):
+			idx = indices[i]
+			if idx >= nbits:
+				with gil:
+					raise IndexError(f'Index {idx} out of range')
+			bits[idx >> 6] |= (<np.uint64_t>1) << (idx & 63)
+
+
+def bitset_to_indices(const np.uint64_t[:] bits, dtype=np.uint64):
+	"""bitset_to_indices(bits: numpy.ndarray, dtype=numpy.uint64) -> numpy.ndarray
+
+	Get sorted array of the indices of all set bits in a bit set.
+
+	Parameters
+	----------
+	bits : numpy.ndarray
+		``uint64`` array storing bit set.
+	dtype : numpy.dtype
+		Unsigned integer data type of returned array.
+	"""
+	out = np.empty(bitset_count(bits), dtype=dtype)
+	_bitset_fill(bits, out)
+	return out
+
+
+def _bitset_fill(const np.uint64_t[:] bits, INDEX_T[:] out):
+	cdef:
+		np.intp_t i, j = 0
+		np.uint64_t word
+
+	with nogil:
+		for i in range(bits.shape[0]):
+			word = bits[i]
+			while word:
+				out[j] = <INDEX_T>(i * 64 + ctz64(word))
+				j += 1
+				word &= word - 1
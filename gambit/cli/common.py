@@ -11,7 +11,9 @@ from sqlalchemy.orm import sessionmaker
 from gambit.kmers import KmerSpec, DEFAULT_KMERSPEC
 from gambit.db import ReferenceDatabase, ReadOnlySession, only_genomeset, DatabaseLoadError
 from gambit.sigs.base import ReferenceSignatures, load_signatures
+from gambit.sigs.cache import SignatureCache
 from gambit.util.io import FilePath, read_lines
+from gambit.util.archive import is_archive, list_members
 from gambit.util.misc import join_list_human
 from gambit.seq import validate_dna_seq_bytes, SequenceFile
 
@@ -183,6 +185,22 @@ def cores_param():
 	return click.option('-c', '--cores', type=click.IntRange(min=1), help='Number of CPU cores to use.')
 
 
+def cache_param():
+	"""Click parameter for signature cache file."""
+	return click.option(
+		'--cache', 'cache_path',
+		type=filepath(),
+		envvar='GAMBIT_SIGNATURE_CACHE',
+		help='Cache signatures calculated from genome files in this file and reuse them in later runs. '
+		     'May also be set with the GAMBIT_SIGNATURE_CACHE environment variable.',
+	)
+
+
+def get_signature_cache(cache_path: Optional[Path]) -> Optional[SignatureCache]:
+	"""Open signature cache from value of :func:`.cache_param` parameter."""
+	return None if cache_path is None else SignatureCache(cache_path)
+
+
 def progress_param():
 	"""Click argument to show progress meter."""
 	return click.option('--progress/--no-progress', default=True, help="Show/don't show progress meter.")
@@ -260,12 +278,28 @@ def kspec_from_params(k: Optional[int], prefix: Optional[str], default: bool = F
 	return KmerSpec(k, prefix_bytes)
 
 
+def kspec_from_str(value: str) -> KmerSpec:
+	"""Parse and validate KmerSpec from a CLI argument value in "K/PREFIX" format (e.g. "11/ATGAC")."""
+	k, sep, prefix = value.partition('/')
+
+	try:
+		k = int(k)
+	except ValueError:
+		k = None
+
+	if not sep or k is None or not prefix:
+		raise click.ClickException(f'Invalid k-mer spec {value!r}, expected format K/PREFIX (e.g. 11/ATGAC).')
+
+	return kspec_from_params(k, prefix)
+
+
 ################################################################################
 # Sequence file input
 ################################################################################
 
 FASTA_EXTENSIONS = ('.fasta', '.fna', '.ffn', '.faa', '.frn', '.fa')
 GZIP_EXTENSIONS = ('.gz',)
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.xz')
 
 
 def strip_extensions(filename: str, extensions: Iterable[str]) -> str:
@@ -282,6 +316,11 @@ def strip_seq_file_ext(filename: str) -> str:
 	return filename
 
 
+def is_seq_file_name(filename: str) -> bool:
+	"""Check if a file name has a FASTA extension, optionally followed by a compression extension."""
+	return strip_extensions(filename, COMPRESSED_EXTENSIONS).endswith(FASTA_EXTENSIONS)
+
+
 def get_file_id(path: FilePath, strip_dir: bool = True, strip_ext: bool = True) -> str:
 	"""Get sequence file ID derived from file path.
 
@@ -310,6 +349,10 @@ def get_sequence_files(explicit: Optional[Iterable[FilePath]]=None,
 
 	Does not check for conflict between ``explicit`` and ``listfile``.
 
+	Tar and zip archives (recognized by file extension, see :func:`gambit.util.archive.is_archive`)
+	are expanded into all members with FASTA file extensions (see :func:`.is_seq_file_name`), in the
+	order they are stored. IDs of members are derived from their names within the archive.
+
 	Parameters
 	----------
 	explicit
@@ -342,8 +385,21 @@ def get_sequence_files(explicit: Optional[Iterable[FilePath]]=None,
 	else:
 		return None, None
 
-	files = SequenceFile.from_paths(paths, 'fasta', 'auto')
-	ids = [get_file_id(f, strip_dir, strip_ext) for f in paths_str]
+	ids = []
+	files = []
+
+	for path, path_str in zip(paths, paths_str):
+		if not is_archive(path):
+			files.append(SequenceFile(path, 'fasta', 'auto'))
+			ids.append(get_file_id(path_str, strip_dir, strip_ext))
+			continue
+
+		members = [name for name in list_members(path) if is_seq_file_name(name)]
+		if not members:
+			raise click.ClickException(f'No sequence files found in archive {path_str}')
+
+		files += SequenceFile.from_archive(path, 'fasta', 'auto', members)
+		ids += [get_file_id(f'{path_str}/{name}', strip_dir, strip_ext) for name in members]
 
 	return ids, files
 
@@ -1,11 +1,11 @@
 import sys
 from typing import Optional, TextIO, List
+from pathlib import Path
 
 import click
 
 from . import common
 from .root import cli
-from gambit.seq import SequenceFile
 from gambit.sigs import load_signatures
 from gambit.sigs.calc import calc_file_signatures
 from gambit.metric import jaccarddist_matrix, jaccarddist_pairwise
@@ -35,6 +35,7 @@ def fmt_kspec(kspec):
 @click.option('-d', '--use-db', is_flag=True, help='Use reference signatures from database.')
 @common.cores_param()
 @common.progress_param()
+@common.cache_param()
 @click.option('--dump-params', is_flag=True, hidden=True)
 @click.pass_context
 def dist_cmd(ctx: click.Context,
@@ -53,6 +54,7 @@ def dist_cmd(ctx: click.Context,
              use_db: bool,
              progress: bool,
              cores: Optional[int],
+             cache_path: Optional[Path],
              dump_params: bool,
              ):
 	"""Calculate the GAMBIT distances between a set of query geneomes and a set of reference genomes.
@@ -123,10 +125,10 @@ def dist_cmd(ctx: click.Context,
 	# Dump parsed parameters
 	if dump_params:
 		params = dict(
-			query_files=[f.path for f in query_files],
+			query_files=[str(f) for f in query_files],
 			query_sigs_file=qs,
 			query_ids=query_ids,
-			ref_files=[f.path for f in ref_files],
+			ref_files=[str(f) for f in ref_files],
 			ref_sigs_file=rs,
 			ref_ids=ref_ids,
 			kmerspec=kspec,
@@ -136,10 +138,12 @@ def dist_cmd(ctx: click.Context,
 		return
 
 	# Calculate signatures if needed
+	cache = common.get_signature_cache(cache_path)
+
 	if query_sigs is None:
-		query_sigfiles = SequenceFile.from_paths(query_files, 'fasta', 'auto')
 		query_pconf = progress_config(prog, desc='Calculating query genome signatures') if len(query_files) > 1 else None
-		query_sigs = calc_file_signatures(kspec, query_sigfiles, progress=query_pconf, max_workers=cores)
+		query_sigs = calc_file_signatures(kspec, query_files, progress=query_pconf, concurrency='pool',
+		                                  max_workers=cores, cache=cache, parallel_single=True)
 
 	# Calculate distances
 	dist_pconf = progress_config(prog, desc='Calculating distances')
@@ -151,9 +155,9 @@ def dist_cmd(ctx: click.Context,
 
 	else:
 		if ref_sigs is None:
-			ref_sigfiles = SequenceFile.from_paths(ref_files, 'fasta', 'auto')
 			ref_pconf = progress_config('click', desc='Calculating reference genome signatures') if len(ref_files) > 1 else None
-			ref_sigs = calc_file_signatures(kspec, ref_sigfiles, progress=ref_pconf)
+			ref_sigs = calc_file_signatures(kspec, ref_files, progress=ref_pconf, concurrency='pool',
+			                                max_workers=cores, cache=cache, parallel_single=True)
 
 		dmat = jaccarddist_matrix(query_sigs, ref_sigs, progress=dist_pconf)
 
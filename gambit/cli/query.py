@@ -1,5 +1,6 @@
 import sys
 from typing import TextIO, Optional, List
+from pathlib import Path
 
 import click
 
@@ -53,8 +54,19 @@ def get_exporter(outfmt: str):
 	type=common.filepath(exists=True),
 	help='File containing query signatures, to use in place of GENOMES.',
 )
+@click.option(
+	'--records',
+	is_flag=True,
+	help='Also classify each record (e.g. contig) of the query genomes separately. Not compatible with --sigfile.',
+)
+@click.option(
+	'--stats',
+	is_flag=True,
+	help='Report assembly statistics of the query genomes. Not compatible with --sigfile.',
+)
 @common.progress_param()
 @common.cores_param()
+@common.cache_param()
 @click.pass_context
 def query_cmd(ctx: click.Context,
               listfile: Optional[TextIO],
@@ -64,12 +76,19 @@ def query_cmd(ctx: click.Context,
               output: TextIO,
               outfmt: str,
               strict: bool,
+              records: bool,
+              stats: bool,
               progress: bool,
               cores: Optional[int],
+              cache_path: Optional[Path],
               ):
 	"""Predict taxonomy of microbial samples from genome sequences."""
 
 	common.check_params_group(ctx, ['files_arg', 'listfile', 'sigfile'], True, True)
+	if records and sigfile:
+		raise click.ClickException('--records is not compatible with --sigfile.')
+	if stats and sigfile:
+		raise click.ClickException('--stats is not compatible with --sigfile.')
 
 	db = ctx.obj.get_database()
 	params = QueryParams(classify_strict=strict)
@@ -87,11 +106,20 @@ def query_cmd(ctx: click.Context,
 	else:
 		ids, files = common.get_sequence_files(files_arg, listfile, ldir)
 		common.warn_duplicate_file_ids(ids, 'Warning: the following query file IDs are present more than once: {ids}')
+		parse_kw = dict(concurrency='pool', max_workers=cores)
+		if not records:
+			parse_kw['parallel_single'] = True
+		if not records and not stats:
+			# Cache only stores whole-file signatures
+			parse_kw['cache'] = common.get_signature_cache(cache_path)
+
 		results = query_parse(
 			db, files, params,
 			file_labels=ids,
+			records=records,
+			stats=stats,
 			progress=pconf,
-			parse_kw=dict(max_workers=cores),
+			parse_kw=parse_kw,
 		)
 
 	exporter.export(output, results)
@@ -1,13 +1,16 @@
-from typing import Optional, TextIO, List
+from typing import Optional, TextIO, List, Tuple
 import sys
+from contextlib import ExitStack
 
 import click
+import h5py as h5
 
 from . import common
 from .root import cli
 import gambit.util.json as gjson
-from gambit.sigs import SignaturesMeta, AnnotatedSignatures, load_signatures, dump_signatures
-from gambit.sigs.calc import calc_file_signatures
+from gambit.sigs import SignaturesMeta, load_signatures
+from gambit.sigs.calc import iter_file_signatures, iter_file_signatures_multi
+from gambit.sigs.hdf5 import HDF5SignaturesWriter, load_signatures_hdf5
 from gambit.util.io import read_lines
 from gambit.kmers import DEFAULT_KMERSPEC
 
@@ -127,6 +130,15 @@ def info(ctx: click.Context, file: str, json: bool, pretty: bool, ids: bool, use
 	is_flag=True,
 	help='Use k/prefix from reference database.'
 )
+@click.option(
+	'-x', '--add-kspec', 'extra_kspecs',
+	nargs=2,
+	multiple=True,
+	type=(str, common.filepath(writable=True)),
+	metavar='K/PREFIX FILE',
+	help='Also calculate signatures with another k-mer spec (e.g. 13/ATGACGT) in the same pass over '
+	     'the genome files, and write them to FILE. May be used multiple times.',
+)
 @common.progress_param()
 @common.cores_param()
 @click.option('--dump-params', is_flag=True, hidden=True)
@@ -141,6 +153,7 @@ def create(ctx: click.Context,
            meta_file: Optional[TextIO],
            ids_file: Optional[TextIO],
            db_params: bool,
+           extra_kspecs: List[Tuple[str, str]],
            progress: bool,
            cores: Optional[int],
            dump_params: bool,
@@ -166,6 +179,12 @@ def create(ctx: click.Context,
 	elif kspec is None:
 		kspec = DEFAULT_KMERSPEC
 
+	kspecs = [kspec]
+	outputs = [output]
+	for value, extra_output in extra_kspecs:
+		kspecs.append(common.kspec_from_str(value))
+		outputs.append(extra_output)
+
 	# Metadata / IDs
 	if meta_file is not None:
 		meta = gjson.load(meta_file, SignaturesMeta)
@@ -183,14 +202,88 @@ def create(ctx: click.Context,
 	if dump_params:
 		params = dict(
 			kmerspec=kspec,
-			files=[f.path for f in files],
+			extra_kmerspecs=kspecs[1:],
+			files=[str(f) for f in files],
 			meta=meta,
 			ids=ids,
 		)
 		gjson.dump(params, sys.stdout)
 		return
 
-	# Calculate and save
-	sigs = calc_file_signatures(kspec, files, progress='click' if progress else None, max_workers=cores)
-	sigs = AnnotatedSignatures(sigs, ids, meta)
-	dump_signatures(output, sigs)
+	# Calculate and write to files as each finishes
+	results = iter_file_signatures_multi(
+		kspecs, files,
+		ordered=True,
+		progress='click' if progress else None,
+		max_workers=cores,
+	)
+
+	with ExitStack() as stack:
+		writers = []
+		for kspec_i, path in zip(kspecs, outputs):
+			group = stack.enter_context(h5.File(path, 'w'))
+			writers.append(HDF5SignaturesWriter(group, kspec_i))
+
+		for i, sigs in results:
+			for writer, sig in zip(writers, sigs):
+				writer.append(sig)
+
+		for writer in writers:
+			writer.finish(ids, meta)
+
+
+@signatures_group.command(no_args_is_help=True)
+@click.argument(
+	'sigfile',
+	type=common.filepath(exists=True),
+	metavar='SIGFILE',
+)
+@common.genome_files_arg()
+@common.listfile_param('-l', 'listfile', metavar='LISTFILE', help='File containing paths to genome files, one per line.')
+@common.listfile_dir_param('--ldir', file_metavar='LISTFILE')
+@click.option(
+	'-i', '--ids', 'ids_file',
+	type=click.File('r'),
+	help='File containing genome IDs (one per line).',
+)
+@common.progress_param()
+@common.cores_param()
+@click.pass_context
+def append(ctx: click.Context,
+           sigfile: str,
+           listfile: Optional[TextIO],
+           ldir: Optional[str],
+           files_arg: List[str],
+           ids_file: Optional[TextIO],
+           progress: bool,
+           cores: Optional[int],
+           ):
+	"""Add signatures of more genomes to an existing signatures file.
+
+	Signatures are calculated using the same k-mer parameters as the file and written to the end of
+	it without rewriting the existing data.
+	"""
+	common.check_params_group(ctx, ['listfile', 'files_arg'], True, True)
+
+	ids, files = common.get_sequence_files(files_arg, listfile, ldir)
+
+	if ids_file is not None:
+		ids = list(read_lines(ids_file))
+		if len(ids) != len(files):
+			raise click.ClickException(f'Number of IDs ({len(ids)}) does not match number of genomes ({len(files)}).')
+
+	with load_signatures_hdf5(sigfile, mode='r+') as sigs:
+		if sigs.group['ids'].dtype.kind in 'ui':
+			raise click.ClickException('Cannot append to file with integer IDs.')
+
+		results = iter_file_signatures(
+			sigs.kmerspec, files,
+			ordered=True,
+			progress='click' if progress else None,
+			max_workers=cores,
+		)
+
+		try:
+			sigs.append((sig for i, sig in results), ids, kmerspec=sigs.kmerspec)
+		except ValueError as e:
+			raise click.ClickException(str(e)) from e
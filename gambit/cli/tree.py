@@ -1,12 +1,12 @@
 import sys
 from typing import Optional, TextIO, List
+from pathlib import Path
 
 import click
 from Bio import Phylo
 
 from . import common
 from .root import cli
-from gambit.seq import SequenceFile
 from gambit.sigs import load_signatures
 from gambit.sigs.calc import calc_file_signatures
 from gambit.metric import jaccarddist_pairwise
@@ -27,6 +27,7 @@ from gambit.cluster import hclust, linkage_to_bio_tree
 @common.kspec_params()
 @common.cores_param()
 @common.progress_param()
+@common.cache_param()
 @click.pass_context
 def tree_cmd(ctx: click.Context,
              listfile: Optional[TextIO],
@@ -37,6 +38,7 @@ def tree_cmd(ctx: click.Context,
              prefix: Optional[str],
              progress: bool,
              cores: Optional[int],
+             cache_path: Optional[Path],
              ):
 	"""
 	Estimate a relatedness tree for a set of genomes and output in Newick format.
@@ -58,8 +60,14 @@ def tree_cmd(ctx: click.Context,
 		common.warn_duplicate_file_ids(labels, 'Warning: the following file IDs are present more than once: {ids}')
 
 		kspec = common.kspec_from_params(k, prefix, default=True)
-		sigfiles = SequenceFile.from_paths(genome_files, 'fasta', 'auto')
-		sigs = calc_file_signatures(kspec, sigfiles, progress=pconf.update(desc='Calculating signatures'), max_workers=cores)
+		sigs = calc_file_signatures(
+			kspec, genome_files,
+			progress=pconf.update(desc='Calculating signatures'),
+			concurrency='pool',
+			max_workers=cores,
+			cache=common.get_signature_cache(cache_path),
+			parallel_single=True,
+		)
 
 	# Calculate distances
 	dmat = jaccarddist_pairwise(sigs, progress=pconf.update(desc='Calculating distances'))
@@ -1,12 +1,12 @@
 """Core functions for searching for and working with k-mers."""
 
-from typing import Dict, Any, Iterator
+from typing import Dict, Any, Iterator, Union, Tuple
 
 import numpy as np
 from attr import attrs, attrib
 
 import gambit._cython.kmers as ckmers
-from gambit._cython.kmers import index_to_kmer
+from gambit._cython.kmers import index_to_kmer, scan_kmers, IndexBuffer
 from gambit.seq import NUCLEOTIDES, DNASeq, seq_to_bytes, validate_dna_seq_bytes, revcomp
 from gambit.util.json import Jsonable
 
@@ -195,6 +195,10 @@ def find_kmers(kmerspec: KmerSpec, seq: DNASeq) -> Iterator[KmerMatch]:
 	-------
 	Iterator[KmerMatch]
 		Iterator of :class:`.KmerMatch` objects.
+
+	See Also
+	--------
+	.find_kmer_indices
 	"""
 
 	haystack = seq_to_bytes(seq)
@@ -230,3 +234,41 @@ def find_kmers(kmerspec: KmerSpec, seq: DNASeq) -> Iterator[KmerMatch]:
 		yield KmerMatch(kmerspec, seq, loc + kmerspec.prefix_len - 1, True)
 
 		start = loc + 1
+
+
+def find_kmer_indices(kmerspec: KmerSpec,
+                      seq: DNASeq,
+                      positions: bool = False,
+                      ) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+	"""Find indices of k-mers with the given prefix in a DNA sequence.
+
+	This is a much faster alternative to :func:`.find_kmers` which runs in native code and returns
+	arrays instead of creating a :class:`.KmerMatch` for each match. Both strands are searched in a
+	single pass. Unlike :func:`.find_kmers`, matches where the k-mer contains an invalid nucleotide
+	are omitted.
+
+	Parameters
+	----------
+	kmerspec
+		K-mer spec to use for search.
+	seq
+		Sequence to search within. Lowercase characters are OK and will be matched as uppercase.
+	positions
+		Also return the position and strand of each match.
+
+	Returns
+	-------
+	Union[numpy.ndarray, Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]]
+		Array of k-mer indices with data type ``kmerspec.index_dtype``, in the order they were
+		found (may contain duplicates). If ``positions`` is True, returns a ``(indices, pos, reverse)``
+		tuple where the second two arrays give the values of :attr:`.KmerMatch.pos` and
+		:attr:`.KmerMatch.reverse` for each match.
+	"""
+	buf = IndexBuffer(positions)
+	scan_kmers(seq_to_bytes(seq), kmerspec.prefix, kmerspec.k, buf)
+	indices = buf.indices(kmerspec.index_dtype)
+
+	if positions:
+		return (indices, *buf.positions())
+	else:
+		return indices
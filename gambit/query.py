@@ -2,7 +2,7 @@
 
 from warnings import warn
 from datetime import datetime
-from typing import Sequence, Optional, Union, List, Dict, Any
+from typing import Sequence, Optional, Union, List, Dict, Any, Callable
 
 from attr import attrs, attrib
 import numpy as np
@@ -11,8 +11,8 @@ from gambit import __version__ as GAMBIT_VERSION
 from gambit.classify import classify, ClassifierResult, GenomeMatch, compare_classifier_results, \
 	compare_genome_matches
 from gambit.db import ReferenceDatabase, Taxon, ReferenceGenomeSet, reportable_taxon
-from gambit.seq import SequenceFile
-from gambit.sigs import KmerSignature, SignaturesMeta
+from gambit.seq import SequenceFile, AssemblyStats
+from gambit.sigs import KmerSignature, SignaturesMeta, SignatureList, AnnotatedSignatures
 from gambit.metric import jaccarddist_matrix
 from gambit.util.misc import zip_strict
 from gambit.util.progress import progress_config, iter_progress
@@ -47,9 +47,12 @@ class QueryInput:
 		Some unique label for the input, probably the file name.
 	file
 		Source file (optional).
+	stats
+		Assembly statistics of the genome, if calculated (optional).
 	"""
 	label: str = attrib()
 	file: Optional[SequenceFile] = attrib(default=None, repr=False)
+	stats: Optional[AssemblyStats] = attrib(default=None, repr=False)
 
 	@classmethod
 	def convert(cls, x: Union['QueryInput', SequenceFile, str]) -> 'QueryInput':
@@ -63,7 +66,7 @@ class QueryInput:
 		if isinstance(x, str):
 			return QueryInput(x)
 		if isinstance(x, SequenceFile):
-			return QueryInput(str(x.path), x)
+			return QueryInput(str(x), x)
 		raise TypeError(f'Cannot convert {type(x)} instance to QueryInput')
 
 
@@ -82,11 +85,15 @@ class QueryResultItem:
 	closest_genomes
 		List of closest reference genomes to query. Length determined by
 		:attr:`.QueryParams.report_closest`.
+	records
+		Results for individual records (e.g. contigs) of the query genome, if they were classified
+		separately.
 	"""
 	input: QueryInput = attrib()
 	classifier_result: ClassifierResult = attrib()
 	report_taxon: Optional[Taxon] = attrib(default=None)
 	closest_genomes: List[GenomeMatch] = attrib(factory=list)
+	records: List['QueryResultItem'] = attrib(factory=list)
 
 
 def compare_result_items(item1: QueryResultItem, item2: QueryResultItem) -> bool:
@@ -105,6 +112,13 @@ def compare_result_items(item1: QueryResultItem, item2: QueryResultItem) -> bool
 		if not compare_genome_matches(m1, m2):
 			return False
 
+	if len(item1.records) != len(item2.records):
+		return False
+
+	for r1, r2 in zip(item1.records, item2.records):
+		if r1.input.label != r2.input.label or not compare_result_items(r1, r2):
+			return False
+
 	return True
 
 
@@ -143,6 +157,8 @@ def query(db: ReferenceDatabase,
           params: Optional[QueryParams] = None,
           *,
           inputs: Optional[Sequence[Union[QueryInput, SequenceFile, str]]] = None,
+          records: Optional[Sequence[KmerSignature]] = None,
+          record_parents: Optional[Sequence[int]] = None,
           progress = None,
           **kw,
           ) -> QueryResults:
@@ -161,6 +177,14 @@ def query(db: ReferenceDatabase,
 		Description for each input, converted to :class:`gambit.query.result.QueryInput` in results
 		object. Only used for reporting, does not any other aspect of results. Items can be
 		``QueryInput``, ``SequenceFile`` or ``str``.
+	records
+		Signatures of parts of the query genomes (e.g. contigs, see the ``records`` argument of
+		:func:`gambit.sigs.calc.calc_file_signature`) to classify separately. Their distances are
+		calculated in the same batch as the queries. Labels are taken from the ``ids`` attribute if
+		present. Results are stored in the :attr:`.QueryResultItem.records` attribute of the result
+		item of the query each record belongs to.
+	record_parents
+		Index of the query each record belongs to. Required if ``records`` is given.
 	progress
 		Report progress for distance matrix calculation and classification. See
 		:func:`gambit.util.progress.get_progress` for description of allowed values.
@@ -185,6 +209,23 @@ def query(db: ReferenceDatabase,
 	else:
 		inputs = [QueryInput(str(i + 1)) for i in range(len(queries))]
 
+	if records is None:
+		record_parents = []
+	else:
+		if record_parents is None:
+			raise ValueError('record_parents is required if records is given.')
+		if len(record_parents) != len(records):
+			raise ValueError('Number of record parents does not match number of records.')
+		labels = getattr(records, 'ids', None)
+		if labels is None:
+			labels = range(1, len(records) + 1)
+		record_parents = list(record_parents)
+		for parent in record_parents:
+			if not 0 <= parent < len(queries):
+				raise ValueError(f'Record parent index {parent} out of range for {len(queries)} queries.')
+		inputs += [QueryInput(str(label), inputs[parent].file) for label, parent in zip(labels, record_parents)]
+		queries += list(records)
+
 	# Calculate distances
 	# (This will only be about 200kB per row/query [50k float32's] so having the whole thing in
 	# memory at once isn't a big deal).
@@ -200,6 +241,12 @@ def query(db: ReferenceDatabase,
 	with iter_progress(inputs, pconf, desc='Classifying') as inputs_iter:
 		items = [get_result_item(db, params, dmat[i, :], input) for i, input in enumerate(inputs_iter)]
 
+	# Move record items under their parents
+	nqueries = len(items) - len(record_parents)
+	for parent, item in zip(record_parents, items[nqueries:]):
+		items[parent].records.append(item)
+	del items[nqueries:]
+
 	return QueryResults(
 		items=items,
 		params=params,
@@ -235,6 +282,9 @@ def query_parse(db: ReferenceDatabase,
                 params: Optional[QueryParams] = None,
                 *,
                 file_labels: Optional[Sequence[str]] = None,
+                records: bool = False,
+                group_by: Optional[Callable[[str], str]] = None,
+                stats: bool = False,
                 parse_kw: Optional[Dict[str, Any]] = None,
                 **kw,
                 ) -> QueryResults:
@@ -251,12 +301,22 @@ def query_parse(db: ReferenceDatabase,
 		keyword arguments or use defaults.
 	file_labels
 		Custom labels to use for each file in returned results object. If None use file names.
+	records
+		Also classify each record (e.g. contig) of each file separately. Results are found in the
+		:attr:`.QueryResultItem.records` attribute of each file's result item.
+	group_by
+		Function which maps record IDs to group labels, records with the same label are classified
+		together. Implies ``records=True``.
+	stats
+		Calculate assembly statistics of each file in the same pass as its signature, these are
+		stored in the :attr:`.QueryInput.stats` attribute of each result item's input.
 	parse_kw
-		Keyword parameters to pass to :func:`gambit.sigs.calc.calc_file_signatures`.
+		Keyword parameters to pass to :func:`gambit.sigs.calc.calc_file_signatures`, or to
+		:func:`gambit.sigs.calc.calc_file_signatures_with_records` if ``records`` is True.
 	\\**kw
 		Additional keyword arguments passed to :func:`.query`.
 	"""
-	from gambit.sigs.calc import calc_file_signatures
+	from gambit.sigs.calc import calc_file_signatures, calc_file_signatures_with_records
 
 	pconf = progress_config(kw.pop('progress', None))
 	if parse_kw is None:
@@ -264,10 +324,34 @@ def query_parse(db: ReferenceDatabase,
 	parse_kw.setdefault('progress', pconf.update(desc='Parsing input'))
 
 	if file_labels is None:
-		inputs = files
+		inputs = list(map(QueryInput.convert, files))
 	else:
 		inputs = [QueryInput(label, file) for label, file in zip_strict(file_labels, files)]
 
-	query_sigs = calc_file_signatures(db.signatures.kmerspec, files, **parse_kw)
+	if not records and group_by is None:
+		result = calc_file_signatures(db.signatures.kmerspec, files, stats=stats, **parse_kw)
+		query_sigs = result[0] if stats else result
+		if stats:
+			_set_input_stats(inputs, result[1])
+		return query(db, query_sigs, params, inputs=inputs, progress=pconf, **kw)
+
+	result = calc_file_signatures_with_records(
+		db.signatures.kmerspec, files, group_by=group_by, stats=stats, **parse_kw,
+	)
+	query_sigs, file_records = result[:2]
+	if stats:
+		_set_input_stats(inputs, result[2])
+	record_sigs = AnnotatedSignatures(
+		SignatureList([sig for recs in file_records for sig in recs], db.signatures.kmerspec),
+		ids=[id_ for recs in file_records for id_ in recs.ids],
+	)
+	record_parents = [i for i, recs in enumerate(file_records) for _ in range(len(recs))]
+
+	return query(db, query_sigs, params, inputs=inputs, records=record_sigs, record_parents=record_parents,
+	             progress=pconf, **kw)
+
 
-	return query(db, query_sigs, params, inputs=inputs, progress=pconf, **kw)
+def _set_input_stats(inputs: List[QueryInput], stats: Sequence[AssemblyStats]):
+	"""Set the ``stats`` attribute of query inputs in place."""
+	for input, file_stats in zip_strict(inputs, stats):
+		input.stats = file_stats
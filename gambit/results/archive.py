@@ -3,7 +3,7 @@
 import json
 from typing import Union, IO, Any
 
-from attr import attrs, attrib, asdict, has as has_attrs
+from attr import attrs, attrib, asdict, has as has_attrs, NOTHING
 from sqlalchemy.orm import Session
 
 from gambit.query import QueryResultItem, QueryResults
@@ -101,6 +101,8 @@ class ResultsArchiveReader:
 		for a in cls.__attrs_attrs__:
 			if values is not None and a.name in values:
 				kw[a.name] = values[a.name]
+			elif a.name not in data and a.default is not NOTHING:
+				continue  # Attribute added after the file was written
 			else:
 				atype = Any if a.type is None else a.type
 				kw[a.name] = self._from_json(atype, data[a.name], ctx)
@@ -131,6 +133,7 @@ class ResultsArchiveReader:
 	def _result_item_from_json(self, cls, data, ctx):
 		values = dict(
 			closest_genomes=[self._from_json(GenomeMatch, genome_data, ctx) for genome_data in data['closest_genomes']],
+			records=[self._from_json(QueryResultItem, record_data, ctx) for record_data in data.get('records', [])],
 		)
 		return self._attrs_from_json(QueryResultItem, data, ctx, values)
 
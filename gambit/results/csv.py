@@ -45,24 +45,64 @@ class CSVResultsExporter(AbstractResultsExporter):
 		('next.threshold', 'classifier_result.next_taxon.distance_threshold'),
 	]
 
+	#: Additional columns for assembly statistics, only included if they were calculated.
+	STATS_COLUMNS = [
+		('qc.total_length', 'input.stats.total_length'),
+		('qc.ncontigs', 'input.stats.ncontigs'),
+		('qc.n50', 'input.stats.n50'),
+		('qc.gc_content', 'input.stats.gc_content'),
+		('qc.ambiguous_fraction', 'input.stats.ambiguous_fraction'),
+	]
+
 	def __init__(self, **format_opts):
 		if 'dialect' not in format_opts:
 			format_opts.setdefault('lineterminator', '\n')
 			format_opts.setdefault('quoting', csv.QUOTE_MINIMAL)
 		self.format_opts = format_opts
 
-	def get_header(self) -> List[str]:
+	def get_header(self, with_stats: bool = False) -> List[str]:
 		"""Get values for header row."""
-		return [name for name, _ in self.COLUMNS]
+		columns = self.COLUMNS + self.STATS_COLUMNS if with_stats else self.COLUMNS
+		return [name for name, _ in columns]
 
-	def get_row(self, item: QueryResultItem) -> List:
+	def get_row(self, item: QueryResultItem, with_stats: bool = False) -> List:
 		"""Get row values for single result item."""
-		return [getattr_nested(item, attrs, pass_none=True) for _, attrs in self.COLUMNS]
+		columns = self.COLUMNS + self.STATS_COLUMNS if with_stats else self.COLUMNS
+		return [getattr_nested(item, attrs, pass_none=True) for _, attrs in columns]
+
+	def get_record_rows(self, item: QueryResultItem, with_stats: bool = False) -> List[List]:
+		"""Get rows for the item and its records, with a ``record`` column after ``query``.
+
+		The item's own row comes first with an empty record value, followed by a row for each
+		record labeled with the parent item's query label.
+		"""
+		row = self.get_row(item, with_stats)
+		row.insert(1, None)
+		rows = [row]
+
+		for record in item.records:
+			row = self.get_row(record, with_stats)
+			row[0] = item.input.label
+			row.insert(1, record.input.label)
+			rows.append(row)
+
+		return rows
 
 	def export(self, file_or_path: Union[FilePath, TextIO], results: QueryResults):
+		# Only add record and stats columns if present, so output is otherwise unchanged
+		with_records = any(item.records for item in results.items)
+		with_stats = any(item.input.stats is not None for item in results.items)
+
 		with maybe_open(file_or_path, 'w') as f:
 			writer = csv.writer(f, **self.format_opts)
 
-			writer.writerow(self.get_header())
+			header = self.get_header(with_stats)
+			if with_records:
+				header.insert(1, 'record')
+			writer.writerow(header)
+
 			for item in results.items:
-				writer.writerow(self.get_row(item))
+				if with_records:
+					writer.writerows(self.get_record_rows(item, with_stats))
+				else:
+					writer.writerow(self.get_row(item, with_stats))
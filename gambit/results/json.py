@@ -26,20 +26,26 @@ class JSONResultsExporter(BaseJSONResultsExporter):
 
 	@to_json.register(QueryResultItem)
 	def _item_to_json(self, item: QueryResultItem):
-		return dict(
+		data = dict(
 			query=item.input,
 			predicted_taxon=item.report_taxon,
 			next_taxon=item.classifier_result.next_taxon,
 			closest_genomes=item.closest_genomes,
 		)
+		if item.records:
+			data['records'] = item.records
+		return data
 
 	@to_json.register(QueryInput)
 	def _input_to_json(self, input: QueryInput):
-		return dict(
+		data = dict(
 			name=input.label,
-			path=None if input.file is None else input.file.path,
+			path=None if input.file is None else str(input.file),
 			format=None if input.file is None else input.file.format,
 		)
+		if input.stats is not None:
+			data['stats'] = asdict(input.stats)
+		return data
 
 	@to_json.register(ReferenceGenomeSet)
 	def _genomeset_to_json(self, gset: ReferenceGenomeSet):
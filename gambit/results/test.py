@@ -76,33 +76,57 @@ def check_json_results(file: TextIO,
 		assert data['timestamp'] == to_json(results.timestamp)
 
 	for item, item_data in zip(results.items, data['items']):
-		query = item_data['query']
-		assert query['name'] == item.input.label
+		check_json_item(item_data, item, strict)
 
-		if item.input.file is None:
-			assert query['path'] is None
-			assert query['format'] is None
 
+def check_json_item(item_data, item, strict: bool = False):
+	"""Check exported JSON data for a single result item, including its records."""
+	query = item_data['query']
+	assert query['name'] == item.input.label
+
+	if item.input.file is None:
+		assert query['path'] is None
+		assert query['format'] is None
+
+	else:
+		assert query['format'] == item.input.file.format
+
+		if strict:
+			assert query['path'] == str(item.input.file.path)
 		else:
-			assert query['format'] == item.input.file.format
+			assert Path(query['path']).name == item.input.file.path.name
+
+	# Assembly stats
+	if item.input.stats is None:
+		assert 'stats' not in query
+	else:
+		cmp_stats(query['stats'], item.input.stats)
 
-			if strict:
-				assert query['path'] == str(item.input.file.path)
-			else:
-				assert Path(query['path']).name == item.input.file.path.name
+	# Predicted taxon
+	predicted_data = item_data['predicted_taxon']
+	cmp_taxon_json(predicted_data, item.report_taxon)
+	if item.report_taxon is not None:
+		assert np.isclose(predicted_data['distance_threshold'], item.report_taxon.distance_threshold)
 
-		# Predicted taxon
-		predicted_data = item_data['predicted_taxon']
-		cmp_taxon_json(predicted_data, item.report_taxon)
-		if item.report_taxon is not None:
-			assert np.isclose(predicted_data['distance_threshold'], item.report_taxon.distance_threshold)
+	# Next taxon
+	cmp_taxon_json(item_data['next_taxon'], item.classifier_result.next_taxon)
 
-		# Next taxon
-		cmp_taxon_json(item_data['next_taxon'], item.classifier_result.next_taxon)
+	# Closest genomes
+	for match, match_data in zip_strict(item.closest_genomes, item_data['closest_genomes']):
+		cmp_genomematch_json(match_data, match)
 
-		# Closest genomes
-		for match, match_data in zip_strict(item.closest_genomes, item_data['closest_genomes']):
-			cmp_genomematch_json(match_data, match)
+	# Records
+	for record, record_data in zip_strict(item.records, item_data.get('records', [])):
+		check_json_item(record_data, record, strict)
+
+
+def cmp_stats(data, stats):
+	"""Compare exported assembly stats (JSON or CSV row with ``qc.`` prefix stripped)."""
+	assert int(data['total_length']) == stats.total_length
+	assert int(data['ncontigs']) == stats.ncontigs
+	assert int(data['n50']) == stats.n50
+	assert np.isclose(float(data['gc_content']), stats.gc_content)
+	assert np.isclose(float(data['ambiguous_fraction']), stats.ambiguous_fraction)
 
 
 def cmp_csv_taxon(row, taxon, prefix):
@@ -139,10 +163,21 @@ def check_csv_results(file: TextIO, results: QueryResults, strict: bool = False)
 	"""
 
 	rows = list(csv.DictReader(file))
-	assert len(rows) == len(results.items)
 
-	for item, row in zip(results.items, rows):
-		assert row['query'] == item.input.label
+	# Records follow their parent item
+	expected = []
+	for item in results.items:
+		expected.append((item, item.input.label, ''))
+		expected.extend((record, item.input.label, record.input.label) for record in item.records)
+
+	assert len(rows) == len(expected)
+
+	for (item, label, record_label), row in zip(expected, rows):
+		assert row['query'] == label
+		assert row.get('record', '') == record_label
+
+		if item.input.stats is not None:
+			cmp_stats({k[3:]: v for k, v in row.items() if k.startswith('qc.')}, item.input.stats)
 
 		cmp_csv_taxon(row, item.report_taxon, 'predicted')
 		cmp_csv_taxon(row, item.classifier_result.next_taxon, 'next')
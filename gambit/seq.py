@@ -11,16 +11,19 @@ bytes containing ascii-encoded nucleotide codes.
 	sequences.
 """
 from pathlib import Path
-from typing import Union, Optional, IO, Iterable, List
+from typing import Union, Optional, IO, Iterable, List, BinaryIO, Iterator, Tuple, NamedTuple
 from os import PathLike
+from io import BytesIO, TextIOWrapper
 
+import numpy as np
 from Bio import SeqIO
 from Bio.Seq import Seq
-from attr import attrs, attrib
+from attr import attrs, attrib, evolve
 
-from gambit._cython.kmers import revcomp
+from gambit._cython.kmers import revcomp, filter_whitespace, nucleotide_counts
 from gambit.util.io import FilePath
-from gambit.util.io import open_compressed, ClosingIterator
+from gambit.util.io import open_compressed, guess_compression, decompress, ClosingIterator, MappedFile
+from gambit.util.archive import list_members, read_member, iter_members
 
 
 # Byte representations of the four nucleotide codes in the order used for
@@ -33,7 +36,10 @@ SEQ_TYPES = (str, bytes, bytearray, Seq)
 DNASeq = Union[SEQ_TYPES]
 
 #: Sequence types accepted directly by native (Cython) code.
-DNASeqBytes = Union[bytes, bytearray]
+DNASeqBytes = Union[bytes, bytearray, memoryview]
+
+#: Default size of blocks read by :func:`.iter_fasta_blocks`.
+DEFAULT_BLOCK_SIZE = 2 ** 20
 
 
 def seq_to_bytes(seq: DNASeq) -> DNASeqBytes:
@@ -41,7 +47,7 @@ def seq_to_bytes(seq: DNASeq) -> DNASeqBytes:
 
 	This is for passing sequence data to Cython functions.
 	"""
-	if isinstance(seq, (bytes, bytearray)):
+	if isinstance(seq, (bytes, bytearray, memoryview)):
 		return seq
 	if isinstance(seq, str):
 		return seq.encode('ascii')
@@ -70,6 +76,335 @@ def validate_dna_seq_bytes(seq : bytes):
 			raise ValueError(f'Invalid byte at position {i}: {nuc}')
 
 
+def iter_fasta_blocks(fobj: BinaryIO, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[Tuple[bool, bytearray]]:
+	"""Read sequence data from a FASTA file in fixed-size blocks without parsing whole records.
+
+	Header lines and whitespace are removed, so each block yielded contains only sequence data. A
+	record's sequence may be split over any number of blocks. Any data before the first header line
+	is ignored, as in :func:`.iter_fasta_records`. Memory use is bounded by the block
+	size rather than the size of the largest record. Most of the work is done in native code
+	without the GIL.
+
+	Parameters
+	----------
+	fobj
+		Readable stream in binary mode.
+	block_size
+		Number of bytes to read from the stream at a time.
+
+	Returns
+	-------
+	Iterator[Tuple[bool, bytearray]]
+		Iterator of ``(record_start, data)`` tuples. ``record_start`` is True if ``data`` is the first
+		block of sequence data of a new record. Data blocks are never empty.
+	"""
+	if block_size < 1:
+		raise ValueError('block_size must be positive')
+
+	in_header = False
+	in_record = False  # Seen first header
+	record_start = True
+
+	while True:
+		block = fobj.read(block_size)
+		if not block:
+			break
+
+		pos = 0
+		while pos < len(block):
+			if in_header:
+				end = block.find(b'\n', pos)
+				if end < 0:
+					break
+				in_header = False
+				pos = end + 1
+				continue
+
+			# ">" can only appear at start of header lines
+			end = block.find(b'>', pos)
+
+			if not in_record:
+				if end < 0:
+					break
+				in_header = in_record = True
+				pos = end + 1
+				continue
+
+			data = bytearray(len(block) - pos if end < 0 else end - pos)
+			del data[filter_whitespace(memoryview(block)[pos:pos + len(data)], data):]
+
+			if data:
+				yield record_start, data
+				record_start = False
+
+			if end < 0:
+				break
+
+			in_header = True
+			record_start = True
+			pos = end + 1
+
+
+class FastaRecord(NamedTuple):
+	"""Record read from a FASTA file by :func:`.iter_fasta_records`.
+
+	Has ``id`` and ``seq`` attributes like :class:`Bio.SeqRecord.SeqRecord`, so it can be used in
+	its place where only these are needed.
+
+	Attributes
+	----------
+	id
+		First word of the record's header line (after the ``>``).
+	seq
+		Sequence data with whitespace removed.
+	"""
+	id: str
+	seq: bytearray
+
+
+def _fasta_header_id(header: bytes) -> str:
+	"""Get record ID from FASTA header line (without the ">"), in the same way as Biopython."""
+	words = header.split(None, 1)
+	return words[0].decode() if words else ''
+
+
+def iter_fasta_records(fobj: BinaryIO, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[FastaRecord]:
+	"""Parse records from a FASTA file in binary mode.
+
+	Faster alternative to :func:`Bio.SeqIO.parse` which avoids decoding the file to text and creating
+	``Seq`` objects. Each record's sequence is returned as a single ``bytearray`` with line breaks
+	and other whitespace removed in native code, so it can be passed to the k-mer search functions
+	directly. Any data before the first header line is ignored.
+
+	Parameters
+	----------
+	fobj
+		Readable stream in binary mode.
+	block_size
+		Number of bytes to read from the stream at a time.
+
+	Returns
+	-------
+	Iterator[FastaRecord]
+	"""
+	if block_size < 1:
+		raise ValueError('block_size must be positive')
+
+	scratch = bytearray(block_size)
+	in_header = False
+	header = bytearray()
+	record_id = None
+	seq = bytearray()
+
+	while True:
+		block = fobj.read(block_size)
+		if not block:
+			break
+
+		view = memoryview(block)
+		pos = 0
+		while pos < len(block):
+			if in_header:
+				end = block.find(b'\n', pos)
+				header += view[pos:len(block) if end < 0 else end]
+				if end < 0:
+					break
+				in_header = False
+				record_id = _fasta_header_id(header)
+				pos = end + 1
+				continue
+
+			# ">" can only appear at start of header lines
+			end = block.find(b'>', pos)
+			stop = len(block) if end < 0 else end
+			if record_id is not None and stop > pos:
+				n = filter_whitespace(view[pos:stop], scratch)
+				seq += memoryview(scratch)[:n]
+
+			if end < 0:
+				break
+
+			if record_id is not None:
+				yield FastaRecord(record_id, seq)
+				seq = bytearray()
+
+			in_header = True
+			header = bytearray()
+			pos = end + 1
+
+	if in_header:
+		record_id = _fasta_header_id(header)
+	if record_id is not None:
+		yield FastaRecord(record_id, seq)
+
+
+class FastaRegion(NamedTuple):
+	"""Location of a record in the raw data of a FASTA file, found by :func:`.iter_fasta_regions`.
+
+	Attributes
+	----------
+	id
+		First word of the record's header line (after the ``>``).
+	seq
+		Slice of the file data containing the record's sequence lines, including line breaks. Pass
+		``skip_whitespace=True`` to the k-mer search functions to search it directly.
+	"""
+	id: str
+	seq: memoryview
+
+
+def iter_fasta_regions(data) -> Iterator[FastaRegion]:
+	"""Locate the records in the raw contents of a FASTA file without copying sequence data.
+
+	Used to read memory-mapped files (see :meth:`.SequenceFile.map_fasta`). Only the header lines
+	are copied, each record's sequence is returned as a slice of the original data which still
+	contains line breaks. Records are found in the same way as :func:`.iter_fasta_records`, any data
+	before the first header line is ignored.
+
+	Parameters
+	----------
+	data
+		Contents of the file. Must support the buffer protocol and have a ``find()`` method like
+		``bytes`` or :class:`mmap.mmap`.
+
+	Returns
+	-------
+	Iterator[FastaRegion]
+	"""
+	view = memoryview(data)
+	n = len(view)
+	start = data.find(b'>')
+
+	while start >= 0:
+		eol = data.find(b'\n', start + 1)
+		if eol < 0:
+			yield FastaRegion(_fasta_header_id(bytes(view[start + 1:])), view[n:])
+			break
+
+		# ">" can only appear at start of header lines
+		next_start = data.find(b'>', eol + 1)
+		end = n if next_start < 0 else next_start
+		yield FastaRegion(_fasta_header_id(bytes(view[start + 1:eol])), view[eol + 1:end])
+		start = next_start
+
+
+def iter_fastq_seqs(fobj: BinaryIO) -> Iterator[bytes]:
+	"""Read the sequences of records in a FASTQ file as a stream, without parsing them fully.
+
+	Only the standard four-line record layout is supported (no line wrapping). Header and quality
+	lines are skipped, so memory use is bounded by the length of a single read.
+
+	Parameters
+	----------
+	fobj
+		Readable stream in binary mode.
+
+	Returns
+	-------
+	Iterator[bytes]
+		Iterator of the sequence of each record, with any trailing whitespace removed.
+	"""
+	lineno = 0
+
+	for header in fobj:
+		lineno += 1
+		if not header.strip():
+			continue
+		if not header.startswith(b'@'):
+			raise ValueError(f'Expected FASTQ record header starting with "@" on line {lineno}')
+
+		seq = fobj.readline()
+		plus = fobj.readline()
+		qual = fobj.readline()
+		lineno += 3
+
+		if not plus.startswith(b'+') or not qual:
+			raise ValueError(f'Truncated or malformed FASTQ record ending on line {lineno}')
+
+		yield seq.rstrip()
+
+
+@attrs(frozen=True)
+class AssemblyStats:
+	"""Summary statistics of a genome assembly, for quality control.
+
+	Attributes
+	----------
+	total_length
+		Total number of bases in all records.
+	ncontigs
+		Number of records (contigs) with non-empty sequences.
+	n50
+		Length of the shortest contig such that contigs at least this long contain at least half of
+		the total length.
+	gc_content
+		Fraction of unambiguous bases (``A``, ``C``, ``G`` or ``T``) which are ``G`` or ``C``.
+	ambiguous_fraction
+		Fraction of all bases which are not one of ``A``, ``C``, ``G`` or ``T``.
+	"""
+	total_length: int = attrib()
+	ncontigs: int = attrib()
+	n50: int = attrib()
+	gc_content: float = attrib()
+	ambiguous_fraction: float = attrib()
+
+
+class AssemblyStatsAccumulator:
+	"""Calculates :class:`.AssemblyStats` from sequence data as it is read.
+
+	Sequence data is passed to :meth:`add` as it is processed, so that the statistics can be
+	calculated in the same pass over a file as its k-mer signature. Nucleotides are counted in
+	native code without the GIL.
+	"""
+
+	def __init__(self):
+		self.counts = np.zeros(5, dtype=np.int64)  # A, C, G, T, other
+		self.lengths = []
+
+	def add(self, seq: DNASeqBytes, record_start: bool = True, skip_whitespace: bool = False):
+		"""Add sequence data.
+
+		Parameters
+		----------
+		seq
+			Sequence data.
+		record_start
+			Whether this is the start of a new record. If False the data is a continuation of the
+			previous record's sequence.
+		skip_whitespace
+			Ignore whitespace in ``seq`` (e.g. line breaks). Otherwise it is counted as a non-ACGT
+			character.
+		"""
+		length = nucleotide_counts(seq, self.counts, skip_whitespace=skip_whitespace)
+		if length == 0:
+			return
+		if record_start or not self.lengths:
+			self.lengths.append(length)
+		else:
+			self.lengths[-1] += length
+
+	def stats(self) -> AssemblyStats:
+		"""Get statistics of all sequence data added so far."""
+		total = int(self.counts.sum())
+		acgt = total - int(self.counts[4])
+
+		n50 = 0
+		covered = 0
+		for length in sorted(self.lengths, reverse=True):
+			covered += length
+			if 2 * covered >= total:
+				n50 = length
+				break
+
+		return AssemblyStats(
+			total_length=total,
+			ncontigs=len(self.lengths),
+			n50=n50,
+			gc_content=int(self.counts[1] + self.counts[2]) / acgt if acgt else 0.,
+			ambiguous_fraction=int(self.counts[4]) / total if total else 0.,
+		)
+
+
 @attrs(frozen=True, slots=True)
 class SequenceFile(PathLike):
 	"""A reference to a DNA sequence file stored in the file system.
@@ -78,6 +413,11 @@ class SequenceFile(PathLike):
 	:class:`os.PathLike` interface, so it can be substituted for a ``str`` or :class:`pathlib.Path`
 	in most function arguments that take a file path to open.
 
+	May also refer to a member of a tar or zip archive (see :mod:`gambit.util.archive`), in which
+	case :attr:`path` is the path to the archive. Members are read into memory in full when opened
+	and may only be opened for reading. See :func:`.stream_archive_members` for reading many
+	members of the same archive efficiently.
+
 	Parameters
 	----------
 	path : Union[os.PathLike, str]
@@ -86,6 +426,8 @@ class SequenceFile(PathLike):
 		Value of :attr:`format` attribute.
 	compression : Optional[str]
 		Value of :attr:`compression` attribute.
+	member : Optional[str]
+		Value of :attr:`member` attribute.
 
 	Attributes
 	----------
@@ -96,19 +438,32 @@ class SequenceFile(PathLike):
 		``'fasta'``.
 	compression
 		String describing compression method of the file, e.g. ``'gzip'``. None means no
-		compression. See :func:`gambit.util.io.open_compressed`.
+		compression. See :func:`gambit.util.io.open_compressed`. For archive members this is the
+		compression of the member itself, not of the archive.
+	member
+		Name of the file within the archive at :attr:`path`, or None if not an archive member.
 	"""
 	path: Path = attrib(converter=Path)
 	format: str = attrib()
 	compression: Optional[str] = attrib(default=None)
+	member: Optional[str] = attrib(default=None)
 
 	def __fspath__(self):
 		return str(self.path)
 
 	def __str__(self):
-		return str(self.path)
+		return str(self.path) if self.member is None else f'{self.path}/{self.member}'
+
+	def read_member(self) -> bytes:
+		"""Read the raw (possibly compressed) contents of the archive member."""
+		if self.member is None:
+			raise ValueError('Not an archive member')
+		return read_member(self.path, self.member)
+
+	def _member_contents(self) -> bytes:
+		return decompress(self.compression, self.read_member())
 
-	def open(self, mode: str = 'r', **kwargs) -> IO:
+	def open(self, mode: str = 'r', background: bool = False, **kwargs) -> IO:
 		"""
 		Open a stream to the file, with compression/decompression applied
 		transparently.
@@ -119,6 +474,9 @@ class SequenceFile(PathLike):
 		mode : str
 			Same as equivalent argument to the built-in :func:open`. Some modes may not be supported
 			by all compression types.
+		background : bool
+			Read and decompress the file in a background thread (read modes only), so that
+			decompression overlaps with processing of the data. See :class:`gambit.util.io.BackgroundReader`.
 		\\**kwargs
 			Additional text mode specific keyword arguments to pass to opener. Equivalent to the
 			following arguments of the built-in :func:`open`: ``encoding``, ``errors``, and
@@ -129,7 +487,13 @@ class SequenceFile(PathLike):
 		IO
 			Stream to file in given mode.
 		"""
-		return open_compressed(self.compression, self.path, mode, **kwargs)
+		if self.member is not None:
+			if mode not in ('r', 'rt', 'rb'):
+				raise ValueError('Archive members can only be opened for reading')
+			fobj = BytesIO(self._member_contents())
+			return fobj if mode == 'rb' else TextIOWrapper(fobj, **kwargs)
+
+		return open_compressed(self.compression, self.path, mode, background=background, **kwargs)
 
 	def parse(self, **kwargs) -> ClosingIterator[SeqIO.SeqRecord]:
 		"""Open the file and lazily parse its contents.
@@ -162,12 +526,106 @@ class SequenceFile(PathLike):
 			fobj.close()
 			raise
 
+	def parse_fasta(self,
+	                block_size: int = DEFAULT_BLOCK_SIZE,
+	                background: bool = False,
+	                ) -> ClosingIterator[FastaRecord]:
+		"""Open the file and lazily parse its contents with :func:`.iter_fasta_records`.
+
+		This is faster than :meth:`parse` but is only supported for FASTA format. The returned
+		iterator works in the same way.
+
+		Parameters
+		----------
+		block_size
+			Number of bytes to read from the file at a time.
+		background
+			Decompress the file in a background thread, see :meth:`open`.
+
+		Returns
+		-------
+		gambit.util.io.ClosingIterator
+			Iterator yielding :class:`.FastaRecord` instances for each sequence in the file.
+		"""
+		if self.format != 'fasta':
+			raise ValueError(f'Expected file in FASTA format, got {self.format!r}')
+
+		fobj = self.open('rb', background=background)
+
+		try:
+			return ClosingIterator(iter_fasta_records(fobj, block_size), fobj)
+
+		except:
+			fobj.close()
+			raise
+
+	def parse_seqs(self, background: bool = False) -> ClosingIterator[Union[SeqIO.SeqRecord, FastaRecord]]:
+		"""Open the file and lazily parse its records using the fastest parser available for its format.
+
+		Uses :meth:`parse_fasta` for FASTA files and :meth:`parse` (Biopython) for other formats.
+		Records have ``id`` and ``seq`` attributes in either case, but ``seq`` is a ``bytearray`` for
+		FASTA files and a :class:`Bio.Seq.Seq` otherwise. The ``background`` argument is passed to
+		:meth:`open`.
+		"""
+		if self.format == 'fasta':
+			return self.parse_fasta(background=background)
+		else:
+			return self.parse(background=background)
+
+	def resolve_compression(self) -> Optional[str]:
+		"""Get the compression method of the file, checking its contents if :attr:`compression` is ``'auto'``.
+
+		Returns
+		-------
+		Optional[str]
+			Key of :data:`gambit.util.io.COMPRESSED_OPENERS` other than ``'auto'``.
+		"""
+		if self.compression != 'auto':
+			return self.compression
+		if self.member is not None:
+			return guess_compression(BytesIO(self.read_member()[:16]))
+		with open(self.path, 'rb') as fobj:
+			return guess_compression(fobj)
+
+	def map_fasta(self) -> ClosingIterator[FastaRegion]:
+		"""Memory-map an uncompressed FASTA file and locate its records with :func:`.iter_fasta_regions`.
+
+		Sequence data is not copied. The returned iterator works in the same way as the one returned
+		by :meth:`parse` and closes the map when it is closed. Use :meth:`resolve_compression` to
+		check if the file is compressed first.
+
+		Archive members can't be mapped, instead their (decompressed) contents are read into memory
+		and the records located in the same way. This is allowed for any compression method.
+
+		Returns
+		-------
+		gambit.util.io.ClosingIterator
+			Iterator yielding :class:`.FastaRegion` instances for each record in the file.
+		"""
+		if self.format != 'fasta':
+			raise ValueError(f'Expected file in FASTA format, got {self.format!r}')
+		if self.member is not None:
+			data = self._member_contents()
+			# Stream is only there to be closed by the iterator, it shares data without copying
+			return ClosingIterator(iter_fasta_regions(data), BytesIO(data))
+		if self.resolve_compression() is not None:
+			raise ValueError('Memory mapping is only supported for uncompressed files')
+
+		mapped = MappedFile(self.path)
+
+		try:
+			return ClosingIterator(iter_fasta_regions(mapped.buffer), mapped)
+
+		except:
+			mapped.close()
+			raise
+
 	def absolute(self) -> 'SequenceFile':
 		"""Make a copy of the instance with an absolute path."""
 		if self.path.is_absolute():
 			return self
 		else:
-			return SequenceFile(self.path.absolute(), self.format, self.compression)
+			return evolve(self, path=self.path.absolute())
 
 	@classmethod
 	def from_paths(cls,
@@ -189,3 +647,96 @@ class SequenceFile(PathLike):
 			Compression method of files.
 		"""
 		return [cls(path, format, compression) for path in paths]
+
+	@classmethod
+	def from_archive(cls,
+	                 path: FilePath,
+	                 format: str,
+	                 compression: Optional[str] = None,
+	                 members: Optional[Iterable[str]] = None,
+	                 ) -> List['SequenceFile']:
+		"""Create instances for members of a tar or zip archive.
+
+		Parameters
+		----------
+		path
+			Path to archive file.
+		format
+			Sequence file format of members.
+		compression
+			Compression method of members (not of the archive itself).
+		members
+			Names of members. Defaults to all regular files in the archive, in the order they are
+			stored, as returned by :func:`gambit.util.archive.list_members`.
+		"""
+		if members is None:
+			members = list_members(path)
+		return [cls(path, format, compression, member) for member in members]
+
+
+@attrs(frozen=True, slots=True)
+class _LoadedMember(SequenceFile):
+	"""Archive member whose contents have already been read, see :func:`.stream_archive_members`."""
+	data: bytes = attrib(default=b'', eq=False, repr=False)
+
+	def read_member(self) -> bytes:
+		return self.data
+
+
+def stream_archive_members(files: Iterable[SequenceFile]) -> Iterator[SequenceFile]:
+	"""Read archive members sequentially, replacing them with copies holding their contents.
+
+	Consecutive members of the same archive are read from a single archive handle with
+	:func:`gambit.util.archive.iter_members`, instead of each opening the archive and seeking to its
+	own position when read. This is necessary to read many members of a compressed tar archive
+	efficiently. Other files are passed through unchanged. Archives are read lazily, and contents
+	are only held by the yielded objects.
+
+	Members should be given in the order they are stored in the archive, as returned by
+	:meth:`.SequenceFile.from_archive`. A member which comes before the previous one in the archive
+	is passed through unchanged and read separately when opened.
+
+	Parameters
+	----------
+	files
+		Sequence files, may be an iterator.
+
+	Returns
+	-------
+	Iterator[SequenceFile]
+		Yields an equivalent object for each item of ``files``, in the same order. Yielded archive
+		members behave identically to the originals but don't read the archive when opened.
+	"""
+	reader = None  # Iterator over members of current archive
+	reader_path = None
+
+	try:
+		for file in files:
+			if file.member is None:
+				yield file
+				continue
+
+			if reader is None or file.path != reader_path:
+				if reader is not None:
+					reader.close()
+				reader = iter_members(file.path)
+				reader_path = file.path
+
+			# Skip ahead to the member
+			data = None
+			for name, fobj in reader:
+				if name == file.member:
+					data = fobj.read()
+					break
+
+			if data is None:
+				# Member comes earlier in the archive (or is missing), start again for the next one
+				reader.close()
+				reader = None
+				yield file
+			else:
+				yield _LoadedMember(file.path, file.format, file.compression, file.member, data)
+
+	finally:
+		if reader is not None:
+			reader.close()
@@ -0,0 +1,221 @@
+"""Persistent on-disk cache of signatures calculated from genome files.
+
+Signatures are keyed by the SHA-256 hash of the file's contents plus the k-mer spec used to
+calculate them, so the same genome is only parsed once no matter how many times or under what path
+it is queried. The cache is stored in a single SQLite database which can be safely shared by several
+processes.
+"""
+
+import os
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Tuple, Sequence, List
+
+import numpy as np
+
+from .base import KmerSignature
+from gambit.kmers import KmerSpec
+from gambit.seq import stream_archive_members
+from gambit.util.io import FilePath
+
+
+#: Default maximum size of cached signature data, in bytes.
+DEFAULT_MAX_SIZE = 2 ** 30
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+	path TEXT PRIMARY KEY,
+	size INTEGER NOT NULL,
+	mtime_ns INTEGER NOT NULL,
+	hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signatures (
+	hash TEXT NOT NULL,
+	kmerspec TEXT NOT NULL,
+	nbytes INTEGER NOT NULL,
+	last_used INTEGER NOT NULL,  -- Logical clock for LRU eviction
+	data BLOB NOT NULL,
+	PRIMARY KEY (hash, kmerspec)
+);
+CREATE INDEX IF NOT EXISTS signatures_last_used ON signatures (last_used);
+'''
+
+_NEXT_CLOCK = '(SELECT COALESCE(MAX(last_used), 0) + 1 FROM signatures)'
+
+
+def file_content_hash(path: FilePath) -> str:
+	"""Get the hex-encoded SHA-256 hash of a file's contents."""
+	h = hashlib.sha256()
+	with open(path, 'rb') as f:
+		while True:
+			block = f.read(2 ** 20)
+			if not block:
+				break
+			h.update(block)
+	return h.hexdigest()
+
+
+def _kspec_key(kspec: KmerSpec) -> str:
+	return f'{kspec.k}/{kspec.prefix_str}'
+
+
+class SignatureCache:
+	"""Persistent cache of signatures calculated from genome files.
+
+	Signatures are keyed by file content hash and k-mer spec. The hash of each file is itself cached
+	along with the file's size and modification time, so files which have not changed do not need
+	to be read again. When the total size of cached signatures exceeds :attr:`max_size` the least
+	recently used signatures are evicted.
+
+	Uses a SQLite database which may be accessed concurrently from multiple processes. Instances
+	should not be shared between threads.
+
+	Attributes
+	----------
+	path
+		Path to database file.
+	max_size
+		Maximum total size of cached signature data in bytes. None means unlimited.
+	"""
+	path: Path
+	max_size: Optional[int]
+
+	def __init__(self, path: FilePath, max_size: Optional[int] = DEFAULT_MAX_SIZE):
+		"""
+		Parameters
+		----------
+		path
+			Path to database file. Will be created if it does not exist.
+		max_size
+			Maximum total size of cached signature data in bytes.
+		"""
+		self.path = Path(path)
+		self.max_size = max_size
+		self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+		self._conn.execute('PRAGMA journal_mode=WAL')
+		self._conn.execute('PRAGMA synchronous=NORMAL')
+		self._conn.executescript(_SCHEMA)
+
+	def close(self):
+		"""Close the database connection."""
+		self._conn.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def __repr__(self):
+		return f'{type(self).__name__}({str(self.path)!r})'
+
+	def file_hash(self, file: FilePath) -> str:
+		"""Get the content hash of a file, reading it only if it has changed since last checked.
+
+		If ``file`` is a :class:`gambit.seq.SequenceFile` referring to an archive member, the hash is of
+		the member's contents and is read again whenever the archive changes. Use :meth:`file_hashes`
+		for many members of the same archive.
+		"""
+		return self.file_hashes([file])[0]
+
+	def file_hashes(self, files: Sequence[FilePath]) -> List[str]:
+		"""Get the content hashes of several files, see :meth:`file_hash`.
+
+		Archive members which need to be hashed are read in a single sequential pass over each
+		archive (see :func:`gambit.seq.stream_archive_members`), so they should be given in the order
+		they are stored in the archive.
+		"""
+		hashes = []
+		stale = []  # (index, key, stat) of members to hash
+
+		for file in files:
+			path = os.path.abspath(file)
+			st = os.stat(path)
+			member = getattr(file, 'member', None)
+			key = path if member is None else f'{path}/{member}'
+
+			row = self._conn.execute('SELECT size, mtime_ns, hash FROM files WHERE path = ?', (key,)).fetchone()
+			if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+				hashes.append(row[2])
+			elif member is None:
+				hashes.append(self._put_file_hash(key, st, file_content_hash(path)))
+			else:
+				stale.append((len(hashes), key, st))
+				hashes.append(None)
+
+		loaded = stream_archive_members(files[i] for i, key, st in stale)
+		for (i, key, st), file in zip(stale, loaded):
+			hashes[i] = self._put_file_hash(key, st, hashlib.sha256(file.read_member()).hexdigest())
+
+		return hashes
+
+	def _put_file_hash(self, key: str, st: os.stat_result, h: str) -> str:
+		self._conn.execute(
+			'INSERT OR REPLACE INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)',
+			(key, st.st_size, st.st_mtime_ns, h),
+		)
+		return h
+
+	def get(self, hash: str, kspec: KmerSpec) -> Optional[KmerSignature]:
+		"""Get a cached signature by file content hash, or None if not present."""
+		key = (hash, _kspec_key(kspec))
+		row = self._conn.execute('SELECT data FROM signatures WHERE hash = ? AND kmerspec = ?', key).fetchone()
+		if row is None:
+			return None
+
+		self._conn.execute(f'UPDATE signatures SET last_used = {_NEXT_CLOCK} WHERE hash = ? AND kmerspec = ?', key)
+		return np.frombuffer(row[0], dtype=kspec.index_dtype).copy()
+
+	def put(self, hash: str, kspec: KmerSpec, sig: KmerSignature):
+		"""Add a signature to the cache and evict old entries if the size limit is exceeded."""
+		data = np.asarray(sig, dtype=kspec.index_dtype).tobytes()
+
+		with self._transaction():
+			self._conn.execute(
+				'INSERT OR REPLACE INTO signatures (hash, kmerspec, nbytes, last_used, data) '
+				f'VALUES (?, ?, ?, {_NEXT_CLOCK}, ?)',
+				(hash, _kspec_key(kspec), len(data), data),
+			)
+			if self.max_size is not None:
+				self._evict(self.max_size)
+
+	def size(self) -> Tuple[int, int]:
+		"""Get the number of cached signatures and their total size in bytes."""
+		n, nbytes = self._conn.execute('SELECT COUNT(*), TOTAL(nbytes) FROM signatures').fetchone()
+		return n, int(nbytes)
+
+	def clear(self):
+		"""Remove all entries from the cache."""
+		with self._transaction():
+			self._conn.execute('DELETE FROM signatures')
+			self._conn.execute('DELETE FROM files')
+
+	def _evict(self, max_size: int):
+		"""Remove least recently used signatures until total size is at most ``max_size``."""
+		total = self._conn.execute('SELECT TOTAL(nbytes) FROM signatures').fetchone()[0]
+		if total <= max_size:
+			return
+
+		rows = self._conn.execute('SELECT rowid, nbytes FROM signatures ORDER BY last_used').fetchall()
+		remove = []
+		for rowid, nbytes in rows:
+			if total <= max_size:
+				break
+			remove.append((rowid,))
+			total -= nbytes
+
+		self._conn.executemany('DELETE FROM signatures WHERE rowid = ?', remove)
+
+	@contextmanager
+	def _transaction(self):
+		"""Context manager for a write transaction, taking the lock up front to avoid deadlocks."""
+		self._conn.execute('BEGIN IMMEDIATE')
+		try:
+			yield
+		except BaseException:
+			self._conn.execute('ROLLBACK')
+			raise
+		self._conn.execute('COMMIT')
@@ -1,16 +1,30 @@
 """Calculate k-mer signatures from sequence data."""
 
-from typing import Optional, Sequence, MutableSet, Union, Iterable
+import os
+import threading
+from typing import Optional, Sequence, MutableSet, Union, Iterable, List, Callable, Any, Tuple, \
+	Iterator, ContextManager
 from abc import abstractmethod
-from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
-from contextlib import nullcontext
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, \
+	FIRST_COMPLETED
+from contextlib import nullcontext, contextmanager
+from functools import partial
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
 
 import numpy as np
-
-from .base import KmerSignature, SignatureList
-from gambit.kmers import KmerSpec, find_kmers, kmer_to_index, nkmers, index_dtype
-from gambit.seq import SEQ_TYPES, DNASeq, SequenceFile
+from Bio.SeqRecord import SeqRecord
+
+from .base import KmerSignature, SignatureList, SignatureArray, AbstractSignatureArray, AnnotatedSignatures
+from .cache import SignatureCache
+from gambit.kmers import KmerSpec, kmer_to_index, nkmers, index_dtype
+from gambit.seq import SEQ_TYPES, DNASeq, SequenceFile, seq_to_bytes, iter_fasta_blocks, iter_fastq_seqs, \
+	AssemblyStats, AssemblyStatsAccumulator, FastaRecord, DEFAULT_BLOCK_SIZE, stream_archive_members
+from gambit._cython.kmers import KmerSink, DenseSink, BitsetSink, IndexBuffer, CountSink, CountTable, \
+	scan_kmers_multi, scan_kmers_parallel, scan_kmers_batch, bitset_count, bitset_add, bitset_to_indices
+from gambit._cython.threads import omp_get_max_threads
 from gambit.util.progress import iter_progress, get_progress
+from gambit.util.pool import get_worker_pool
 
 
 class KmerAccumulator(MutableSet[int]):
@@ -37,11 +51,37 @@ class KmerAccumulator(MutableSet[int]):
 
 		self.add(idx)
 
+	def add_indices(self, indices: Iterable[int]):
+		"""Add multiple k-mers by their indices."""
+		for idx in indices:
+			self.add(idx)
+
+	def native_sink(self) -> Optional[KmerSink]:
+		"""Get a native sink which adds k-mers found in sequences directly to the accumulator.
+
+		Returns None if not supported, in which case indices are added with :meth:`add_indices`.
+		"""
+		return None
+
+	def merge(self, other: 'KmerAccumulator'):
+		"""Add all k-mers in another accumulator to this one."""
+		self.add_indices(other.signature())
+
 	@abstractmethod
 	def signature(self) -> KmerSignature:
 		"""Get signature for accumulated k-mers."""
 		pass
 
+	def pop_signature(self) -> KmerSignature:
+		"""Get signature for accumulated k-mers and remove them, leaving the accumulator empty.
+
+		Subclasses with dense storage clear only the entries which were set, which is much cheaper
+		than :meth:`clear` when few k-mers were found.
+		"""
+		sig = self.signature()
+		self.clear()
+		return sig
+
 
 class ArrayAccumulator(KmerAccumulator):
 	"""K-mer accumulator implemented as a dense boolean array.
@@ -55,6 +95,7 @@ class ArrayAccumulator(KmerAccumulator):
 		self.k = k
 		self.array = np.zeros(nkmers(k), dtype=bool)
 		self._dtype = index_dtype(self.k)
+		self._sink = DenseSink(self.array)
 
 	def __len__(self):
 		return self.array.sum()
@@ -70,6 +111,18 @@ class ArrayAccumulator(KmerAccumulator):
 	def add(self, i: int):
 		self.array[i] = True
 
+	def add_indices(self, indices: Iterable[int]):
+		self.array[np.asarray(indices, dtype=np.intp)] = True
+
+	def native_sink(self):
+		return self._sink
+
+	def merge(self, other: KmerAccumulator):
+		if isinstance(other, ArrayAccumulator) and other.k == self.k:
+			self.array |= other.array
+		else:
+			super().merge(other)
+
 	def discard(self, i: int):
 		self.array[i] = False
 
@@ -79,6 +132,147 @@ class ArrayAccumulator(KmerAccumulator):
 	def signature(self) -> KmerSignature:
 		return np.flatnonzero(self.array).astype(self._dtype)
 
+	def pop_signature(self) -> KmerSignature:
+		sig = self.signature()
+		self.array[sig] = False
+		return sig
+
+
+class BitsetAccumulator(KmerAccumulator):
+	"""K-mer accumulator implemented as a dense bit set.
+
+	Like :class:`.ArrayAccumulator` but uses a single bit per k-mer instead of a byte, which is
+	0.5 MiB for ``k=11``. Adding k-mers, counting and conversion to a signature are performed in
+	native code.
+
+	Attributes
+	----------
+	bits
+		``uint64`` array storing bit set. The bit for k-mer index ``i`` is bit ``i % 64`` of
+		element ``i // 64``.
+	"""
+	bits: np.ndarray
+
+	def __init__(self, k: int):
+		self.k = k
+		self.bits = np.zeros((nkmers(k) + 63) // 64, dtype=np.uint64)
+		self._dtype = index_dtype(self.k)
+		self._sink = BitsetSink(self.bits)
+
+	def __len__(self):
+		return bitset_count(self.bits)
+
+	def __iter__(self):
+		return iter(self.signature())
+
+	def _check_index(self, index: int):
+		if not 0 <= index < nkmers(self.k):
+			raise IndexError(f'Index {index} out of range')
+		return int(index) >> 6, 1 << (int(index) & 63)
+
+	def __contains__(self, index: int):
+		word, mask = self._check_index(index)
+		return bool(int(self.bits[word]) & mask)
+
+	def add(self, index: int):
+		word, mask = self._check_index(index)
+		self.bits[word] |= np.uint64(mask)
+
+	def discard(self, index: int):
+		word, mask = self._check_index(index)
+		self.bits[word] &= ~np.uint64(mask)
+
+	def add_indices(self, indices: Iterable[int]):
+		indices = np.asarray(indices, dtype=np.uint64)
+		if len(indices) > 0 and indices.max() >= nkmers(self.k):
+			raise IndexError('Index out of range')
+		bitset_add(self.bits, indices)
+
+	def native_sink(self):
+		return self._sink
+
+	def merge(self, other: KmerAccumulator):
+		if isinstance(other, BitsetAccumulator) and other.k == self.k:
+			self.bits |= other.bits
+		else:
+			super().merge(other)
+
+	def clear(self):
+		self.bits[:] = 0
+
+	def signature(self) -> KmerSignature:
+		return bitset_to_indices(self.bits, self._dtype)
+
+	def pop_signature(self) -> KmerSignature:
+		sig = self.signature()
+		self.bits[sig >> 6] = 0
+		return sig
+
+
+class BufferAccumulator(KmerAccumulator):
+	"""Accumulator which appends k-mer indices to a growable native buffer.
+
+	Duplicates are removed by sorting the buffer in place when the signature is requested (or the
+	set is otherwise inspected). This uses 8 bytes per buffered k-mer and is much more efficient than
+	:class:`.SetAccumulator` for large values of ``k``.
+
+	Attributes
+	----------
+	buffer
+		Native buffer storing indices.
+	"""
+	buffer: IndexBuffer
+
+	def __init__(self, k: int, dedup_threshold: Optional[int] = None):
+		"""
+		Parameters
+		----------
+		k
+			Value of ``k``.
+		dedup_threshold
+			If not None, remove duplicates from the buffer whenever it reaches this size, to bound
+			memory usage.
+		"""
+		self.k = k
+		self.buffer = IndexBuffer(dedup_threshold=dedup_threshold, key_bits=2 * k)
+		self._dtype = index_dtype(self.k)
+
+	def __len__(self):
+		self.buffer.sort_unique()
+		return len(self.buffer)
+
+	def __iter__(self):
+		return iter(self.signature())
+
+	def __contains__(self, index: int):
+		sig = self.signature()
+		i = np.searchsorted(sig, index)
+		return i < len(sig) and sig[i] == index
+
+	def add(self, index: int):
+		self.add_indices([index])
+
+	def add_indices(self, indices: Iterable[int]):
+		indices = np.asarray(indices, dtype=np.uint64)
+		if len(indices) > 0 and indices.max() >= nkmers(self.k):
+			raise IndexError('Index out of range')
+		self.buffer.extend(indices)
+
+	def native_sink(self):
+		return self.buffer
+
+	def discard(self, index: int):
+		sig = self.signature()
+		self.buffer.clear()
+		self.buffer.extend(sig[sig != index].astype(np.uint64))
+
+	def clear(self):
+		self.buffer.clear()
+
+	def signature(self) -> KmerSignature:
+		self.buffer.sort_unique()
+		return self.buffer.indices(self._dtype)
+
 
 class SetAccumulator(KmerAccumulator):
 	"""Accumulator which uses the builtin Python ``set`` class.
@@ -112,29 +306,262 @@ class SetAccumulator(KmerAccumulator):
 	def add(self, index: int):
 		self.set.add(self._dtype.type(index))
 
+	def add_indices(self, indices: Iterable[int]):
+		self.set.update(np.asarray(indices, dtype=self._dtype))
+
 	def signature(self) -> KmerSignature:
 		sig = np.fromiter(self.set, dtype=self._dtype)
 		sig.sort()
 		return sig
 
 
+class CountingAccumulator(KmerAccumulator):
+	"""Base class for accumulators which count the number of times each k-mer is found.
+
+	Used to calculate signatures from sequencing reads, where k-mers arising from sequencing errors
+	are typically only seen once or twice while those in the genome are seen roughly as many times
+	as the coverage depth. The set interface and the signature only include "solid" k-mers which
+	have been found at least :attr:`min_count` times, so calling :meth:`add` on an index does not
+	necessarily make it a member. Counts saturate at 255.
+
+	Attributes
+	----------
+	min_count
+		Minimum number of times a k-mer must be found to be included in the signature.
+	"""
+	min_count: int
+
+	def __init__(self, k: int, min_count: int = 2):
+		if not 1 <= min_count <= 255:
+			raise ValueError('min_count must be between 1 and 255')
+		self.k = k
+		self.min_count = min_count
+		self._dtype = index_dtype(self.k)
+
+	@abstractmethod
+	def count(self, index: int) -> int:
+		"""Get the number of times a k-mer has been found."""
+		pass
+
+	@abstractmethod
+	def counts(self) -> Tuple[np.ndarray, np.ndarray]:
+		"""Get the indices and counts of all k-mers found at least once, sorted by index."""
+		pass
+
+	def _check_indices(self, indices: Iterable[int]) -> np.ndarray:
+		indices = np.asarray(indices, dtype=np.uint64)
+		if len(indices) > 0 and indices.max() >= nkmers(self.k):
+			raise IndexError('Index out of range')
+		return indices
+
+	def __len__(self):
+		return len(self.signature())
+
+	def __iter__(self):
+		return iter(self.signature())
+
+	def __contains__(self, index: int):
+		return self.count(index) >= self.min_count
+
+	def add(self, index: int):
+		self.add_indices([index])
+
+	def merge(self, other: KmerAccumulator):
+		"""Add the counts of all k-mers in another counting accumulator to this one.
+
+		If ``other`` is not a :class:`.CountingAccumulator` each k-mer in it is counted once.
+		"""
+		if not isinstance(other, CountingAccumulator):
+			return super().merge(other)
+
+		indices, counts = other.counts()
+		self.add_indices(np.repeat(indices, counts))
+
+
+class CountArrayAccumulator(CountingAccumulator):
+	"""Counting accumulator which stores a count for every possible k-mer in a dense array.
+
+	Uses one byte per possible k-mer (4 MiB for ``k=11``), so is only suitable for small ``k``.
+
+	Attributes
+	----------
+	array
+		``uint8`` array of counts indexed by k-mer index.
+	"""
+	array: np.ndarray
+
+	def __init__(self, k: int, min_count: int = 2):
+		super().__init__(k, min_count)
+		self.array = np.zeros(nkmers(k), dtype=np.uint8)
+		self._sink = CountSink(self.array)
+
+	def count(self, index: int) -> int:
+		return int(self.array[index])
+
+	def counts(self):
+		indices = np.flatnonzero(self.array)
+		return indices.astype(self._dtype), self.array[indices]
+
+	def add_indices(self, indices: Iterable[int]):
+		self._sink.add(self._check_indices(indices))
+
+	def native_sink(self):
+		return self._sink
+
+	def merge(self, other: KmerAccumulator):
+		if isinstance(other, CountArrayAccumulator) and other.k == self.k:
+			np.minimum(self.array.astype(np.uint16) + other.array, 255, out=self.array, casting='unsafe')
+		else:
+			super().merge(other)
+
+	def discard(self, index: int):
+		self.array[index] = 0
+
+	def clear(self):
+		self.array[:] = 0
+
+	def signature(self) -> KmerSignature:
+		return np.flatnonzero(self.array >= self.min_count).astype(self._dtype)
+
+
+class CountTableAccumulator(CountingAccumulator):
+	"""Counting accumulator which stores counts in a native hash table.
+
+	Memory use is proportional to the number of distinct k-mers found rather than the number of
+	possible k-mers, so this is suitable for large ``k``.
+
+	Attributes
+	----------
+	table
+		Native hash table storing counts.
+	"""
+	table: CountTable
+
+	def __init__(self, k: int, min_count: int = 2):
+		super().__init__(k, min_count)
+		self.table = CountTable()
+
+	def count(self, index: int) -> int:
+		return self.table.get(index)
+
+	def counts(self):
+		return self.table.items(dtype=self._dtype)
+
+	def add_indices(self, indices: Iterable[int]):
+		self.table.add(self._check_indices(indices))
+
+	def native_sink(self):
+		return self.table
+
+	def discard(self, index: int):
+		self.table.remove(index)
+
+	def clear(self):
+		self.table.clear()
+
+	def signature(self) -> KmerSignature:
+		return self.table.items(self.min_count, dtype=self._dtype)[0]
+
+
 def default_accumulator(k: int) -> KmerAccumulator:
 	"""Get a default k-mer accumulator instance for the given value of ``k``.
 
-	Returns a :class:`.ArrayAccumulator` for ``k <= 11`` and a :class:`.SetAccumulator` for
+	Returns a :class:`.BitsetAccumulator` for ``k <= 11`` and a :class:`.BufferAccumulator` for
 	``k > 11``.
 	"""
-	return SetAccumulator(k) if k > 11 else ArrayAccumulator(k)
+	return BufferAccumulator(k) if k > 11 else BitsetAccumulator(k)
+
+
+def default_counting_accumulator(k: int, min_count: int = 2) -> CountingAccumulator:
+	"""Get a default counting k-mer accumulator instance for the given value of ``k``.
+
+	Returns a :class:`.CountArrayAccumulator` for ``k <= 11`` and a :class:`.CountTableAccumulator`
+	for ``k > 11``.
+	"""
+	return CountTableAccumulator(k, min_count) if k > 11 else CountArrayAccumulator(k, min_count)
+
+
+# Per-thread state reused between calls to avoid repeated allocation
+_scratch = threading.local()
+
+
+@contextmanager
+def _scratch_accumulators(ks: Sequence[int]) -> Iterator[List[KmerAccumulator]]:
+	"""Context manager which borrows empty default accumulators owned by the current thread.
+
+	Accumulators are returned to the thread's pool on exit and reused by later calls, so that the
+	dense storage used for small ``k`` is not allocated and zero-filled once per file. They must be
+	left empty (e.g. by using :meth:`.KmerAccumulator.pop_signature`), otherwise they are cleared if
+	an exception occurred.
+	"""
+	pool = _scratch.__dict__.setdefault('accumulators', {})
+	accumulators = [pool[k].pop() if pool.get(k) else default_accumulator(k) for k in ks]
+	try:
+		yield accumulators
+	except BaseException:
+		for acc in accumulators:
+			acc.clear()
+		raise
+	finally:
+		for k, acc in zip(ks, accumulators):
+			pool.setdefault(k, []).append(acc)
+
+
+def _scratch_index_buffer(k: int) -> IndexBuffer:
+	"""Get an empty index buffer owned by the current thread, for storing indices of k-mers of length ``k``."""
+	buffers = _scratch.__dict__.setdefault('index_buffers', {})
+	buf = buffers.get(k)
+	if buf is None:
+		buf = buffers[k] = IndexBuffer(key_bits=2 * k)
+	buf.clear()
+	return buf
 
 
 def accumulate_kmers(accumulator: KmerAccumulator, kmerspec: KmerSpec, seq: DNASeq):
-	"""Find k-mer matches in sequence and add their indices to an accumulator."""
-	for match in find_kmers(kmerspec, seq):
-		try:
-			index = match.kmer_index()
-		except ValueError:
-			continue
-		accumulator.add(index)
+	"""Find k-mer matches in sequence and add their indices to an accumulator.
+
+	K-mers are found in native code (see :func:`gambit.kmers.find_kmer_indices`) and written directly
+	to the accumulator if it supports it (see :meth:`.KmerAccumulator.native_sink`).
+	"""
+	accumulate_kmers_multi([accumulator], [kmerspec], seq)
+
+
+def accumulate_kmers_multi(accumulators: Sequence[KmerAccumulator],
+                           kmerspecs: Sequence[KmerSpec],
+                           seq: DNASeq,
+                           *,
+                           skip_whitespace: bool = False,
+                           ):
+	"""Find k-mer matches for several k-mer specs in a single pass and add them to accumulators.
+
+	Parameters
+	----------
+	accumulators
+		Accumulator for each k-mer spec.
+	kmerspecs
+		K-mer specs to search for.
+	seq
+		Sequence to search within.
+	skip_whitespace
+		Ignore whitespace in the sequence, see :func:`gambit._cython.kmers.scan_kmers`.
+	"""
+	sinks = []
+	buffered = []
+
+	for accumulator, kspec in zip(accumulators, kmerspecs):
+		sink = accumulator.native_sink()
+		if sink is None:
+			# Only the first uses the thread's scratch buffer, there is normally at most one
+			sink = IndexBuffer(key_bits=2 * kspec.k) if buffered else _scratch_index_buffer(kspec.k)
+			buffered.append((accumulator, sink))
+		sinks.append(sink)
+
+	specs = [(kspec.prefix, kspec.k) for kspec in kmerspecs]
+	scan_kmers_multi(seq_to_bytes(seq), specs, sinks, skip_whitespace=skip_whitespace)
+
+	for accumulator, buf in buffered:
+		accumulator.add_indices(buf.indices())
+		buf.clear()
 
 
 def calc_signature(kmerspec: KmerSpec,
@@ -164,28 +591,171 @@ def calc_signature(kmerspec: KmerSpec,
 	See Also
 	--------
 	.calc_file_signature
+	.calc_signature_multi
+	"""
+	accumulators = None if accumulator is None else [accumulator]
+	return calc_signature_multi([kmerspec], seqs, accumulators=accumulators)[0]
+
+
+def calc_signature_multi(kmerspecs: Sequence[KmerSpec],
+                         seqs: Union[DNASeq, Iterable[DNASeq]],
+                         *,
+                         accumulators: Optional[Sequence[KmerAccumulator]] = None,
+                         ) -> List[KmerSignature]:
+	"""Calculate k-mer signatures for several k-mer specs with a single pass over the sequence data.
+
+	Parameters
+	----------
+	kmerspecs
+		K-mer specs to use for search.
+	seqs
+		Sequence or sequences to search within. Lowercase characters are OK.
+	accumulators
+		Accumulator to use for each k-mer spec. Defaults to :func:`.default_accumulator`.
+
+	Returns
+	-------
+	List[numpy.ndarray]
+		K-mer signature for each spec.
+
+	See Also
+	--------
+	.calc_signature
 	"""
 	if isinstance(seqs, SEQ_TYPES):
 		seqs = [seqs]
 
-	if accumulator is None:
-		accumulator = default_accumulator(kmerspec.k)
+	if accumulators is None:
+		with _scratch_accumulators([kspec.k for kspec in kmerspecs]) as accumulators:
+			for seq in seqs:
+				accumulate_kmers_multi(accumulators, kmerspecs, seq)
+			return [acc.pop_signature() for acc in accumulators]
+
+	if len(accumulators) != len(kmerspecs):
+		raise ValueError('Number of accumulators does not match number of k-mer specs')
 
 	for seq in seqs:
-		accumulate_kmers(accumulator, kmerspec, seq)
+		accumulate_kmers_multi(accumulators, kmerspecs, seq)
 
-	return accumulator.signature()
+	return [acc.signature() for acc in accumulators]
+
+
+def calc_signature_parallel(kmerspec: KmerSpec,
+                            seqs: Union[DNASeq, Iterable[DNASeq]],
+                            *,
+                            nthreads: Optional[int] = None,
+                            chunk_size: int = 2 ** 20,
+                            accumulator_factory: Callable[[int], KmerAccumulator] = default_accumulator,
+                            ) -> KmerSignature:
+	"""Calculate the k-mer signature of a single genome using multiple threads.
+
+	Contigs, or chunks of large contigs, are scanned in parallel in native code with a separate
+	accumulator for each thread. The accumulators are then merged into a single signature. Results
+	are identical to :func:`.calc_signature`. This is useful for reducing the latency of processing
+	a single genome, :func:`.calc_file_signatures` only parallelizes across files.
+
+	Parameters
+	----------
+	kmerspec
+		K-mer spec to use for search.
+	seqs
+		Sequence or sequences to search within. Lowercase characters are OK.
+	nthreads
+		Number of threads to use. Defaults to the value of :func:`gambit._cython.threads.omp_get_max_threads`.
+	chunk_size
+		Maximum size of sequence chunks processed by each thread.
+	accumulator_factory
+		Function which creates an accumulator for each thread given the value of ``k``. Defaults to
+		:func:`.default_accumulator`. Accumulators must support :meth:`.KmerAccumulator.native_sink`.
+
+	See Also
+	--------
+	.calc_signature
+	gambit._cython.kmers.scan_kmers_parallel
+	"""
+	if isinstance(seqs, SEQ_TYPES):
+		seqs = [seqs]
+	if nthreads is None:
+		nthreads = omp_get_max_threads()
+	elif nthreads < 1:
+		raise ValueError('nthreads must be positive')
+
+	accumulators = [accumulator_factory(kmerspec.k) for _ in range(nthreads)]
+	sinks = [acc.native_sink() for acc in accumulators]
+	if any(sink is None for sink in sinks):
+		raise TypeError('Accumulator does not support native sink')
+
+	seqs = [seq_to_bytes(seq) for seq in seqs]
+	scan_kmers_parallel(seqs, kmerspec.prefix, kmerspec.k, sinks, chunk_size=chunk_size)
+
+	result = accumulators[0]
+	for acc in accumulators[1:]:
+		result.merge(acc)
+
+	return result.signature()
+
+
+def calc_signatures_batch(kmerspec: KmerSpec,
+                          seqs: Iterable[Any],
+                          *,
+                          nthreads: Optional[int] = None,
+                          ) -> SignatureArray:
+	"""Calculate the k-mer signatures of many in-memory sequences using multiple threads.
+
+	Each sequence is treated as a separate genome. The sequences are distributed between native
+	threads which run without the GIL, reading sequence data directly from each object's buffer
+	without copying. Results are identical to calling :func:`.calc_signature` on each sequence.
+
+	Parameters
+	----------
+	kmerspec
+		K-mer spec to use for search.
+	seqs
+		Sequences to calculate signatures of. These may be any objects supporting the buffer
+		protocol which expose a contiguous 1-dimensional array of bytes, such as ``bytes``,
+		``bytearray``, ``memoryview`` and ``uint8`` NumPy arrays. ``str`` and :class:`Bio.Seq.Seq`
+		are also accepted but are converted to bytes first.
+	nthreads
+		Number of threads to use. Defaults to the value of :func:`gambit._cython.threads.omp_get_max_threads`.
+
+	Returns
+	-------
+	.SignatureArray
+		Array containing the signature of each sequence.
+
+	See Also
+	--------
+	.calc_signature
+	gambit._cython.kmers.scan_kmers_batch
+	"""
+	if nthreads is None:
+		nthreads = omp_get_max_threads()
+	elif nthreads < 1:
+		raise ValueError('nthreads must be positive')
+
+	seqs = [seq_to_bytes(seq) if isinstance(seq, SEQ_TYPES) else seq for seq in seqs]
+	values, bounds = scan_kmers_batch(seqs, kmerspec.prefix, kmerspec.k, nthreads=nthreads)
+	return SignatureArray.from_arrays(values.astype(kmerspec.index_dtype, copy=False), bounds, kmerspec)
 
 
 def calc_file_signature(kspec: KmerSpec,
                         seqfile: SequenceFile,
                         *,
                         accumulator: Optional[KmerAccumulator] = None,
-                        ) -> KmerSignature:
+                        block_size: Optional[int] = None,
+                        nthreads: Optional[int] = None,
+                        records: bool = False,
+                        group_by: Optional[Callable[[str], str]] = None,
+                        stats: bool = False,
+                        background: bool = False,
+                        memory_map: bool = True,
+                        ) -> Union[KmerSignature, tuple]:
 	"""Open a sequence file on disk and calculate its k-mer signature.
 
 	This works identically to :func:`.calc_signature_parse` but takes a :class:`.SequenceFile` as
-	input instead of a data stream.
+	input instead of a data stream. FASTA files are parsed with the faster
+	:func:`gambit.seq.iter_fasta_records`, other formats with Biopython (see
+	:meth:`gambit.seq.SequenceFile.parse_seqs`).
 
 	Parameters
 	----------
@@ -195,20 +765,515 @@ def calc_file_signature(kspec: KmerSpec,
 		File to read.
 	accumulator
 		TODO
+	block_size
+		If not None, stream the file in blocks of this many bytes instead of parsing complete
+		records, so that memory use does not depend on the size of the largest sequence. Only
+		applies to FASTA format, other formats are always parsed with BioPython. See
+		:func:`gambit.seq.iter_fasta_blocks`. Reading, decompression and k-mer search then mostly
+		run without the GIL.
+	nthreads
+		If not None, find k-mers using this many threads with :func:`.calc_signature_parallel`.
+		Not compatible with ``accumulator`` or ``block_size``.
+	records
+		Also return the signature of each record (e.g. contig) in the file. These are found in the
+		same pass over the sequence data, the whole-file signature is their union. Not compatible
+		with ``accumulator``, ``block_size`` or ``nthreads``.
+	group_by
+		Function which maps record IDs to group labels. If given, records with the same label are
+		combined into a single signature. Implies ``records=True``. Otherwise each record gets its own
+		signature, even if record IDs are not unique.
+	stats
+		Also return :class:`gambit.seq.AssemblyStats` for the file, calculated from the sequence
+		data as it is searched for k-mers instead of reading the file again.
+	background
+		Read and decompress the file in a background thread, so that decompression overlaps with
+		parsing and k-mer search. See :class:`gambit.util.io.BackgroundReader`. Mostly useful for
+		compressed files when the file is not one of many processed concurrently.
+	memory_map
+		Memory-map uncompressed FASTA files and search each record's sequence lines in place (see
+		:meth:`gambit.seq.SequenceFile.map_fasta`), so that no copy of the sequence data is made.
+		Line breaks are skipped by the k-mer scanner. Takes precedence over ``block_size`` and
+		``background``, has no effect on compressed files or with ``nthreads``. Archive members in
+		FASTA format are read into memory and searched in the same way, whatever their compression.
 
 	Returns
 	-------
-	numpy.ndarray
+	Union[numpy.ndarray, tuple]
 		K-mer signature in sparse coordinate format (dtype will match
-		:func:`gambit.kmers.dense_to_sparse`).
+		:func:`gambit.kmers.dense_to_sparse`). If ``records`` or ``stats`` is True, a tuple of the
+		signature followed by the record signatures and/or statistics, in that order. Record
+		signatures are given as an :class:`.AnnotatedSignatures` with the ID of each record (or
+		group label) in the ``ids`` attribute, in order of first appearance in the file.
 
 	See Also
 	--------
 	.calc_signature
 	.calc_file_signatures
 	"""
-	with seqfile.parse() as records:
-		return calc_signature(kspec, (record.seq for record in records))
+	if records or group_by is not None:
+		if accumulator is not None or block_size is not None or nthreads is not None:
+			raise ValueError('records is not compatible with accumulator, block_size or nthreads')
+		return _calc_record_signatures(kspec, seqfile, group_by, stats, background, memory_map)
+
+	if nthreads is not None:
+		if accumulator is not None or block_size is not None:
+			raise ValueError('nthreads is not compatible with accumulator or block_size')
+		stats_acc = AssemblyStatsAccumulator() if stats else None
+		with seqfile.parse_seqs(background=background) as parsed:
+			seqs = list(_iter_seqs(parsed, stats_acc))
+		sig = calc_signature_parallel(kspec, seqs, nthreads=nthreads)
+		return (sig, stats_acc.stats()) if stats else sig
+
+	accumulators = None if accumulator is None else [accumulator]
+	result = calc_file_signature_multi([kspec], seqfile, accumulators=accumulators, block_size=block_size,
+	                                   stats=stats, background=background, memory_map=memory_map)
+	return (result[0][0], result[1]) if stats else result[0]
+
+
+def _iter_seqs(records: Iterable[Union[SeqRecord, FastaRecord]],
+               stats_acc: Optional[AssemblyStatsAccumulator],
+               ) -> Iterator[bytes]:
+	"""Get sequence data of parsed records as bytes, adding it to a stats accumulator on the way."""
+	for record in records:
+		seq = seq_to_bytes(record.seq)
+		if stats_acc is not None:
+			stats_acc.add(seq)
+		yield seq
+
+
+def _memory_mappable(seqfile: SequenceFile) -> bool:
+	"""Check if a sequence file can be read with :meth:`gambit.seq.SequenceFile.map_fasta`."""
+	if seqfile.format != 'fasta':
+		return False
+	return seqfile.member is not None or seqfile.resolve_compression() is None
+
+
+def _calc_record_signatures(kspec: KmerSpec,
+                            seqfile: SequenceFile,
+                            group_by: Optional[Callable[[str], str]],
+                            stats: bool,
+                            background: bool = False,
+                            memory_map: bool = True,
+                            ) -> tuple:
+	"""Calculate signatures of each record in a file along with the signature of the whole file.
+
+	Each record is scanned once into the thread's scratch index buffer. The whole-file signature is
+	built from the union of the record signatures rather than by searching the sequence again.
+	"""
+	buf = _scratch_index_buffer(kspec.k)
+	spec = [(kspec.prefix, kspec.k)]
+	ids = []
+	groups = []  # List of signatures for each record or group
+	group_index = dict()  # Group label -> index
+	stats_acc = AssemblyStatsAccumulator() if stats else None
+
+	# Mapped records still contain line breaks
+	mapped = memory_map and _memory_mappable(seqfile)
+	records = seqfile.map_fasta() if mapped else seqfile.parse_seqs(background=background)
+
+	with _scratch_accumulators([kspec.k]) as (accumulator,), records as parsed:
+		for record in parsed:
+			seq = seq_to_bytes(record.seq)
+			if stats_acc is not None:
+				stats_acc.add(seq, skip_whitespace=mapped)
+
+			scan_kmers_multi(seq, spec, [buf], skip_whitespace=mapped)
+			buf.sort_unique()
+			sig = buf.indices(kspec.index_dtype)
+			buf.clear()
+
+			accumulator.add_indices(sig)
+
+			if group_by is None:
+				ids.append(record.id)
+				groups.append([sig])
+				continue
+
+			label = group_by(record.id)
+			if label not in group_index:
+				group_index[label] = len(ids)
+				ids.append(label)
+				groups.append([])
+			groups[group_index[label]].append(sig)
+
+		file_sig = accumulator.pop_signature()
+
+	record_sigs = [sigs[0] if len(sigs) == 1 else np.unique(np.concatenate(sigs)) for sigs in groups]
+	array = SignatureArray(record_sigs, kspec, dtype=kspec.index_dtype)
+	result = (file_sig, AnnotatedSignatures(array, ids=ids))
+	return result + (stats_acc.stats(),) if stats else result
+
+
+def calc_file_signature_multi(kspecs: Sequence[KmerSpec],
+                              seqfile: SequenceFile,
+                              *,
+                              accumulators: Optional[Sequence[KmerAccumulator]] = None,
+                              block_size: Optional[int] = None,
+                              stats: bool = False,
+                              background: bool = False,
+                              memory_map: bool = True,
+                              ) -> Union[List[KmerSignature], Tuple[List[KmerSignature], AssemblyStats]]:
+	"""Open a sequence file and calculate its signatures for several k-mer specs, parsing it once.
+
+	Arguments are the same as :func:`.calc_file_signature` except a sequence of k-mer specs (and
+	optionally accumulators) is given. If ``stats`` is True returns a ``(signatures, stats)`` tuple.
+
+	See Also
+	--------
+	.calc_signature_multi
+	.calc_file_signatures_multi
+	"""
+	stats_acc = AssemblyStatsAccumulator() if stats else None
+
+	if memory_map and _memory_mappable(seqfile):
+		accumulate = partial(_accumulate_fasta_mapped, kspecs=kspecs, seqfile=seqfile, stats_acc=stats_acc)
+
+	elif block_size is not None and seqfile.format == 'fasta':
+		accumulate = partial(_accumulate_fasta_blocks, kspecs=kspecs, seqfile=seqfile, block_size=block_size,
+		                     stats_acc=stats_acc, background=background)
+
+	else:
+		with seqfile.parse_seqs(background=background) as records:
+			sigs = calc_signature_multi(kspecs, _iter_seqs(records, stats_acc), accumulators=accumulators)
+		return (sigs, stats_acc.stats()) if stats else sigs
+
+	if accumulators is None:
+		with _scratch_accumulators([kspec.k for kspec in kspecs]) as accumulators:
+			accumulate(accumulators)
+			sigs = [acc.pop_signature() for acc in accumulators]
+
+	else:
+		accumulate(accumulators)
+		sigs = [acc.signature() for acc in accumulators]
+
+	return (sigs, stats_acc.stats()) if stats else sigs
+
+
+def _accumulate_fasta_mapped(accumulators: Sequence[KmerAccumulator],
+                             kspecs: Sequence[KmerSpec],
+                             seqfile: SequenceFile,
+                             stats_acc: Optional[AssemblyStatsAccumulator] = None,
+                             ):
+	"""Memory-map an uncompressed FASTA file and add k-mers found for each spec to its accumulator.
+
+	Each record's sequence lines are searched in place, without copying or joining them.
+	"""
+	with seqfile.map_fasta() as records:
+		for record in records:
+			if stats_acc is not None:
+				stats_acc.add(record.seq, skip_whitespace=True)
+			accumulate_kmers_multi(accumulators, kspecs, record.seq, skip_whitespace=True)
+
+
+def _accumulate_fasta_blocks(accumulators: Sequence[KmerAccumulator],
+                             kspecs: Sequence[KmerSpec],
+                             seqfile: SequenceFile,
+                             block_size: int,
+                             stats_acc: Optional[AssemblyStatsAccumulator] = None,
+                             background: bool = False,
+                             ):
+	"""Stream a FASTA file in blocks and add k-mers found for each spec to its accumulator."""
+	# Keep the end of the previous block of the same record so that k-mers spanning the boundary
+	# are found. A match for each spec needs total_len - 1 bytes of overlap with the previous block,
+	# the carry is the largest of these. With several specs, matches for the shorter ones which lie
+	# within the carry may be found again, which is harmless as accumulators only store unique
+	# indices.
+	overlap = max(kspec.total_len for kspec in kspecs) - 1
+	carry = b''
+
+	with seqfile.open('rb', background=background) as fobj:
+		for record_start, data in iter_fasta_blocks(fobj, block_size):
+			if stats_acc is not None:
+				stats_acc.add(data, record_start)
+			seq = data if record_start or not carry else carry + data
+			accumulate_kmers_multi(accumulators, kspecs, seq)
+			carry = seq[-overlap:] if overlap > 0 else b''
+
+
+def calc_reads_signature(kspec: KmerSpec,
+                         files: Union[SequenceFile, Sequence[SequenceFile]],
+                         *,
+                         min_count: int = 2,
+                         accumulator: Optional[CountingAccumulator] = None,
+                         batch_size: int = DEFAULT_BLOCK_SIZE,
+                         ) -> KmerSignature:
+	"""Calculate a k-mer signature from sequencing reads in one or more FASTQ files.
+
+	All files are treated as reads from the same sample (e.g. the two files of a paired-end run) and
+	each is streamed through once, with decompression applied transparently. The number of times each
+	k-mer is found is counted and only those found at least ``min_count`` times are included in the
+	signature, which filters out most k-mers containing sequencing errors. Memory use is bounded by
+	the accumulator and ``batch_size`` and does not depend on the number of reads.
+
+	Parameters
+	----------
+	kspec
+		Spec for k-mer search.
+	files
+		FASTQ file or files to read. Must have ``format='fastq'``.
+	min_count
+		Minimum number of times a k-mer must be found to be included in the signature. Ignored if
+		``accumulator`` is given.
+	accumulator
+		Counting accumulator to use. Defaults to :func:`.default_counting_accumulator`.
+	batch_size
+		Approximate number of bytes of read sequence to search for k-mers in a single native call.
+
+	Returns
+	-------
+	numpy.ndarray
+		K-mer signature in sparse coordinate format.
+
+	See Also
+	--------
+	.calc_file_signature
+	"""
+	if isinstance(files, SequenceFile):
+		files = [files]
+
+	for file in files:
+		if file.format != 'fastq':
+			raise ValueError(f'Expected file in FASTQ format, got {file.format!r}')
+
+	if accumulator is None:
+		accumulator = default_counting_accumulator(kspec.k, min_count)
+
+	for file in files:
+		with file.open('rb') as fobj:
+			batch = []
+			nbytes = 0
+
+			for seq in iter_fastq_seqs(fobj):
+				batch.append(seq)
+				nbytes += len(seq) + 1
+				if nbytes >= batch_size:
+					# Separating reads with an invalid nucleotide prevents k-mers spanning two reads
+					accumulate_kmers(accumulator, kspec, b'N'.join(batch))
+					batch = []
+					nbytes = 0
+
+			if batch:
+				accumulate_kmers(accumulator, kspec, b'N'.join(batch))
+
+	return accumulator.signature()
+
+
+#: Maximum total size in bytes of a batch of files processed in a single call by a worker.
+BATCH_MAX_BYTES = 2 ** 24
+
+#: Maximum number of files in a batch processed in a single call by a worker.
+BATCH_MAX_FILES = 64
+
+
+def _make_batches(files: Sequence[SequenceFile], nworkers: int) -> List[List[int]]:
+	"""Group files into batches to be processed in a single call by a worker.
+
+	Files are ordered by size, largest first, so that large files do not stretch out the end of the
+	run. Small files are packed together so that they don't each pay the overhead of a separate
+	task. Batch size is limited so that there are still several batches per worker.
+
+	Returns
+	-------
+	List[List[int]]
+		Lists of indices of files in each batch.
+	"""
+	sizes = []
+	for file in files:
+		try:
+			sizes.append(os.path.getsize(file))
+		except OSError:
+			sizes.append(0)  # Let the error be raised when the file is processed
+
+	order = sorted(range(len(files)), key=lambda i: sizes[i], reverse=True)
+	target = min(BATCH_MAX_BYTES, sum(sizes) // (4 * nworkers))
+
+	batches = []
+	current = []
+	current_size = 0
+
+	for i in order:
+		current.append(i)
+		current_size += sizes[i]
+		if current_size >= target or len(current) >= BATCH_MAX_FILES:
+			batches.append(current)
+			current = []
+			current_size = 0
+
+	if current:
+		batches.append(current)
+
+	return batches
+
+
+def _map_batch(func: Callable[[SequenceFile], Any],
+               files: Sequence[SequenceFile],
+               discard: Optional[Callable[[Any], None]] = None,
+               ) -> List[Any]:
+	"""Apply function to batch of files in worker.
+
+	If the function fails for any file, ``discard`` is called on the results for the preceding files.
+	"""
+	results = []
+	try:
+		for file in files:
+			results.append(func(file))
+	except BaseException:
+		_discard_all(discard, results)
+		raise
+	return results
+
+
+def _discard_all(discard: Optional[Callable[[Any], None]], results: Iterable[Any]):
+	"""Call ``discard`` on each result, if given."""
+	if discard is not None:
+		for result in results:
+			discard(result)
+
+
+def _discard_futures(discard: Optional[Callable[[Any], None]],
+                     futures: Iterable[Future],
+                     batched: bool = False,
+                     ):
+	"""Cancel futures, wait for those already running and discard their results.
+
+	If ``batched`` is True, the result of each future is a list of results to discard.
+	"""
+	futures = list(futures)
+	for future in futures:
+		future.cancel()
+	if discard is None:
+		return
+
+	wait(futures)
+	for future in futures:
+		if not future.cancelled() and future.exception() is None:
+			_discard_all(discard, future.result() if batched else [future.result()])
+
+
+def _get_executor(concurrency: Optional[str],
+                  max_workers: Optional[int],
+                  executor: Optional[Executor],
+                  ) -> Tuple[Optional[Executor], ContextManager]:
+	"""Get executor from arguments to :func:`.calc_file_signatures`.
+
+	Also returns a context manager which shuts down the executor only if it was created here.
+	"""
+	if executor is not None:
+		return executor, nullcontext()
+
+	_check_concurrency(concurrency)
+
+	if concurrency == 'pool':
+		return get_worker_pool().executor(max_workers), nullcontext()
+
+	if concurrency == 'threads':
+		executor = ThreadPoolExecutor(max_workers=max_workers)
+	elif concurrency == 'processes':
+		executor = ProcessPoolExecutor(max_workers=max_workers)
+
+	return executor, (nullcontext() if executor is None else executor)
+
+
+def _check_concurrency(concurrency: Optional[str]):
+	"""Check value of the ``concurrency`` argument to :func:`.calc_file_signatures`."""
+	if concurrency not in (None, 'threads', 'processes', 'pool'):
+		raise ValueError(
+			f'concurrency should be one of [None, "threads", "processes", "pool"], got {concurrency!r}'
+		)
+
+
+def _map_files(func: Callable[[SequenceFile], Any],
+               files: Sequence[SequenceFile],
+               progress=None,
+               concurrency: Optional[str] = 'processes',
+               max_workers: Optional[int] = None,
+               executor: Optional[Executor] = None,
+               discard: Optional[Callable[[Any], None]] = None,
+               map_batch: Optional[Callable[..., List[Any]]] = None,
+               ) -> List[Any]:
+	"""Apply a function to a list of sequence files, possibly concurrently.
+
+	See :func:`.calc_file_signatures` for description of arguments. ``func`` must be picklable if
+	using process-based concurrency. If concurrent, files are submitted in batches as determined by
+	:func:`._make_batches` and progress is updated as each batch completes. Results are returned in
+	the same order as ``files``.
+
+	If the function raises an exception for any file, ``discard`` is called on every result already
+	calculated (waiting for tasks which are already running) before the exception is propagated. It
+	is used to release resources held by the results. Must be picklable if using process-based
+	concurrency.
+
+	``map_batch`` replaces :func:`._map_batch` (with the same signature) for processing batches in
+	the executor. It must return one result for each file, and is not used without an executor.
+
+	If any files are archive members, all files are instead submitted one at a time by
+	:func:`._iter_map_files` so that archives can be read sequentially while a bounded number of
+	members are held in memory.
+	"""
+	if map_batch is None:
+		map_batch = _map_batch
+
+	if any(file.member is not None for file in files):
+		results = []
+		try:
+			itr = _iter_map_files(func, files, True, None, None, progress, concurrency, max_workers, executor,
+			                      discard=discard)
+			for _, result in itr:
+				results.append(result)
+		except BaseException:
+			_discard_all(discard, results)
+			raise
+		return results
+
+	executor, executor_context = _get_executor(concurrency, max_workers, executor)
+
+	if executor is None:
+		results = []
+
+		with iter_progress(files, progress) as file_itr:
+			try:
+				for file in file_itr:
+					results.append(func(file))
+			except BaseException:
+				_discard_all(discard, results)
+				raise
+
+	else:
+		results = [None] * len(files)
+		future_to_batch = dict()
+		batches = _make_batches(files, max_workers or os.cpu_count() or 1)
+
+		with executor_context, get_progress(progress, len(files)) as meter:
+			try:
+				for batch in batches:
+					future = executor.submit(map_batch, func, [files[i] for i in batch], discard)
+					future_to_batch[future] = batch
+
+				for future in as_completed(future_to_batch):
+					batch = future_to_batch.pop(future)
+					for i, result in zip(batch, future.result()):
+						results[i] = result
+					meter.increment(len(batch))
+
+			except BaseException:
+				_discard_futures(discard, future_to_batch, batched=True)
+				_discard_all(discard, [result for result in results if result is not None])
+				raise
+
+		assert all(result is not None for result in results)
+
+	return results
+
+
+def _default_block_size(block_size: Optional[int],
+                        concurrency: Optional[str],
+                        executor: Optional[Executor],
+                        ) -> Optional[int]:
+	"""Stream files in blocks by default when computing signatures in threads."""
+	if block_size is None:
+		if isinstance(executor, ThreadPoolExecutor) or (executor is None and concurrency == 'threads'):
+			return DEFAULT_BLOCK_SIZE
+	return block_size
 
 
 def calc_file_signatures(kspec: KmerSpec,
@@ -217,7 +1282,12 @@ def calc_file_signatures(kspec: KmerSpec,
                          concurrency: Optional[str] = 'processes',
                          max_workers: Optional[int] = None,
                          executor: Optional[Executor] = None,
-                         ) -> SignatureList:
+                         block_size: Optional[int] = None,
+                         shared_memory: bool = False,
+                         cache: Optional[SignatureCache] = None,
+                         stats: bool = False,
+                         parallel_single: bool = False,
+                         ) -> Union[AbstractSignatureArray, Tuple[AbstractSignatureArray, List[AssemblyStats]]]:
 	"""Parse and calculate k-mer signatures for multiple sequence files.
 
 	Parameters
@@ -230,51 +1300,444 @@ def calc_file_signatures(kspec: KmerSpec,
 		Display a progress meter. See :func:`gambit.util.progress.get_progress` for allowed values.
 	concurrency
 		Process files concurrently. ``"processes"`` for process-based (default), ``"threads"`` for
-		threads-based, ``None`` for no concurrency.
+		threads-based, ``None`` for no concurrency. ``"pool"`` is process-based but uses the
+		persistent worker processes of :func:`gambit.util.pool.get_worker_pool`, which are kept
+		running after the function returns so that later calls don't pay their startup cost again.
 	max_workers
 		Number of worker threads/processes to use if ``concurrency`` is not None.
 	executor
 		Instance of class:`concurrent.futures.Executor` to use for concurrency. Overrides the
 		``concurrency`` and ``max_workers`` arguments.
+	block_size
+		Stream files in blocks of this size, see :func:`.calc_file_signature`. Defaults to
+		:data:`gambit.seq.DEFAULT_BLOCK_SIZE` when using thread-based concurrency, so that worker
+		threads spend little time holding the GIL.
+	shared_memory
+		Return a :class:`.SignatureArray` instead of a :class:`.SignatureList`. When using
+		process-based concurrency, each worker writes the signatures of a batch of files to a single
+		shared memory segment, which is copied directly into the values array of the result instead
+		of pickling the signatures and building an intermediate list. Not used for archive members.
+	cache
+		Persistent signature cache to check before parsing files. Signatures of files not in the
+		cache are added to it. Files with identical contents are only parsed once.
+	stats
+		Also calculate :class:`gambit.seq.AssemblyStats` for each file in the same pass as its
+		signature. Not compatible with ``cache``.
+	parallel_single
+		If only a single file is given, calculate its signature with ``max_workers`` threads using
+		:func:`.calc_signature_parallel` (decompressing it in a background thread) instead of
+		submitting it as a single task according to ``concurrency``. Has no effect if ``executor`` or
+		``block_size`` is given.
+
+	Returns
+	-------
+	Union[.AbstractSignatureArray, Tuple[.AbstractSignatureArray, List[gambit.seq.AssemblyStats]]]
+		:class:`.SignatureList` or :class:`.SignatureArray`, depending on ``shared_memory``. If
+		``stats`` is True, a ``(signatures, stats)`` tuple.
+
+	Notes
+	-----
+	When processing a single genome, ``parallel_single=True`` is usually much faster than any
+	setting of ``concurrency``, which can only use one worker per file. It is not the default so
+	that an explicit ``concurrency`` or ``executor`` is always respected.
 
 	See Also
 	--------
 	.calc_file_signature
+	.calc_file_signatures_multi
 	"""
-	if executor is None:
-		if concurrency == 'threads':
-			executor = ThreadPoolExecutor(max_workers=max_workers)
-		elif concurrency == 'processes':
-			executor = ProcessPoolExecutor(max_workers=max_workers)
-		elif concurrency is not None:
-			raise ValueError(f'concurrency should be one of [None, "threads", "processes"], got {concurrency!r}')
+	if cache is not None:
+		if stats:
+			raise ValueError('stats is not compatible with cache')
+		sigs = _calc_file_signatures_cached(
+			cache, kspec, files,
+			partial(calc_file_signatures, progress=progress, concurrency=concurrency, max_workers=max_workers,
+			        executor=executor, block_size=block_size, parallel_single=parallel_single),
+		)
+		return SignatureArray(sigs, kspec, dtype=kspec.index_dtype) if shared_memory else SignatureList(sigs, kspec)
+
+	if parallel_single and len(files) == 1 and executor is None and block_size is None:
+		# Parallelize within the single genome instead of across files, decompressing it in the
+		# background while it is parsed
+		func = partial(calc_file_signature, kspec, nthreads=max_workers or omp_get_max_threads(), stats=stats,
+		               background=files[0].resolve_compression() is not None)
+		concurrency = None
+	else:
+		block_size = _default_block_size(block_size, concurrency, executor)
+		func = partial(calc_file_signature, kspec, block_size=block_size, stats=stats)
 
-		executor_context = executor
+	if stats:
+		results = _map_files(func, files, progress, concurrency, max_workers, executor)
+		sigs = [sig for sig, _ in results]
+		sigs = SignatureArray(sigs, kspec, dtype=kspec.index_dtype) if shared_memory else SignatureList(sigs, kspec)
+		return sigs, [file_stats for _, file_stats in results]
 
-	else:
-		executor_context = nullcontext()
+	if not shared_memory:
+		sigs = _map_files(func, files, progress, concurrency, max_workers, executor)
+		return SignatureList(sigs, kspec)
 
 	if executor is None:
-		sigs = []
+		process_based = concurrency in ('processes', 'pool')
+	else:
+		process_based = isinstance(executor, ProcessPoolExecutor)
 
-		with iter_progress(files, progress) as file_itr:
-			for file in file_itr:
-				sigs.append(calc_file_signature(kspec, file))
+	if process_based and all(file.member is None for file in files):
+		results = _map_files(func, files, progress, concurrency, max_workers, executor, discard=_discard_shared,
+		                     map_batch=_calc_batch_to_shared)
+		return _collect_shared(results, kspec)
 
-	else:
-		sigs = [None] * len(files)
-		future_to_index = dict()
+	sigs = _map_files(func, files, progress, concurrency, max_workers, executor)
+	return SignatureArray(sigs, kspec, dtype=kspec.index_dtype)
 
-		with executor_context, get_progress(progress, len(files)) as meter:
-			for i, file in enumerate(files):
-				future = executor.submit(calc_file_signature, kspec, file)
-				future_to_index[future] = i
 
-			for future in as_completed(future_to_index):
-				i = future_to_index[future]
-				sigs[i] = future.result()
-				meter.increment()
+def _calc_file_signatures_cached(cache: SignatureCache,
+                                 kspec: KmerSpec,
+                                 files: Sequence[SequenceFile],
+                                 calc: Callable[[KmerSpec, Sequence[SequenceFile]], Sequence[KmerSignature]],
+                                 ) -> List[KmerSignature]:
+	"""Get signatures of files from cache, calculating only those which are missing."""
+	hashes = cache.file_hashes(files)
+	found = dict()
+	missing = dict()  # Preserves order
+
+	for h, file in zip(hashes, files):
+		if h in found or h in missing:
+			continue
+		sig = cache.get(h, kspec)
+		if sig is None:
+			missing[h] = file
+		else:
+			found[h] = sig
+
+	if missing:
+		for h, sig in zip(missing, calc(kspec, list(missing.values()))):
+			cache.put(h, kspec, sig)
+			found[h] = sig
+
+	return [found[h] for h in hashes]
+
+
+def _calc_batch_to_shared(func: Callable[[SequenceFile], KmerSignature],
+                          files: Sequence[SequenceFile],
+                          discard: Optional[Callable[[Any], None]] = None,
+                          ) -> List[Tuple[Optional[str], int, int]]:
+	"""Calculate signatures of a batch of files in a worker process and write them to shared memory.
+
+	Replacement for :func:`._map_batch`. The signatures are concatenated in a single new shared
+	memory segment, which is only created once all have been calculated. Returns a
+	``(segment_name, offset, length)`` tuple for each file (the name is None if all signatures are
+	empty). The segment is unlinked by :func:`._collect_shared` in the parent process.
+	"""
+	sigs = [func(file) for file in files]
+	total = sum(map(len, sigs))
+	if total == 0:
+		return [(None, 0, 0) for sig in sigs]
+
+	dtype = np.result_type(*sigs)
+	shm = SharedMemory(create=True, size=total * dtype.itemsize)
+	dest = np.ndarray(total, dtype=dtype, buffer=shm.buf)
+	np.concatenate(sigs, out=dest)
+	del dest  # Release buffer before closing
+	shm.close()
+
+	# Parent process takes ownership, don't let this process' resource tracker unlink it
+	resource_tracker.unregister(shm._name, 'shared_memory')
+
+	offsets = np.cumsum([0] + [len(sig) for sig in sigs[:-1]])
+	return [(shm.name, int(offset), len(sig)) for offset, sig in zip(offsets, sigs)]
+
+
+def _discard_shared(result: Tuple[Optional[str], int, int]):
+	"""Unlink the shared memory segment holding a result of :func:`._calc_batch_to_shared`.
+
+	Results for other files in the same batch share the segment, so it may already be gone.
+	"""
+	name = result[0]
+	if name is None:
+		return
+	try:
+		shm = SharedMemory(name)
+	except FileNotFoundError:
+		return
+	shm.close()
+	shm.unlink()
+
+
+def _collect_shared(results: Sequence[Tuple[Optional[str], int, int]], kspec: KmerSpec) -> SignatureArray:
+	"""Create a SignatureArray from the output of :func:`._calc_batch_to_shared`, unlinking all segments."""
+	results = list(results)
+	try:
+		sigs = SignatureArray.uninitialized([length for name, offset, length in results], kspec)
+		values = sigs.values
+
+		by_segment = dict()
+		for i, (name, offset, length) in enumerate(results):
+			if name is not None:
+				by_segment.setdefault(name, []).append(i)
+
+		for name, indices in by_segment.items():
+			shm = SharedMemory(name)
+			src = np.ndarray(shm.size // values.itemsize, dtype=values.dtype, buffer=shm.buf)
+			for i in indices:
+				_, offset, length = results[i]
+				values[sigs.bounds[i]:sigs.bounds[i + 1]] = src[offset:offset + length]
+			del src
+			shm.close()
+			shm.unlink()
+			for i in indices:
+				results[i] = (None, 0, results[i][2])
+
+	finally:
+		# Clean up remaining segments if something went wrong
+		_discard_all(_discard_shared, results)
+
+	return sigs
+
+
+def calc_file_signatures_multi(kspecs: Sequence[KmerSpec],
+                               files: Sequence[SequenceFile],
+                               progress=None,
+                               concurrency: Optional[str] = 'processes',
+                               max_workers: Optional[int] = None,
+                               executor: Optional[Executor] = None,
+                               block_size: Optional[int] = None,
+                               ) -> List[SignatureList]:
+	"""Calculate k-mer signatures of multiple sequence files for several k-mer specs at once.
+
+	Each file is only read and parsed once, and all k-mer specs are searched for in a single pass
+	over its sequence data. Arguments are the same as :func:`.calc_file_signatures` except a
+	sequence of k-mer specs is given.
+
+	Returns
+	-------
+	List[SignatureList]
+		Signatures of all files for each k-mer spec.
+	"""
+	kspecs = list(kspecs)
+	block_size = _default_block_size(block_size, concurrency, executor)
+	func = partial(calc_file_signature_multi, kspecs, block_size=block_size)
+	results = _map_files(func, files, progress, concurrency, max_workers, executor)
+	return [SignatureList([r[i] for r in results], kspec) for i, kspec in enumerate(kspecs)]
+
+
+def calc_file_signatures_with_records(kspec: KmerSpec,
+                                      files: Sequence[SequenceFile],
+                                      progress=None,
+                                      concurrency: Optional[str] = 'processes',
+                                      max_workers: Optional[int] = None,
+                                      executor: Optional[Executor] = None,
+                                      group_by: Optional[Callable[[str], str]] = None,
+                                      stats: bool = False,
+                                      ) -> tuple:
+	"""Calculate signatures of multiple sequence files along with those of the records in each file.
+
+	Each file is parsed once, see the ``records`` argument of :func:`.calc_file_signature`.
+	Arguments other than ``group_by`` are the same as :func:`.calc_file_signatures`. ``group_by``
+	must be picklable if using process-based concurrency.
+
+	Returns
+	-------
+	tuple
+		``(signatures, records)`` tuple containing a :class:`.SignatureList` of the files'
+		signatures and a list of record signatures (:class:`.AnnotatedSignatures`) for each file. If
+		``stats`` is True, a list of :class:`gambit.seq.AssemblyStats` for each file is added as a
+		third element.
+	"""
+	func = partial(calc_file_signature, kspec, records=True, group_by=group_by, stats=stats)
+	results = _map_files(func, files, progress, concurrency, max_workers, executor)
+	sigs = SignatureList([result[0] for result in results], kspec)
+	file_records = [result[1] for result in results]
+	return (sigs, file_records, [result[2] for result in results]) if stats else (sigs, file_records)
+
+
+def iter_file_signatures(kspec: KmerSpec,
+                         files: Iterable[SequenceFile],
+                         *,
+                         ordered: bool = False,
+                         max_pending: Optional[int] = None,
+                         reorder_buffer: Optional[int] = None,
+                         progress=None,
+                         concurrency: Optional[str] = 'processes',
+                         max_workers: Optional[int] = None,
+                         executor: Optional[Executor] = None,
+                         block_size: Optional[int] = None,
+                         ) -> Iterator[Tuple[int, KmerSignature]]:
+	"""Calculate signatures of sequence files concurrently, yielding results as they are available.
+
+	Streaming version of :func:`.calc_file_signatures`. Only a bounded number of tasks are submitted
+	to the executor at a time, and files are consumed from ``files`` lazily, so memory use does not
+	grow with the number of files as long as the consumer does not keep all results. If the
+	iterator is closed before it is exhausted, pending tasks are cancelled.
+
+	Consecutive members of the same archive are read in the main thread from a single archive
+	handle and their contents passed to the workers, see :func:`gambit.seq.stream_archive_members`.
 
-		assert all(sig is not None for sig in sigs)
+	Parameters
+	----------
+	kspec
+		Spec for k-mer search.
+	files
+		Files to read. May be an iterator.
+	ordered
+		Yield results in the same order as ``files``. Otherwise they are yielded in order of
+		completion.
+	max_pending
+		Maximum number of tasks submitted to the executor and not yet completed. Defaults to twice
+		``max_workers`` (or the number of CPUs).
+	reorder_buffer
+		If ``ordered`` is True, the number of files which are either pending or completed and
+		waiting on an earlier file to finish is limited to ``max_pending + reorder_buffer``. New
+		tasks are not submitted while this is full. Defaults to ``max_pending``.
+	progress
+		Display a progress meter. Only supported if ``files`` has a length.
+	concurrency
+		Same as in :func:`.calc_file_signatures`.
+	max_workers
+		Same as in :func:`.calc_file_signatures`.
+	executor
+		Same as in :func:`.calc_file_signatures`.
+	block_size
+		Same as in :func:`.calc_file_signatures`.
 
-	return SignatureList(sigs, kspec)
+	Returns
+	-------
+	Iterator[Tuple[int, numpy.ndarray]]
+		``(index, signature)`` pairs, where ``index`` is the index of the file in ``files``.
+	"""
+	block_size = _default_block_size(block_size, concurrency, executor)
+	func = partial(calc_file_signature, kspec, block_size=block_size)
+	return _iter_map_files(func, files, ordered, max_pending, reorder_buffer, progress, concurrency,
+	                       max_workers, executor)
+
+
+def iter_file_signatures_multi(kspecs: Sequence[KmerSpec],
+                               files: Iterable[SequenceFile],
+                               *,
+                               ordered: bool = False,
+                               max_pending: Optional[int] = None,
+                               reorder_buffer: Optional[int] = None,
+                               progress=None,
+                               concurrency: Optional[str] = 'processes',
+                               max_workers: Optional[int] = None,
+                               executor: Optional[Executor] = None,
+                               block_size: Optional[int] = None,
+                               ) -> Iterator[Tuple[int, List[KmerSignature]]]:
+	"""Streaming version of :func:`.calc_file_signatures_multi`.
+
+	Arguments are the same as :func:`.iter_file_signatures` except a sequence of k-mer specs is
+	given. Yields ``(index, signatures)`` pairs where ``signatures`` contains the file's signature
+	for each k-mer spec.
+	"""
+	block_size = _default_block_size(block_size, concurrency, executor)
+	func = partial(calc_file_signature_multi, list(kspecs), block_size=block_size)
+	return _iter_map_files(func, files, ordered, max_pending, reorder_buffer, progress, concurrency,
+	                       max_workers, executor)
+
+
+def _iter_map_files(func: Callable[[SequenceFile], Any],
+                    files: Iterable[SequenceFile],
+                    ordered: bool,
+                    max_pending: Optional[int],
+                    reorder_buffer: Optional[int],
+                    progress,
+                    concurrency: Optional[str],
+                    max_workers: Optional[int],
+                    executor: Optional[Executor],
+                    discard: Optional[Callable[[Any], None]] = None,
+                    ) -> Iterator[Tuple[int, Any]]:
+	"""Streaming version of :func:`._map_files`, see :func:`.iter_file_signatures`.
+
+	If the iterator is closed or raises an exception, ``discard`` is called on all results which have
+	been calculated but not yielded.
+
+	Arguments are checked when this is called. The executor (if not given) and progress meter are
+	only created once iteration starts, so nothing is left running if the iterator is never used.
+	"""
+	total = None if progress is None else len(files)
+
+	if max_pending is None:
+		max_pending = 2 * (max_workers or os.cpu_count() or 1)
+	elif max_pending < 1:
+		raise ValueError('max_pending must be positive')
+	if reorder_buffer is None:
+		reorder_buffer = max_pending
+	elif reorder_buffer < 0:
+		raise ValueError('reorder_buffer must not be negative')
+
+	if executor is None:
+		_check_concurrency(concurrency)
+
+	return _iter_map_files_inner(func, files, ordered, max_pending, reorder_buffer, progress, total, concurrency,
+	                             max_workers, executor, discard)
+
+
+def _iter_map_files_inner(func: Callable[[SequenceFile], Any],
+                          files: Iterable[SequenceFile],
+                          ordered: bool,
+                          max_pending: int,
+                          reorder_buffer: int,
+                          progress,
+                          total: Optional[int],
+                          concurrency: Optional[str],
+                          max_workers: Optional[int],
+                          executor: Optional[Executor],
+                          discard: Optional[Callable[[Any], None]],
+                          ) -> Iterator[Tuple[int, Any]]:
+	"""Generator which does the work of :func:`._iter_map_files` after its arguments are checked."""
+	meter_context = nullcontext() if progress is None else get_progress(progress, total)
+	executor, executor_context = _get_executor(concurrency, max_workers, executor)
+
+	with meter_context as meter, executor_context:
+		# Members of the same archive are read from a single handle as they are submitted
+		files = stream_archive_members(files)
+
+		if executor is None:
+			for i, file in enumerate(files):
+				result = func(file)
+				if meter is not None:
+					meter.increment()
+				yield i, result
+			return
+
+		file_itr = enumerate(files)
+		pending = dict()  # Future -> index
+		completed = dict()  # Index -> result, ordered mode only
+		next_index = 0  # Next index to yield in ordered mode
+		exhausted = False
+
+		try:
+			while True:
+				# Submit tasks up to limit, and so that reorder buffer can't overflow
+				while not exhausted and len(pending) < max_pending:
+					if ordered and len(pending) + len(completed) >= max_pending + reorder_buffer:
+						break
+					try:
+						i, file = next(file_itr)
+					except StopIteration:
+						exhausted = True
+						break
+					pending[executor.submit(func, file)] = i
+
+				if not pending:
+					break
+
+				done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+				for future in done:
+					i = pending.pop(future)
+					result = future.result()
+					if meter is not None:
+						meter.increment()
+
+					if ordered:
+						completed[i] = result
+					else:
+						yield i, result
+
+				while next_index in completed:
+					yield next_index, completed.pop(next_index)
+					next_index += 1
+
+		finally:
+			_discard_futures(discard, pending)
+			_discard_all(discard, completed.values())
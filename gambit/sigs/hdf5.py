@@ -1,13 +1,13 @@
 """Store k-mer signature sets in HDF5 format."""
 
 import json
-from typing import Optional
+from typing import Optional, Sequence, Iterable
 
 import numpy as np
 import h5py as h5
 
 from .base import SignatureArray, ConcatenatedSignatureArray, AbstractSignatureArray, SignaturesMeta,\
-	ReferenceSignatures
+	ReferenceSignatures, KmerSignature
 from gambit.kmers import KmerSpec
 from gambit._cython.metric import BOUNDS_DTYPE
 from gambit.util.io import FilePath
@@ -23,6 +23,12 @@ CURRENT_FMT_VERSION = 1
 
 STR_DTYPE = h5.string_dtype()
 
+#: Chunk size (number of elements) of resizable values dataset.
+VALUES_CHUNK_SIZE = 2 ** 16
+
+#: Chunk size (number of elements) of resizable bounds dataset.
+BOUNDS_CHUNK_SIZE = 2 ** 12
+
 
 def none_to_empty(value, dtype: np.dtype):
 	"""Convert None values to :class:`h5py.Empty`, passing other types through.
@@ -104,13 +110,15 @@ class HDF5Signatures(ConcatenatedSignatureArray, ReferenceSignatures):
 
 		self.values = group['values']
 		self.bounds = group['bounds']
+		self.ids = self._read_ids()
 
-		ids_data = group['ids']
+	def _read_ids(self) -> np.ndarray:
+		ids_data = self.group['ids']
 		if ids_data.dtype.kind == 'O':
 			# String data set reads out bytes as default
-			self.ids = ids_data.asstr()[:]
+			return ids_data.asstr()[:]
 		else:
-			self.ids = ids_data[:]
+			return ids_data[:]
 
 	def close(self):
 		"""Close the underlying HDF5 file."""
@@ -138,12 +146,8 @@ class HDF5Signatures(ConcatenatedSignatureArray, ReferenceSignatures):
 		write_metadata(group, meta)
 
 	@classmethod
-	def _init_datasets(cls, group: h5.Group, signatures: AbstractSignatureArray, ids: np.ndarray, values_kw = None):
-		"""Initialize datasets of group."""
-
-		if values_kw is None:
-			values_kw = dict()
-
+	def _init_ids(cls, group: h5.Group, ids: np.ndarray, resizable: bool = False):
+		"""Create IDs dataset."""
 		if ids.dtype.kind == 'U':
 			# h5py doesn't support writing Numpy U data type
 			ids = ids.astype(object)
@@ -155,17 +159,39 @@ class HDF5Signatures(ConcatenatedSignatureArray, ReferenceSignatures):
 		else:
 			raise ValueError('ids array must contain integers or strings.')
 
-		group.create_dataset('ids', data=ids, dtype=ids_dtype)
+		kw = dict(maxshape=(None,), chunks=(BOUNDS_CHUNK_SIZE,)) if resizable else dict()
+		group.create_dataset('ids', data=ids, dtype=ids_dtype, **kw)
+
+	@classmethod
+	def _init_datasets(cls,
+	                   group: h5.Group,
+	                   signatures: AbstractSignatureArray,
+	                   ids: np.ndarray,
+	                   values_kw = None,
+	                   resizable: bool = False,
+	                   ):
+		"""Initialize datasets of group."""
+
+		if values_kw is None:
+			values_kw = dict()
+
+		cls._init_ids(group, ids, resizable)
+
+		values_kw = dict(values_kw)
+		bounds_kw = dict(dtype=BOUNDS_DTYPE)
+		if resizable:
+			values_kw.update(maxshape=(None,), chunks=(VALUES_CHUNK_SIZE,))
+			bounds_kw.update(maxshape=(None,), chunks=(BOUNDS_CHUNK_SIZE,))
 
 		if isinstance(signatures, SignatureArray):
 			group.create_dataset('values', data=signatures.values, **values_kw)
-			group.create_dataset('bounds', data=signatures.bounds, dtype=BOUNDS_DTYPE)
+			group.create_dataset('bounds', data=signatures.bounds, **bounds_kw)
 
 		else:
 			n = len(signatures)
 			sizes = np.asarray(signatures.sizes())
 
-			bounds = group.create_dataset('bounds', shape=n + 1, dtype=BOUNDS_DTYPE)
+			bounds = group.create_dataset('bounds', shape=n + 1, **bounds_kw)
 			bounds[0] = 0
 			bounds[1:] = np.cumsum(sizes, dtype=BOUNDS_DTYPE)
 
@@ -173,6 +199,97 @@ class HDF5Signatures(ConcatenatedSignatureArray, ReferenceSignatures):
 			for i in range(n):
 				values[bounds[i]:bounds[i + 1]] = signatures[i]
 
+	def append(self, signatures: Iterable[KmerSignature], ids: Sequence, kmerspec: Optional[KmerSpec] = None):
+		"""Append signatures to the end of the data sets in place.
+
+		File must be open in a writable mode. Only the new data is written, so this takes time
+		proportional to the number of signatures added. Signatures are consumed one at a time so
+		``signatures`` can be a lazy iterator (e.g. from :func:`gambit.sigs.calc.iter_file_signatures`),
+		it is only iterated over after the IDs have been validated. If it does not yield exactly one
+		signature per ID the appended data is removed again and a ``ValueError`` is raised.
+
+		Files not created with ``resizable=True`` (see :meth:`create`) store data in fixed-size data
+		sets, these are converted to resizable ones the first time this method is called. This
+		requires rewriting the file's data once and does not reclaim the space used by the old data
+		sets.
+
+		Parameters
+		----------
+		signatures
+			Signatures to add.
+		ids
+			IDs of signatures to add. Must not contain duplicates or IDs already present in the file.
+		kmerspec
+			K-mer spec the signatures were calculated with, must match the file's. Optional if
+			``signatures`` is an :class:`.AbstractSignatureArray` with a k-mer spec, otherwise
+			required.
+		"""
+		if isinstance(signatures, AbstractSignatureArray) and signatures.kmerspec is not None:
+			if kmerspec is None:
+				kmerspec = signatures.kmerspec
+			elif signatures.kmerspec != kmerspec:
+				raise ValueError(f'K-mer spec of signatures ({signatures.kmerspec}) does not match kmerspec argument')
+
+		if kmerspec is None:
+			raise ValueError('kmerspec must be given unless signatures is a signature array with a k-mer spec')
+		if kmerspec != self.kmerspec:
+			raise ValueError(f'K-mer spec of signatures ({kmerspec}) does not match file ({self.kmerspec})')
+
+		ids = self._check_new_ids(ids)
+
+		for name in ['values', 'bounds', 'ids']:
+			self._make_resizable(name)
+		self.values = self.group['values']
+		self.bounds = self.group['bounds']
+
+		n = len(self)
+		writer = HDF5SignaturesWriter._from_existing(self.group, self.kmerspec)
+
+		try:
+			writer.extend(signatures)
+			if len(writer) != n + len(ids):
+				raise ValueError(f'Number of signatures ({len(writer) - n}) does not match number of IDs ({len(ids)})')
+		except BaseException:
+			writer._truncate(n)
+			raise
+
+		ids_data = self.group['ids']
+		ids_data.resize((n + len(ids),))
+		ids_data[n:] = ids.astype(object) if ids.dtype.kind == 'U' else ids
+		self.ids = self._read_ids()
+
+	def _check_new_ids(self, ids: Sequence) -> np.ndarray:
+		"""Check IDs of signatures to be appended and convert to array."""
+		ids = np.asarray(ids)
+		if ids.ndim != 1:
+			raise ValueError('ids must be one-dimensional')
+
+		existing_kind = self.group['ids'].dtype.kind
+		if len(ids) > 0 and (ids.dtype.kind in 'ui') != (existing_kind in 'ui'):
+			raise TypeError('Type of ids does not match existing ids in file')
+
+		unique, counts = np.unique(ids, return_counts=True)
+		duplicates = set(unique[counts > 1].tolist())
+		duplicates.update(set(ids.tolist()).intersection(self.ids.tolist()))
+		if duplicates:
+			raise ValueError(f'Duplicate IDs: {", ".join(map(str, sorted(duplicates)))}')
+
+		return ids
+
+	def _make_resizable(self, name: str):
+		"""Convert data set to a chunked, resizable one if needed."""
+		dataset = self.group[name]
+		if dataset.maxshape[0] is None:
+			return
+
+		data = dataset[:]
+		kw = dict(compression=dataset.compression, compression_opts=dataset.compression_opts)
+		dtype = dataset.dtype
+		chunk_size = VALUES_CHUNK_SIZE if name == 'values' else BOUNDS_CHUNK_SIZE
+
+		del self.group[name]
+		self.group.create_dataset(name, data=data, dtype=dtype, maxshape=(None,), chunks=(chunk_size,), **kw)
+
 	@classmethod
 	def create(cls,
 	           group: h5.Group,
@@ -180,6 +297,7 @@ class HDF5Signatures(ConcatenatedSignatureArray, ReferenceSignatures):
 	           *,
 	           compression: Optional[str] = None,
 	           compression_opts = None,
+	           resizable: bool = False,
 	           ) -> 'HDF5Signatures':
 		"""Store k-mer signatures and associated metadata in an HDF5 group.
 
@@ -198,6 +316,9 @@ class HDF5Signatures(ConcatenatedSignatureArray, ReferenceSignatures):
 			in ``h5py``'s documentation.
 		compression_opts
 			Sets compression level (0-9) for gzip compression, no effect for other types.
+		resizable
+			Store data in chunked, resizable data sets so that :meth:`append` can extend them in
+			place without converting them first.
 		"""
 
 		if isinstance(signatures, ReferenceSignatures):
@@ -214,11 +335,142 @@ class HDF5Signatures(ConcatenatedSignatureArray, ReferenceSignatures):
 		kw = dict(compression=compression, compression_opts=compression_opts)
 
 		cls._init_attrs(group, signatures.kmerspec, meta)
-		cls._init_datasets(group, signatures, ids, values_kw=kw)
+		cls._init_datasets(group, signatures, ids, values_kw=kw, resizable=resizable)
 
 		return cls(group)
 
 
+class HDF5SignaturesWriter:
+	"""Writes k-mer signatures to an HDF5 group one at a time.
+
+	The ``values`` and ``bounds`` datasets are created as chunked, resizable datasets and extended
+	as each signature is appended, so signatures do not all need to be held in memory at once. IDs
+	and metadata are written by :meth:`finish`. The group is not recognized as containing a
+	signature set until then.
+
+	Attributes
+	----------
+	group
+		HDF5 group to write to.
+	kmerspec
+		K-mer spec used to calculate signatures.
+	values
+		Values dataset.
+	bounds
+		Bounds dataset.
+	"""
+	group: h5.Group
+	kmerspec: KmerSpec
+	values: h5.Dataset
+	bounds: h5.Dataset
+
+	def __init__(self,
+	             group: h5.Group,
+	             kmerspec: KmerSpec,
+	             *,
+	             dtype: Optional[np.dtype] = None,
+	             compression: Optional[str] = None,
+	             compression_opts = None,
+	             ):
+		"""
+		Parameters
+		----------
+		group
+			HDF5 group to store data in.
+		kmerspec
+			K-mer spec used to calculate signatures.
+		dtype
+			Data type of values dataset. Defaults to ``kmerspec.index_dtype``.
+		compression
+			Compression type for values array, see :meth:`.HDF5Signatures.create`.
+		compression_opts
+			Compression level, see :meth:`.HDF5Signatures.create`.
+		"""
+		self.group = group
+		self.kmerspec = kmerspec
+
+		self.values = group.create_dataset(
+			'values',
+			shape=(0,),
+			maxshape=(None,),
+			chunks=(VALUES_CHUNK_SIZE,),
+			dtype=kmerspec.index_dtype if dtype is None else dtype,
+			compression=compression,
+			compression_opts=compression_opts,
+		)
+		self.bounds = group.create_dataset(
+			'bounds',
+			data=np.zeros(1, dtype=BOUNDS_DTYPE),
+			maxshape=(None,),
+			chunks=(BOUNDS_CHUNK_SIZE,),
+		)
+		self._count = 0
+		self._nvalues = 0
+
+	@classmethod
+	def _from_existing(cls, group: h5.Group, kmerspec: KmerSpec) -> 'HDF5SignaturesWriter':
+		"""Create instance which appends to existing resizable data sets."""
+		writer = cls.__new__(cls)
+		writer.group = group
+		writer.kmerspec = kmerspec
+		writer.values = group['values']
+		writer.bounds = group['bounds']
+		writer._count = len(writer.bounds) - 1
+		writer._nvalues = int(writer.bounds[-1])
+		return writer
+
+	def __len__(self):
+		return self._count
+
+	def _truncate(self, count: int):
+		"""Remove signatures past the given count."""
+		self._count = count
+		self._nvalues = int(self.bounds[count])
+		self.bounds.resize((count + 1,))
+		self.values.resize((self._nvalues,))
+
+	def append(self, sig: KmerSignature):
+		"""Write a single signature to the end of the datasets."""
+		start = self._nvalues
+		end = start + len(sig)
+
+		self.values.resize((end,))
+		self.values[start:end] = sig
+		self.bounds.resize((self._count + 2,))
+		self.bounds[self._count + 1] = end
+
+		self._count += 1
+		self._nvalues = end
+
+	def extend(self, sigs: Iterable[KmerSignature]):
+		"""Write multiple signatures to the end of the datasets."""
+		for sig in sigs:
+			self.append(sig)
+
+	def finish(self, ids: Optional[Sequence] = None, meta: Optional[SignaturesMeta] = None) -> HDF5Signatures:
+		"""Write IDs and metadata after all signatures have been added.
+
+		Parameters
+		----------
+		ids
+			IDs of signatures in the order they were added. Defaults to consecutive integers.
+		meta
+			Metadata for signature set.
+
+		Returns
+		-------
+		.HDF5Signatures
+			Object which reads from the same group.
+		"""
+		ids = np.arange(self._count) if ids is None else np.asarray(ids)
+		if ids.shape != (self._count,):
+			raise ValueError('Length of ids must match number of signatures')
+
+		HDF5Signatures._init_ids(self.group, ids, resizable=True)
+		HDF5Signatures._init_attrs(self.group, self.kmerspec, SignaturesMeta() if meta is None else meta)
+		return HDF5Signatures(self.group)
+
+
 def load_signatures_hdf5(path: FilePath, **kw) -> HDF5Signatures:
 	"""Open HDF5 signature file.
 
@@ -227,7 +479,8 @@ def load_signatures_hdf5(path: FilePath, **kw) -> HDF5Signatures:
 	path
 		File to open.
 	\\**kw
-		Additional keyword arguments to :func:`h5py.File`.
+		Additional keyword arguments to :func:`h5py.File`. Use ``mode='r+'`` to open for appending
+		with :meth:`.HDF5Signatures.append`.
 	"""
 	return HDF5Signatures(h5.File(path, **kw))
 
@@ -1,6 +1,9 @@
 """Helper functions for tests."""
 
-from typing import Optional, Tuple, Union, List, Sequence
+import os
+import tarfile
+import zipfile
+from typing import Optional, Tuple, Union, List, Sequence, Iterable
 
 import numpy as np
 
@@ -9,6 +12,7 @@ from gambit.seq import seq_to_bytes, revcomp
 from gambit.sigs import KmerSignature, SignatureArray
 from gambit.sigs.convert import dense_to_sparse, sparse_to_dense
 from gambit.db import Taxon
+from gambit.util.io import FilePath
 
 
 def convert_seq(seq, type):
@@ -233,3 +237,36 @@ def make_lineage(thresholds: Sequence[float]) -> List[Taxon]:
 		taxa.append(taxon)
 
 	return taxa
+
+
+def make_archive(path: FilePath, files: Iterable[FilePath], dirname: str = 'genomes') -> List[str]:
+	"""Store files in a zip or tar archive, format determined by the extension of ``path``.
+
+	Parameters
+	----------
+	path
+		Path of archive to create. Tar archives are compressed according to the extension.
+	files
+		Files to add, stored under their base names within the directory ``dirname``.
+
+	Returns
+	-------
+	List[str]
+		Names of members in the archive, in the same order as ``files``.
+	"""
+	path = os.fsdecode(path)
+	files = list(map(os.fsdecode, files))
+	names = [f'{dirname}/{os.path.basename(file)}' for file in files]
+
+	if path.endswith('.zip'):
+		with zipfile.ZipFile(path, 'w') as zf:
+			for file, name in zip(files, names):
+				zf.write(file, name)
+
+	else:
+		ext = path.rsplit('.', 1)[1]
+		with tarfile.open(path, 'w' if ext == 'tar' else 'w:' + ext) as tar:
+			for file, name in zip(files, names):
+				tar.add(file, name)
+
+	return names
@@ -0,0 +1,104 @@
+"""Read files stored in tar and zip archives without extracting them.
+
+Tar archives may be compressed with any method supported by :mod:`tarfile` (gzip, bzip2 or xz).
+Members are identified by their names within the archive. Only regular files are considered
+members, directories and links are skipped.
+"""
+
+import os
+import tarfile
+import zipfile
+from typing import List, Iterator, Tuple, BinaryIO
+
+from .io import FilePath
+
+
+#: File name extensions recognized as archives by :func:`.is_archive`.
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+
+def is_archive(path: FilePath) -> bool:
+	"""Check if a file is a tar or zip archive based on its name."""
+	return os.fsdecode(path).lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _is_hidden(name: str) -> bool:
+	"""Check for hidden files and metadata added by macOS's archive utility."""
+	parts = name.split('/')
+	return parts[0] == '__MACOSX' or parts[-1].startswith('.')
+
+
+def _open_tar(path: FilePath, stream: bool = False) -> tarfile.TarFile:
+	# Stream mode reads the archive sequentially, without seeking backwards
+	return tarfile.open(os.fsdecode(path), 'r|*' if stream else 'r:*')
+
+
+def list_members(path: FilePath) -> List[str]:
+	"""Get the names of all regular files in an archive, in the order they are stored.
+
+	Hidden files (names starting with ``.``) and macOS ``__MACOSX/`` metadata are excluded. Listing
+	the contents of a compressed tar archive requires decompressing all of it.
+	"""
+	if zipfile.is_zipfile(path):
+		with zipfile.ZipFile(path) as zf:
+			names = [info.filename for info in zf.infolist() if not info.is_dir()]
+	else:
+		with _open_tar(path) as tar:
+			names = [member.name for member in tar.getmembers() if member.isfile()]
+
+	return [name for name in names if not _is_hidden(name)]
+
+
+def read_member(path: FilePath, name: str) -> bytes:
+	"""Read the contents of a single archive member.
+
+	The member is located by seeking within the archive, which is slow for compressed tar
+	archives. Use :func:`.iter_members` to read many members.
+
+	Raises
+	------
+	KeyError
+		If the archive has no member with the given name.
+	"""
+	if zipfile.is_zipfile(path):
+		with zipfile.ZipFile(path) as zf:
+			return zf.read(name)
+
+	with _open_tar(path) as tar:
+		member = tar.getmember(name)
+		if not member.isfile():
+			raise KeyError(f'{name!r} is not a regular file')
+		return tar.extractfile(member).read()
+
+
+def iter_members(path: FilePath) -> Iterator[Tuple[str, BinaryIO]]:
+	"""Iterate over the members of an archive sequentially using a single file handle.
+
+	Members are visited in the order they are stored in the archive. Tar archives are read as a
+	stream, so each part of the archive is only read and decompressed once. Each member's contents
+	can be read from the yielded file object, which is only valid until the next member is visited.
+	Contents of members that are not read are skipped over (but compressed tar archives are still
+	decompressed in full).
+
+	Parameters
+	----------
+	path
+		Path to archive file.
+
+	Returns
+	-------
+	Iterator[Tuple[str, BinaryIO]]
+		``(name, fobj)`` pairs for each regular file, including hidden ones.
+	"""
+	if zipfile.is_zipfile(path):
+		with zipfile.ZipFile(path) as zf:
+			for info in zf.infolist():
+				if not info.is_dir():
+					with zf.open(info) as fobj:
+						yield info.filename, fobj
+
+	else:
+		with _open_tar(path, stream=True) as tar:
+			for member in tar:
+				if member.isfile():
+					yield member.name, tar.extractfile(member)
@@ -1,8 +1,15 @@
 """Utility code for reading/writing data files."""
 
 import os
-from io import TextIOWrapper
-from typing import Union, Optional, IO, BinaryIO, ContextManager, Iterable, TypeVar
+import mmap
+import zlib
+import queue
+import struct
+import threading
+from io import TextIOWrapper, RawIOBase, BufferedReader, BufferedWriter, BytesIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, Optional, IO, BinaryIO, ContextManager, Iterable, TypeVar, Tuple
 from contextlib import nullcontext
 
 #: Alias for types which can represent a file system path
@@ -28,6 +35,30 @@ def _open_gzip(path, mode, **kwargs):
 	return gzip.open(path, mode=mode, **kwargs)
 
 
+@_compressed_opener('bgzf')
+def _open_bgzf(path, mode, **kwargs):
+	"""Opener for BGZF (blocked gzip) files, as created by ``bgzip``."""
+	if mode[0] == 'r':
+		binary = BufferedReader(BgzfReader(open(path, 'rb')), BGZF_MAX_BLOCK_SIZE)
+	else:
+		binary = BufferedWriter(BgzfWriter(open(path, mode[0] + 'b')), BGZF_MAX_BLOCK_SIZE)
+	return TextIOWrapper(binary, **kwargs) if mode[1] == 't' else binary
+
+
+@_compressed_opener('bz2')
+def _open_bz2(path, mode, **kwargs):
+	"""Opener for bzip2-compressed files."""
+	import bz2
+	return bz2.open(path, mode=mode, **kwargs)
+
+
+@_compressed_opener('xz')
+def _open_xz(path, mode, **kwargs):
+	"""Opener for xz-compressed files."""
+	import lzma
+	return lzma.open(path, mode=mode, **kwargs)
+
+
 @_compressed_opener('auto')
 def _open_auto(path, mode, **kwargs):
 	"""Open file for reading with compression determined automatically."""
@@ -35,35 +66,27 @@ def _open_auto(path, mode, **kwargs):
 	if mode[0] != 'r':
 		raise ValueError('Automatic compression detection only supported for reading.')
 
-	file = open(path, 'rb')
-
-	try:
+	with open(path, 'rb') as file:
 		compression = guess_compression(file)
-		file.seek(0)
-
-		if compression is None:
-			binary = file
-		elif compression == 'gzip':
-			import gzip
-			binary = gzip.GzipFile(fileobj=file, mode='rb')
-		else:
-			assert 0
-
-		return TextIOWrapper(binary, **kwargs) if mode[1] == 't' else binary
 
-	except Exception:
-		file.close()
+	return COMPRESSED_OPENERS[compression](path, mode, **kwargs)
 
 
 def guess_compression(fobj: BinaryIO) -> Optional[str]:
 	"""Guess the compression mode of an readable file-like object in binary mode.
 
-	Assumes the current position is at the beginning of the file.
+	Assumes the current position is at the beginning of the file. Recognizes all compression types
+	in :data:`COMPRESSED_OPENERS` from their magic bytes. BGZF files are also valid gzip files, but
+	are identified as ``'bgzf'`` so they can be decompressed in parallel.
 	"""
-	magic = fobj.read(2)
-
-	if magic == b'\x1f\x8b':
-		return 'gzip'
+	magic = fobj.read(16)
+
+	if magic[:2] == b'\x1f\x8b':
+		return 'bgzf' if _is_bgzf_header(magic) else 'gzip'
+	elif magic[:3] == b'BZh':
+		return 'bz2'
+	elif magic[:6] == b'\xfd7zXZ\x00':
+		return 'xz'
 	else:
 		return None
 
@@ -71,6 +94,7 @@ def guess_compression(fobj: BinaryIO) -> Optional[str]:
 def open_compressed(compression: Optional[str],
                     path: FilePath,
                     mode: str = 'rt',
+                    background: bool = False,
                     **kwargs,
                     ) -> IO:
 	"""Open a file with compression method specified by a string.
@@ -85,6 +109,9 @@ def open_compressed(compression: Optional[str],
 	mode : str
 		Mode to open file in - similar to :func:`open`. Must be exactly two characters, the first
 		in ``rwax`` and the second in``tb``.
+	background
+		Read and decompress the file in a background thread, see :class:`.BackgroundReader`. Only
+		supported for reading.
 	\\**kwargs
 		Additional text-specific keyword arguments identical to the following :func:`open`
 		arguments: ``encoding``, ``errors``, and ``newlines``.
@@ -106,7 +133,436 @@ def open_compressed(compression: Optional[str],
 	except KeyError:
 		raise ValueError(f'Unknown compression type {compression!r}') from None
 
-	return opener(os.fsdecode(path), mode=mode, **kwargs)
+	if not background:
+		return opener(os.fsdecode(path), mode=mode, **kwargs)
+
+	if mode[0] != 'r':
+		raise ValueError('Background reading is only supported in read mode')
+
+	binary = BufferedReader(BackgroundReader(opener(os.fsdecode(path), mode='rb')))
+	return binary if mode[1] == 'b' else TextIOWrapper(binary, **kwargs)
+
+
+def decompress(compression: Optional[str], data: bytes) -> bytes:
+	"""Decompress data which has already been read into memory.
+
+	Parameters
+	----------
+	compression
+		Compression method, same as in :func:`.open_compressed`. ``'auto'`` determines it from the
+		data with :func:`.guess_compression`.
+	data
+		Compressed data.
+	"""
+	if compression == 'auto':
+		compression = guess_compression(BytesIO(data[:16]))
+
+	if compression is None:
+		return data
+	elif compression in ('gzip', 'bgzf'):
+		import gzip
+		return gzip.decompress(data)
+	elif compression == 'bz2':
+		import bz2
+		return bz2.decompress(data)
+	elif compression == 'xz':
+		import lzma
+		return lzma.decompress(data)
+	else:
+		raise ValueError(f'Unknown compression type {compression!r}')
+
+
+class _BlockReader(RawIOBase):
+	"""Base class for raw binary streams which produce data in blocks.
+
+	Subclasses implement :meth:`_get_block`. Blocks are returned directly from :meth:`read` without
+	copying when the size requested is at least the remaining size of the current block, so the size
+	of the data returned from a single call may be smaller than requested even if not at the end of
+	the stream.
+	"""
+
+	def __init__(self):
+		self._block = b''
+		self._pos = 0
+		self._eof = False
+
+	def _get_block(self) -> bytes:
+		"""Get the next block of data, or an empty bytes object at the end of the stream."""
+		raise NotImplementedError()
+
+	def _next_block(self) -> bool:
+		"""Advance to the next block, returning False at end of stream."""
+		if self._eof:
+			return False
+
+		try:
+			block = self._get_block()
+		except BaseException:
+			self._eof = True
+			raise
+
+		if not block:
+			self._eof = True
+			return False
+
+		self._block = block
+		self._pos = 0
+		return True
+
+	def readable(self):
+		return True
+
+	def read(self, size: int = -1) -> bytes:
+		if size is None or size < 0:
+			return self.readall()
+
+		while self._pos >= len(self._block):
+			if size == 0 or not self._next_block():
+				return b''
+
+		if self._pos == 0 and size >= len(self._block):
+			data = self._block
+		else:
+			data = self._block[self._pos:self._pos + size]
+		self._pos += len(data)
+		return data
+
+	def readall(self) -> bytes:
+		chunks = [self._block[self._pos:]]
+		self._pos = len(self._block)
+		while self._next_block():
+			chunks.append(self._block)
+			self._pos = len(self._block)
+		return b''.join(chunks)
+
+	def readinto(self, b) -> int:
+		data = self.read(len(b))
+		b[:len(data)] = data
+		return len(data)
+
+
+class BackgroundReader(_BlockReader):
+	"""Binary stream which reads from another stream in a background thread.
+
+	Blocks read by the thread are placed in a bounded queue, so that reading (and in particular
+	decompression, which releases the GIL in :mod:`zlib`, :mod:`bz2` and :mod:`lzma`) overlaps with
+	processing of the data in the consuming thread. Errors raised by the source stream are re-raised
+	when the corresponding data would have been read. The source stream is closed along with this
+	one.
+
+	Like :class:`.BgzfReader`, :meth:`read` may return less data than requested before the end of
+	the stream. Wrap in a :class:`io.BufferedReader` if this is a problem.
+
+	Parameters
+	----------
+	source
+		Readable binary stream. Must not be used by any other thread while the reader is open.
+	block_size
+		Size of blocks to read from ``source``.
+	max_blocks
+		Maximum number of blocks read ahead.
+
+	Attributes
+	----------
+	source
+	block_size
+	"""
+	source: BinaryIO
+	block_size: int
+
+	def __init__(self, source: BinaryIO, block_size: int = 2 ** 20, max_blocks: int = 4):
+		if block_size < 1 or max_blocks < 1:
+			raise ValueError('block_size and max_blocks must be positive')
+
+		super().__init__()
+		self.source = source
+		self.block_size = block_size
+		self._queue = queue.Queue(max_blocks)
+		self._stop = threading.Event()
+
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+
+	def _put(self, item) -> bool:
+		# Wait for space in queue, giving up if the reader is closed in the meantime
+		while not self._stop.is_set():
+			try:
+				self._queue.put(item, timeout=.1)
+				return True
+			except queue.Full:
+				pass
+		return False
+
+	def _run(self):
+		try:
+			while True:
+				block = self.source.read(self.block_size)
+				if not self._put(block) or not block:
+					return
+		except BaseException as exc:
+			self._put(exc)
+
+	def _get_block(self) -> bytes:
+		item = self._queue.get()
+		if isinstance(item, BaseException):
+			raise item
+		return item
+
+	def close(self):
+		if not self.closed:
+			self._stop.set()
+			# Unblock thread if it is waiting for space in the queue
+			try:
+				while True:
+					self._queue.get_nowait()
+			except queue.Empty:
+				pass
+			self._thread.join()
+			self.source.close()
+		super().close()
+
+
+#: Maximum size of a BGZF block, compressed or uncompressed.
+BGZF_MAX_BLOCK_SIZE = 2 ** 16
+
+#: Default number of decompression threads used by each :class:`.BgzfReader`. This is kept small
+#: because many files may be read at once, each with its own reader.
+BGZF_DEFAULT_THREADS = 2
+
+# Uncompressed data per block written by BgzfWriter, same as bgzip
+_BGZF_WRITE_SIZE = 0xff00
+
+# Fixed part of gzip member header, followed by XLEN bytes of extra fields
+_GZIP_HEADER = struct.Struct('<4sIBBH')
+
+# Empty block marking the end of a BGZF file
+_BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def _is_bgzf_header(data: bytes) -> bool:
+	"""Check if data starts with a gzip member header with the BGZF extra field."""
+	return data[:4] == b'\x1f\x8b\x08\x04' and data[12:14] == b'BC'
+
+
+def _inflate_bgzf_block(cdata: bytes, crc: int, isize: int) -> bytes:
+	"""Decompress the deflate data of a BGZF block and check it against the trailer values."""
+	try:
+		data = zlib.decompress(cdata, -15)
+	except zlib.error as e:
+		raise OSError(f'Invalid BGZF block data: {e}') from None
+	if len(data) != isize or zlib.crc32(data) != crc:
+		raise OSError('BGZF block failed integrity check')
+	return data
+
+
+class BgzfReader(_BlockReader):
+	"""Binary stream which decompresses a BGZF file, using multiple threads.
+
+	BGZF (blocked gzip, as created by ``bgzip``) files consist of a series of independent gzip
+	members, each containing at most 64 KiB of data and recording its compressed size in a header
+	field. Compressed blocks are read sequentially from the source stream and decompressed in
+	parallel by a thread pool (:mod:`zlib` releases the GIL), a limited number ahead of the current
+	position. Data is returned in order.
+
+	Parameters
+	----------
+	source
+		Readable binary stream of compressed data. It is closed along with this one.
+	nthreads
+		Number of decompression threads. Defaults to :data:`.BGZF_DEFAULT_THREADS`.
+	max_pending
+		Maximum number of blocks read and decompressed ahead. Defaults to four times ``nthreads``.
+
+	Attributes
+	----------
+	source
+	nthreads
+	"""
+	source: BinaryIO
+	nthreads: int
+
+	def __init__(self, source: BinaryIO, nthreads: Optional[int] = None, max_pending: Optional[int] = None):
+		if nthreads is None:
+			nthreads = BGZF_DEFAULT_THREADS
+		elif nthreads < 1:
+			raise ValueError('nthreads must be positive')
+		super().__init__()
+		self.source = source
+		self.nthreads = nthreads
+		self._max_pending = max_pending or 4 * self.nthreads
+		self._executor = ThreadPoolExecutor(self.nthreads)
+		self._pending = deque()
+		self._source_eof = False
+
+	def _read_raw_block(self) -> Optional[Tuple[bytes, int, int]]:
+		"""Read the next compressed block from the source.
+
+		Returns the raw deflate data along with the CRC and uncompressed size from the trailer, or
+		None at the end of the file.
+		"""
+		header = self.source.read(_GZIP_HEADER.size)
+		if not header:
+			return None
+		if len(header) < _GZIP_HEADER.size:
+			raise EOFError('BGZF file ended in the middle of a block header')
+
+		magic, mtime, xfl, os_, xlen = _GZIP_HEADER.unpack(header)
+		extra = self.source.read(xlen)
+		if magic != b'\x1f\x8b\x08\x04' or len(extra) != xlen:
+			raise OSError('Not a valid BGZF block header')
+
+		# Find BSIZE subfield, total block size minus 1
+		bsize = None
+		pos = 0
+		while pos + 4 <= xlen:
+			si, slen = extra[pos:pos + 2], extra[pos + 2] | (extra[pos + 3] << 8)
+			if si == b'BC' and slen == 2:
+				bsize = extra[pos + 4] | (extra[pos + 5] << 8)
+				break
+			pos += 4 + slen
+		if bsize is None:
+			raise OSError('BGZF block header missing BSIZE field')
+
+		remaining = bsize + 1 - _GZIP_HEADER.size - xlen
+		body = self.source.read(remaining)
+		if remaining < 8 or len(body) != remaining:
+			raise EOFError('BGZF file ended in the middle of a block')
+
+		crc, isize = struct.unpack('<II', body[-8:])
+		return body[:-8], crc, isize
+
+	def _fill(self):
+		"""Submit blocks for decompression until the limit on pending blocks is reached."""
+		while not self._source_eof and len(self._pending) < self._max_pending:
+			raw = self._read_raw_block()
+			if raw is None:
+				self._source_eof = True
+			else:
+				self._pending.append(self._executor.submit(_inflate_bgzf_block, *raw))
+
+	def _get_block(self) -> bytes:
+		# Skip empty blocks, such as the end-of-file marker of each concatenated file
+		while True:
+			self._fill()
+			if not self._pending:
+				return b''
+			data = self._pending.popleft().result()
+			if data:
+				return data
+
+	def close(self):
+		if not self.closed:
+			for future in self._pending:
+				future.cancel()
+			self._pending.clear()
+			self._executor.shutdown(wait=True)
+			self.source.close()
+		super().close()
+
+
+class BgzfWriter(RawIOBase):
+	"""Binary stream which writes a BGZF file.
+
+	The output is a valid gzip file which can also be read by :class:`.BgzfReader`, ``bgzip`` and
+	``samtools``. The end-of-file marker block is written when the stream is closed.
+
+	Parameters
+	----------
+	dest
+		Writable binary stream. It is closed along with this one.
+	compresslevel
+		zlib compression level.
+	"""
+
+	def __init__(self, dest: BinaryIO, compresslevel: int = 6):
+		self.dest = dest
+		self.compresslevel = compresslevel
+		self._buf = bytearray()
+
+	def writable(self):
+		return True
+
+	def write(self, b) -> int:
+		self._buf += b
+		while len(self._buf) >= _BGZF_WRITE_SIZE:
+			self._write_block(self._buf[:_BGZF_WRITE_SIZE])
+			del self._buf[:_BGZF_WRITE_SIZE]
+		return len(b)
+
+	def _write_block(self, data: bytes):
+		compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15)
+		cdata = compressor.compress(data) + compressor.flush()
+		bsize = _GZIP_HEADER.size + 6 + len(cdata) + 8 - 1
+		self.dest.write(_GZIP_HEADER.pack(b'\x1f\x8b\x08\x04', 0, 0, 0xff, 6))
+		self.dest.write(struct.pack('<2sHH', b'BC', 2, bsize))
+		self.dest.write(cdata)
+		self.dest.write(struct.pack('<II', zlib.crc32(data), len(data)))
+
+	def close(self):
+		if not self.closed:
+			try:
+				if self._buf:
+					self._write_block(bytes(self._buf))
+					self._buf.clear()
+				self.dest.write(_BGZF_EOF)
+			finally:
+				self.dest.close()
+		super().close()
+
+
+class MappedFile:
+	"""Read-only memory map of a file's contents.
+
+	Gives access to the data of an uncompressed file without copying it into Python buffers, pages
+	are read by the OS as they are accessed. The :attr:`buffer` attribute supports the buffer
+	protocol and ``find()``, memoryview slices of it may be passed directly to native code. Can be
+	used as a context manager which closes the map on exit.
+
+	Slices which are still referenced when the map is closed remain valid, the mapping itself is
+	then only released once they have all been garbage collected.
+
+	Parameters
+	----------
+	path
+		Path of file to map.
+
+	Attributes
+	----------
+	buffer
+		The mapped data, a :class:`mmap.mmap` (or an empty ``bytes`` object for an empty file, which
+		cannot be mapped). None after the instance is closed.
+	"""
+	buffer: Union[mmap.mmap, bytes, None]
+
+	def __init__(self, path: FilePath):
+		with open(path, 'rb') as f:
+			if os.fstat(f.fileno()).st_size == 0:
+				self.buffer = b''
+				return
+			self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		if hasattr(mmap, 'MADV_SEQUENTIAL'):
+			self.buffer.madvise(mmap.MADV_SEQUENTIAL)
+
+	@property
+	def closed(self) -> bool:
+		return self.buffer is None
+
+	def close(self):
+		"""Close the map."""
+		if isinstance(self.buffer, mmap.mmap):
+			try:
+				self.buffer.close()
+			except BufferError:
+				# Slices of the buffer are still in use
+				pass
+		self.buffer = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
 
 
 class ClosingIterator(Iterable[T]):
@@ -0,0 +1,171 @@
+"""Reusable pool of worker processes.
+
+Creating a :class:`concurrent.futures.ProcessPoolExecutor` for every batch of work means each new
+worker process has to import numpy, Biopython, h5py and the rest of gambit again. The
+:class:`WorkerPool` class keeps a single executor alive between calls and only recreates it when
+the requested number of workers changes or the previous one has broken. Worker processes are
+started with the ``forkserver`` method (``spawn`` where this is not available) instead of the
+default ``fork``, which may deadlock in the child if the parent has already used OpenMP threads.
+"""
+
+import os
+import atexit
+import threading
+import importlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence
+
+
+#: Modules imported by worker processes (or the fork server they are started from) ahead of time.
+DEFAULT_PRELOAD = ('gambit.sigs.calc', 'gambit.sigs.hdf5', 'gambit.query')
+
+
+def _preload_modules(modules: Sequence[str]):
+	"""Worker process initializer which imports modules."""
+	for name in modules:
+		importlib.import_module(name)
+
+
+def _get_context(method: Optional[str]) -> mp.context.BaseContext:
+	"""Get multiprocessing context, defaulting to forkserver if available."""
+	if method is None:
+		method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+	if method == 'fork':
+		raise ValueError('The "fork" start method is not safe to use with OpenMP threads')
+	return mp.get_context(method)
+
+
+class WorkerPool:
+	"""Pool of worker processes which is reused between calls.
+
+	The executor is created lazily when first requested by :meth:`executor`. Instances can be used
+	as context managers, on exit the :meth:`shutdown` method is called. A pool which has been shut
+	down may be used again, in which case new worker processes are started.
+
+	Parameters
+	----------
+	max_workers
+		Default number of worker processes. Defaults to the number of CPUs.
+	start_method
+		Multiprocessing start method, ``"forkserver"`` (default where available) or ``"spawn"``.
+	preload
+		Names of modules to import in worker processes before they receive any tasks.
+
+	Attributes
+	----------
+	max_workers
+	start_method
+	preload
+	"""
+	max_workers: Optional[int]
+	start_method: str
+	preload: Sequence[str]
+
+	def __init__(self,
+	             max_workers: Optional[int] = None,
+	             start_method: Optional[str] = None,
+	             preload: Sequence[str] = DEFAULT_PRELOAD,
+	             ):
+		if max_workers is not None and max_workers < 1:
+			raise ValueError('max_workers must be positive')
+
+		self._context = _get_context(start_method)
+		self.start_method = self._context.get_start_method()
+		self.max_workers = max_workers
+		self.preload = tuple(preload)
+
+		self._executor = None
+		self._nworkers = None
+		self._lock = threading.Lock()
+
+		if self.start_method == 'forkserver':
+			self._context.set_forkserver_preload(list(self.preload))
+
+	@property
+	def running(self) -> bool:
+		"""Whether the pool currently has an active executor."""
+		return self._executor is not None
+
+	def _is_broken(self) -> bool:
+		# The executor refuses new tasks after one of its processes died unexpectedly
+		return bool(getattr(self._executor, '_broken', False))
+
+	def executor(self, max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+		"""Get the pool's executor, starting it if needed.
+
+		The existing executor is returned if it has the requested number of workers. Otherwise it
+		is shut down (after completing its pending tasks) and replaced. Do not shut down the returned
+		executor directly, use :meth:`shutdown` instead.
+
+		Parameters
+		----------
+		max_workers
+			Number of worker processes. Defaults to the value given in the constructor.
+		"""
+		if max_workers is None:
+			max_workers = self.max_workers or os.cpu_count() or 1
+		elif max_workers < 1:
+			raise ValueError('max_workers must be positive')
+
+		with self._lock:
+			if self._executor is not None and (self._nworkers != max_workers or self._is_broken()):
+				self._executor.shutdown(wait=True)
+				self._executor = None
+
+			if self._executor is None:
+				self._executor = ProcessPoolExecutor(
+					max_workers=max_workers,
+					mp_context=self._context,
+					initializer=_preload_modules,
+					initargs=(self.preload,),
+				)
+				self._nworkers = max_workers
+
+			return self._executor
+
+	def shutdown(self, wait: bool = True):
+		"""Shut down the worker processes, if running.
+
+		Parameters
+		----------
+		wait
+			Wait for pending tasks to finish and worker processes to exit.
+		"""
+		with self._lock:
+			if self._executor is not None:
+				self._executor.shutdown(wait=wait)
+				self._executor = None
+				self._nworkers = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.shutdown()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> WorkerPool:
+	"""Get the module-level default :class:`.WorkerPool`, creating it on first use.
+
+	Its worker processes are shut down automatically when the interpreter exits.
+	"""
+	global _default_pool
+
+	with _default_pool_lock:
+		if _default_pool is None:
+			_default_pool = WorkerPool()
+		return _default_pool
+
+
+def shutdown_worker_pool(wait: bool = True):
+	"""Shut down the default :class:`.WorkerPool`'s worker processes if it has been started."""
+	if _default_pool is not None:
+		_default_pool.shutdown(wait=wait)
+
+
+atexit.register(shutdown_worker_pool)
@@ -4,7 +4,9 @@ import pytest
 import numpy as np
 
 from gambit.kmers import KmerSpec
-from gambit.sigs.calc import calc_signature, ArrayAccumulator, SetAccumulator
+from gambit.sigs.calc import calc_signature, calc_file_signatures, ArrayAccumulator, BitsetAccumulator, \
+	BufferAccumulator, SetAccumulator
+from gambit.seq import SequenceFile
 from gambit.test import random_seq
 
 
@@ -32,7 +34,12 @@ def kspec(k, prefix_len):
 
 @pytest.fixture(
 	scope='module',
-	params=[pytest.param(ArrayAccumulator, id='array'), pytest.param(SetAccumulator, id='set')],
+	params=[
+		pytest.param(ArrayAccumulator, id='array'),
+		pytest.param(BitsetAccumulator, id='bitset'),
+		pytest.param(BufferAccumulator, id='buffer'),
+		pytest.param(SetAccumulator, id='set'),
+	],
 )
 def accumulator(request):
 	return request.param
@@ -41,3 +48,50 @@ def accumulator(request):
 def benchmark_calc_signature(seq, kspec, benchmark, accumulator):
 	acc = accumulator(kspec.k)
 	benchmark(calc_signature, kspec, seq, accumulator=acc)
+
+
+@pytest.fixture(scope='module', params=[None, 'gzip', 'bgzf'])
+def genome_files(request, tmp_path_factory):
+	"""Set of 16 FASTA files with 5 Mb of sequence data each."""
+	tmp_path = tmp_path_factory.mktemp('genomes')
+	np.random.seed(0)
+	files = []
+
+	for i in range(16):
+		file = SequenceFile(tmp_path / f'{i}.fasta', 'fasta', request.param)
+		with file.open('wb') as f:
+			for j in range(10):
+				seq = random_seq(500_000)
+				f.write(b'>contig%d\n' % j)
+				for start in range(0, len(seq), 80):
+					f.write(seq[start:start + 80] + b'\n')
+		files.append(file)
+
+	return files
+
+
+@pytest.mark.parametrize('concurrency', ['threads', 'processes'])
+@pytest.mark.parametrize('max_workers', [1, 4])
+@pytest.mark.parametrize('block_size', [None, 2**16, 2**20])
+def benchmark_calc_file_signatures(genome_files, concurrency, max_workers, block_size, benchmark):
+	"""Compare thread- and process-based concurrency.
+
+	Results are grouped so that each pair of thread and process runs with the same settings is
+	reported together.
+
+	Uncompressed files are memory-mapped regardless of ``block_size``, so only the default is run
+	for them. With ``block_size=None`` threads stream files in blocks of the default size while
+	processes parse whole records.
+	"""
+	compression = genome_files[0].compression
+	if compression is None and block_size is not None:
+		pytest.skip('block_size has no effect on memory-mapped files')
+
+	benchmark.group = f'compression={compression} block_size={block_size} max_workers={max_workers}'
+	kspec = KmerSpec(11, 'ATGAC')
+	benchmark.pedantic(
+		calc_file_signatures,
+		args=(kspec, genome_files),
+		kwargs=dict(concurrency=concurrency, max_workers=max_workers, block_size=block_size),
+		rounds=3,
+	)
@@ -1,5 +1,7 @@
 """Test code in gambit.cli.common."""
 
+import zipfile
+import tarfile
 from pathlib import Path
 
 import pytest
@@ -89,6 +91,15 @@ def test_strip_seq_file_ext():
 			assert common.strip_seq_file_ext(stem + ext + '.gz') == stem
 
 
+def test_is_seq_file_name():
+	"""Test the is_seq_file_name function."""
+	for ext in common.FASTA_EXTENSIONS:
+		for comp_ext in ['', '.gz', '.bz2', '.xz']:
+			assert common.is_seq_file_name('dir/foo' + ext + comp_ext)
+	for name in ['foo', 'foo.txt', 'foo.gz', 'foo.fasta.zip', 'fasta']:
+		assert not common.is_seq_file_name(name)
+
+
 @pytest.mark.parametrize(
 	['strip_dir', 'strip_ext'],
 	[(True, True), (True, False), (False, False)],
@@ -142,6 +153,37 @@ class TestGetSequenceFiles:
 		self.check_ids(ids, list_paths, strip_dir, strip_ext)
 		self.check_files(files, true_paths)
 
+	def test_archive(self, tmp_path, strip_dir, strip_ext):
+		"""Test expanding archives into their members."""
+		archive = tmp_path / 'genomes.zip'
+		members = ['genomes/1.fasta', 'genomes/2.fna.gz', '3.fa']
+		with zipfile.ZipFile(archive, 'w') as zf:
+			zf.writestr('genomes/', b'')
+			zf.writestr(members[0], b'')
+			zf.writestr('genomes/README.txt', b'')
+			zf.writestr(members[1], b'')
+			zf.writestr('__MACOSX/genomes/._1.fasta', b'')
+			zf.writestr(members[2], b'')
+
+		paths = ['path/to/0.fasta', str(archive)]
+		ids, files = common.get_sequence_files(paths, None, None, strip_dir=strip_dir, strip_ext=strip_ext)
+
+		self.check_files(files[:1], paths[:1])
+		for file, member in zip_strict(files[1:], members):
+			assert file == SequenceFile(archive, 'fasta', 'auto', member)
+
+		if strip_dir:
+			expected = ['0', '1', '2', '3'] if strip_ext else ['0.fasta', *(Path(m).name for m in members)]
+		else:
+			expected = [paths[0], *(f'{archive}/{m}' for m in members)]
+		assert ids == expected
+
+		empty = tmp_path / 'empty.tar.gz'
+		with tarfile.open(empty, 'w:gz'):
+			pass
+		with pytest.raises(click.ClickException):
+			common.get_sequence_files([empty], None, None)
+
 
 def test_params_by_name():
 	from gambit.cli.query import query_cmd as cmd
@@ -13,6 +13,8 @@ from gambit.util.io import write_lines
 from gambit.cluster import load_dmat_csv
 import gambit.util.json as gjson
 from gambit.kmers import DEFAULT_KMERSPEC
+from gambit.cli.common import get_file_id
+from gambit.test import make_archive
 
 
 @pytest.fixture()
@@ -205,3 +207,30 @@ def test_square(make_args, q_type, outfile, expected_matrix_square, nqueries):
 	out_dmat, row_ids, col_ids = load_dmat_csv(outfile)
 	assert np.allclose(out_dmat, expected_matrix_square[:nqueries, :nqueries], atol=1e-4)
 	assert row_ids == col_ids
+
+
+@pytest.mark.parametrize('archive_ext', ['zip', 'tar.gz'])
+def test_archive(testdb, outfile, expected_matrix, tmp_path, archive_ext):
+	"""Test reading query and reference genomes from archives."""
+	query_files = [f.path for f in testdb.get_query_files()]
+	ref_files = [f.path for f in testdb.get_ref_files()]
+	query_archive = tmp_path / f'queries.{archive_ext}'
+	ref_archive = tmp_path / f'refs.{archive_ext}'
+	query_members = make_archive(query_archive, query_files)
+	ref_members = make_archive(ref_archive, ref_files)
+
+	args = [
+		'dist', '-o', outfile, '-q', query_archive, '-r', ref_archive,
+		'-k', str(testdb.kmerspec.k), f'--prefix={testdb.kmerspec.prefix_str}',
+	]
+
+	result = invoke_cli([*args, '--dump-params'])
+	params = json.loads(result.stdout)
+	assert params['query_files'] == [f'{query_archive}/{name}' for name in query_members]
+	assert params['ref_files'] == [f'{ref_archive}/{name}' for name in ref_members]
+
+	invoke_cli(args)
+	dmat, row_ids, col_ids = load_dmat_csv(outfile)
+	assert np.allclose(dmat, expected_matrix, atol=1e-4)
+	assert row_ids == list(map(get_file_id, query_files))
+	assert col_ids == list(map(get_file_id, ref_files))
@@ -14,6 +14,7 @@ from gambit.query import QueryInput
 from gambit.util.misc import zip_strict
 from gambit.util.io import write_lines
 from gambit.cli.common import strip_seq_file_ext
+from gambit.test import make_archive
 
 
 @pytest.fixture(params=[None])
@@ -176,3 +177,21 @@ def test_invalid(make_args, tmp_path):
 	assert invoke_cli(args, success=False)
 	args = make_args(output=results_file, list_file=True, sig_file=True)
 	assert invoke_cli(args, success=False)
+
+
+@pytest.mark.parametrize('archive_ext', ['zip', 'tar.gz'])
+def test_archive(make_args, make_ref_results, query_files, testdb, tmp_path, archive_ext):
+	"""Test reading query genomes from an archive."""
+	archive = tmp_path / f'genomes.{archive_ext}'
+	members = make_archive(archive, [file.path for file in query_files])
+
+	inputs = [
+		QueryInput(strip_seq_file_ext(file.path.name), SequenceFile(archive, 'fasta', 'auto', member))
+		for file, member in zip_strict(query_files, members)
+	]
+	ref_results = make_ref_results(False, inputs)
+
+	results_file = tmp_path / 'results.csv'
+	args = make_args(output=results_file, outfmt='csv')
+	invoke_cli([*args, str(archive)])
+	check_results(results_file, 'csv', ref_results)
@@ -1,6 +1,8 @@
 """Tests for the "signatures" command group."""
 
 import json
+import zipfile
+import tarfile
 
 import pytest
 import numpy as np
@@ -127,6 +129,23 @@ class TestCreateCommand:
 		assert params['files'] == list(map(str, infiles))
 		assert params['ids'] == default_ids
 
+	@pytest.mark.parametrize('archive_name', ['genomes.zip', 'genomes.tar.gz'])
+	def test_archive(self, make_args, check_output, infiles, tmp_path, archive_name):
+		"""Test reading genomes from an archive."""
+		archive = tmp_path / archive_name
+		if archive_name.endswith('.zip'):
+			with zipfile.ZipFile(archive, 'w') as zf:
+				for file in infiles:
+					zf.write(file, f'genomes/{file.name}')
+		else:
+			with tarfile.open(archive, 'w:gz') as tar:
+				for file in infiles:
+					tar.add(file, f'genomes/{file.name}')
+
+		args = make_args(positional_files=False)
+		invoke_cli([*args, str(archive)])
+		check_output()
+
 	def test_with_metadata(self, testdb, make_args, check_output, tmp_path):
 		"""Test with ids and metadata JSON added."""
 		# Metadata file
@@ -203,6 +222,28 @@ class TestCreateCommand:
 		args = make_args(['-d'], with_kspec=False)
 		invoke_cli(args, success=False)
 
+	def test_extra_kspecs(self, make_args, check_output, testdb, infiles, tmp_path):
+		"""Test calculating signatures for additional KmerSpecs in the same pass."""
+		from gambit.kmers import KmerSpec
+		from gambit.sigs.calc import calc_file_signatures
+		from gambit.seq import SequenceFile
+
+		kspec2 = KmerSpec(8, testdb.kmerspec.prefix + b'G')
+		out2 = tmp_path / 'signatures2.gs'
+
+		args = make_args(['-x', f'{kspec2.k}/{kspec2.prefix_str}', out2])
+		invoke_cli(args)
+
+		out = check_output()
+		sigs2 = load_signatures(out2)
+		files = SequenceFile.from_paths(infiles, 'fasta')
+		assert sigs2 == calc_file_signatures(kspec2, files, concurrency=None)
+		assert np.array_equal(sigs2.ids, out.ids)
+
+		# Invalid spec
+		args = make_args(['-x', '8-ATGAC', out2])
+		invoke_cli(args, success=False)
+
 	def test_ids_wrong_len(self, testdb, make_args, tmp_path):
 		"""Test where number of IDs does not match query files."""
 
@@ -212,3 +253,57 @@ class TestCreateCommand:
 
 		args = make_args(['--ids', str(id_file)])
 		invoke_cli(args, success=False)
+
+
+class TestAppendCommand:
+
+	@pytest.fixture()
+	def infiles(self, testdb):
+		return [f.path for f in testdb.get_query_files()]
+
+	@pytest.fixture()
+	def sigfile(self, testdb, infiles, tmp_path):
+		"""Signature file created from first half of query files."""
+		path = tmp_path / 'signatures.gs'
+		kspec = testdb.kmerspec
+		args = ['signatures', 'create', '-o', path, '-k', kspec.k, '-p', kspec.prefix_str, '--no-progress']
+		args += infiles[:len(infiles) // 2]
+		invoke_cli(list(map(str, args)))
+		return path
+
+	def test_append(self, testdb, infiles, sigfile):
+		n = len(infiles) // 2
+
+		args = ['signatures', 'append', sigfile, '--no-progress', *infiles[n:]]
+		invoke_cli(list(map(str, args)))
+
+		out = load_signatures(sigfile)
+		assert out == testdb.query_signatures
+		assert out.kmerspec == testdb.kmerspec
+		assert np.array_equal(out.ids, [strip_seq_file_ext(f.name) for f in infiles])
+
+	def test_ids_file(self, testdb, infiles, sigfile, tmp_path):
+		n = len(infiles) // 2
+		ids = [f'new-{i}' for i in range(len(infiles) - n)]
+		id_file = tmp_path / 'ids.txt'
+		write_lines(ids, id_file)
+
+		args = ['signatures', 'append', sigfile, '--no-progress', '-i', id_file, *infiles[n:]]
+		invoke_cli(list(map(str, args)))
+
+		out = load_signatures(sigfile)
+		assert out == testdb.query_signatures
+		assert np.array_equal(out.ids[n:], ids)
+
+	def test_duplicate_ids(self, infiles, sigfile):
+		"""Test appending IDs already in the file fails without modifying it."""
+		before = load_signatures(sigfile)
+		before_ids = list(before.ids)
+		before.close()
+
+		args = ['signatures', 'append', sigfile, '--no-progress', infiles[0]]
+		invoke_cli(list(map(str, args)), success=False)
+
+		with load_signatures(sigfile) as after:
+			assert list(after.ids) == before_ids
+			assert len(after) == len(before_ids)
@@ -9,6 +9,7 @@ from gambit.metric import jaccarddist_pairwise
 from gambit.cli.test import invoke_cli
 from gambit.cluster import hclust, check_tree_matches_linkage
 from gambit.cli import common
+from gambit.test import make_archive
 
 @pytest.fixture()
 def expected_dmat(testdb):
@@ -19,8 +20,8 @@ def expected_dmat(testdb):
 def expected_linkage(expected_dmat):
 	return hclust(expected_dmat)
 
-@pytest.mark.parametrize('from_sigs', [False, True])
-def test_tree_command(from_sigs, expected_linkage, testdb):
+@pytest.mark.parametrize('from_sigs,cache', [(False, False), (False, True), (True, False)])
+def test_tree_command(from_sigs, cache, expected_linkage, testdb, tmp_path):
 	"""Test running the command and checking the output."""
 	seqfiles = [str(f.path) for f in testdb.get_query_files()]
 
@@ -31,11 +32,30 @@ def test_tree_command(from_sigs, expected_linkage, testdb):
 		kspec = testdb.kmerspec
 		args += ['-k', kspec.k, '--prefix', kspec.prefix_str]
 		args += seqfiles
+		if cache:
+			args += ['--cache', tmp_path / 'cache.db']
 
-	result = invoke_cli(args)
-	result_buf = StringIO(result.stdout)
-	result_tree = Phylo.read(result_buf, 'newick')
+	# Run twice when using cache, second time should read signatures from it
+	for i in range(2 if cache else 1):
+		result = invoke_cli(args)
+		result_buf = StringIO(result.stdout)
+		result_tree = Phylo.read(result_buf, 'newick')
+
+		expected_labels = list(map(common.get_file_id, seqfiles))
+
+		check_tree_matches_linkage(result_tree, expected_linkage, expected_labels)
 
-	expected_labels = list(map(common.get_file_id, seqfiles))
 
+@pytest.mark.parametrize('archive_ext', ['zip', 'tar.gz'])
+def test_archive(archive_ext, expected_linkage, testdb, tmp_path):
+	"""Test reading genomes from an archive."""
+	seqfiles = [f.path for f in testdb.get_query_files()]
+	archive = tmp_path / f'genomes.{archive_ext}'
+	make_archive(archive, seqfiles)
+
+	kspec = testdb.kmerspec
+	result = invoke_cli(['tree', '-k', kspec.k, '--prefix', kspec.prefix_str, archive])
+	result_tree = Phylo.read(StringIO(result.stdout), 'newick')
+
+	expected_labels = list(map(common.get_file_id, seqfiles))
 	check_tree_matches_linkage(result_tree, expected_linkage, expected_labels)
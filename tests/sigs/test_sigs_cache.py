@@ -0,0 +1,162 @@
+"""Test gambit.sigs.cache."""
+
+import shutil
+import zipfile
+from unittest import mock
+
+import pytest
+import numpy as np
+
+from gambit.sigs.cache import SignatureCache, file_content_hash
+from gambit.sigs.calc import calc_file_signatures
+from gambit.sigs import sigarray_eq, SignatureArray
+from gambit.kmers import KmerSpec
+from gambit.seq import SequenceFile
+from gambit.util.archive import iter_members, read_member
+from gambit.test import random_seq, make_archive
+
+
+KSPEC = KmerSpec(11, 'ATGAC')
+
+
+@pytest.fixture()
+def cache(tmp_path):
+	with SignatureCache(tmp_path / 'cache.db') as cache:
+		yield cache
+
+
+def test_file_hash(cache, tmp_path):
+	"""Test cached file hashes are updated when file changes."""
+	file = tmp_path / 'test.txt'
+	file.write_bytes(b'foo')
+	h = cache.file_hash(file)
+	assert h == file_content_hash(file)
+	assert cache.file_hash(file) == h
+
+	file.write_bytes(b'foobar')
+	h2 = cache.file_hash(file)
+	assert h2 != h
+	assert h2 == file_content_hash(file)
+
+
+def test_file_hash_archive_member(cache, tmp_path):
+	"""Test hashes of archive members are of the member's contents."""
+	file = tmp_path / 'test.txt'
+	file.write_bytes(b'foo')
+
+	archive = tmp_path / 'test.zip'
+	with zipfile.ZipFile(archive, 'w') as zf:
+		zf.write(file, 'a.txt')
+		zf.writestr('b.txt', b'bar')
+
+	a = SequenceFile(archive, 'fasta', member='a.txt')
+	h = cache.file_hash(a)
+	assert h == file_content_hash(file)
+	assert cache.file_hash(a) == h
+	assert cache.file_hash(SequenceFile(archive, 'fasta', member='b.txt')) != h
+
+	with zipfile.ZipFile(archive, 'w') as zf:
+		zf.writestr('a.txt', b'foobar')
+	assert cache.file_hash(a) != h
+
+
+@pytest.mark.parametrize('archive_type', ['zip', 'tar.gz'])
+def test_file_hashes_archive(cache, tmp_path, archive_type):
+	"""Test hashing many archive members reads the archive once."""
+	np.random.seed(0)
+	files = []
+	for i in range(10):
+		file = tmp_path / f'{i}.fasta'
+		file.write_bytes(random_seq(100))
+		files.append(file)
+
+	archive = tmp_path / f'genomes.{archive_type}'
+	make_archive(archive, files)
+	members = SequenceFile.from_archive(archive, 'fasta')
+
+	with mock.patch('gambit.seq.iter_members', wraps=iter_members) as m_iter, \
+			mock.patch('gambit.seq.read_member', wraps=read_member) as m_read:
+		hashes = cache.file_hashes(members)
+		assert m_iter.call_count == 1
+		assert m_read.call_count == 0
+
+	assert hashes == list(map(file_content_hash, files))
+
+	# Already stored
+	with mock.patch('gambit.seq.iter_members', wraps=iter_members) as m_iter:
+		assert cache.file_hashes(members) == hashes
+		assert m_iter.call_count == 0
+
+
+def test_get_put(cache):
+	"""Test adding and retrieving signatures."""
+	kspec2 = KmerSpec(14, 'ATGAC')
+	sig = np.arange(100, dtype=KSPEC.index_dtype)
+
+	assert cache.get('abc', KSPEC) is None
+	cache.put('abc', KSPEC, sig)
+
+	sig2 = cache.get('abc', KSPEC)
+	assert sig2.dtype == KSPEC.index_dtype
+	assert np.array_equal(sig2, sig)
+	assert cache.get('abc', kspec2) is None
+	assert cache.get('def', KSPEC) is None
+	assert cache.size() == (1, sig.nbytes)
+
+	cache.clear()
+	assert cache.size() == (0, 0)
+
+
+def test_eviction(tmp_path):
+	"""Test least recently used signatures are evicted when maximum size is exceeded."""
+	sig = np.arange(100, dtype=KSPEC.index_dtype)
+
+	with SignatureCache(tmp_path / 'cache.db', max_size=3 * sig.nbytes) as cache:
+		for key in 'abc':
+			cache.put(key, KSPEC, sig)
+		assert cache.get('a', KSPEC) is not None
+
+		cache.put('d', KSPEC, sig)
+		assert cache.size() == (3, 3 * sig.nbytes)
+		assert cache.get('b', KSPEC) is None
+		assert all(cache.get(key, KSPEC) is not None for key in 'acd')
+
+
+def test_concurrent_access(tmp_path):
+	"""Test two instances using the same file."""
+	sig = np.arange(100, dtype=KSPEC.index_dtype)
+
+	with SignatureCache(tmp_path / 'cache.db') as cache1, SignatureCache(tmp_path / 'cache.db') as cache2:
+		cache1.put('a', KSPEC, sig)
+		assert np.array_equal(cache2.get('a', KSPEC), sig)
+
+
+@pytest.mark.parametrize('shared_memory', [False, True])
+def test_calc_file_signatures(cache, tmp_path, monkeypatch, shared_memory):
+	"""Test using cache in calc_file_signatures()."""
+	np.random.seed(0)
+	files = []
+	for i in range(3):
+		file = SequenceFile(tmp_path / f'{i}.fasta', 'fasta')
+		file.path.write_bytes(b'>seq\n' + random_seq(10000) + b'\n')
+		files.append(file)
+
+	# Duplicate contents under a different name
+	shutil.copy(files[0].path, tmp_path / 'copy.fasta')
+	files.append(SequenceFile(tmp_path / 'copy.fasta', 'fasta'))
+	files.append(files[1])
+
+	expected = calc_file_signatures(KSPEC, files, concurrency=None)
+
+	sigs = calc_file_signatures(KSPEC, files, concurrency=None, cache=cache, shared_memory=shared_memory)
+	assert sigarray_eq(sigs, expected)
+	assert isinstance(sigs, SignatureArray) == shared_memory
+	assert cache.size()[0] == 3
+
+	# Second time should use cached values only
+	def fail(*args, **kw):
+		raise AssertionError('Should not be called')
+
+	monkeypatch.setattr('gambit.sigs.calc.calc_file_signature', fail)
+	sigs2 = calc_file_signatures(KSPEC, files, concurrency=None, cache=cache)
+	assert sigarray_eq(sigs2, expected)
@@ -1,24 +1,190 @@
 """Tests for gambit.search module."""
 
 from io import StringIO
+from pathlib import Path
+from functools import partial
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+import zipfile
+import tarfile
 
 import pytest
 import numpy as np
 from Bio import SeqIO
 from Bio.Seq import Seq
 
-from gambit.sigs.calc import calc_signature, calc_file_signature, calc_file_signatures
+from gambit.sigs.calc import calc_signature, calc_file_signature, calc_file_signatures, \
+	calc_signature_multi, calc_file_signatures_multi, calc_signature_parallel, iter_file_signatures, \
+	iter_file_signatures_multi, calc_reads_signature, calc_signatures_batch, calc_file_signatures_with_records, \
+	ArrayAccumulator, BitsetAccumulator, BufferAccumulator, \
+	SetAccumulator, CountArrayAccumulator, CountTableAccumulator
 from gambit.kmers import KmerSpec, index_to_kmer
-from gambit.seq import SEQ_TYPES, revcomp, SequenceFile
-from gambit.test import fill_bytearray, make_kmer_seq, make_kmer_seqs, convert_seq
+from gambit.seq import SEQ_TYPES, revcomp, SequenceFile, AssemblyStatsAccumulator
+from gambit.test import make_archive, fill_bytearray, make_kmer_seq, make_kmer_seqs, convert_seq, random_seq
 import gambit.util.io as ioutil
-from gambit.sigs import sigarray_eq
+from gambit.sigs import sigarray_eq, SignatureArray, AnnotatedSignatures
+from gambit.sigs.cache import SignatureCache
+from gambit.util.misc import zip_strict
 from gambit.util.progress import check_progress
 
 
 KSPEC = KmerSpec(11, 'AGTAC')
 
 
+@pytest.mark.parametrize('cls', [
+	ArrayAccumulator,
+	BitsetAccumulator,
+	BufferAccumulator,
+	partial(BufferAccumulator, dedup_threshold=100),
+	SetAccumulator,
+])
+@pytest.mark.parametrize('k', [2, 7])
+def test_accumulator(cls, k):
+	"""Test KmerAccumulator implementations."""
+	acc = cls(k)
+	nk = 4 ** k
+
+	np.random.seed(0)
+	indices = np.random.choice(nk, nk // 3)
+	expected = np.unique(indices)
+
+	assert len(acc) == 0
+	acc.add_indices(indices[:10])
+	for idx in indices[10:]:
+		acc.add(idx)
+
+	assert len(acc) == len(expected)
+	assert np.array_equal(sorted(acc), expected)
+	sig = acc.signature()
+	assert sig.dtype == KmerSpec(k, 'A').index_dtype
+	assert np.array_equal(sig, expected)
+	assert all(idx in acc for idx in expected)
+	assert not any(idx in acc for idx in np.setdiff1d(np.arange(nk), expected))
+
+	acc.discard(expected[0])
+	assert expected[0] not in acc
+	assert len(acc) == len(expected) - 1
+
+	acc.clear()
+	assert len(acc) == 0
+	assert len(acc.signature()) == 0
+
+	acc.add_indices(indices)
+	assert np.array_equal(acc.pop_signature(), expected)
+	assert len(acc) == 0
+	assert len(acc.signature()) == 0
+
+	# With calc_signature()
+	kspec = KmerSpec(k, 'ATG')
+	seq, expected = make_kmer_seq(kspec, 10000, 20, 10)
+	assert np.array_equal(calc_signature(kspec, seq, accumulator=cls(k)), expected)
+
+	# Merging
+	acc1 = cls(k)
+	acc1.add_indices(indices[:50])
+	acc2 = cls(k)
+	acc2.add_indices(indices[50:])
+	acc1.merge(acc2)
+	assert np.array_equal(acc1.signature(), np.unique(indices))
+
+
+@pytest.mark.parametrize('cls', [CountArrayAccumulator, CountTableAccumulator])
+@pytest.mark.parametrize('k', [2, 7])
+def test_counting_accumulator(cls, k):
+	"""Test CountingAccumulator implementations."""
+	nk = 4 ** k
+
+	np.random.seed(0)
+	indices = np.random.choice(nk, nk)
+	unique, counts = np.unique(indices, return_counts=True)
+	expected = unique[counts >= 2]
+
+	acc = cls(k, min_count=2)
+	acc.add_indices(indices[:10])
+	for idx in indices[10:]:
+		acc.add(idx)
+
+	assert len(acc) == len(expected)
+	assert np.array_equal(acc.signature(), expected)
+	assert acc.signature().dtype == KmerSpec(k, 'A').index_dtype
+	assert all(idx in acc for idx in expected)
+	assert all(acc.count(idx) == c for idx, c in zip(unique, counts))
+
+	found, found_counts = acc.counts()
+	assert np.array_equal(found, unique)
+	assert np.array_equal(found_counts, counts)
+
+	acc.discard(expected[0])
+	assert acc.count(expected[0]) == 0
+	assert len(acc) == len(expected) - 1
+
+	# Saturation
+	acc.add_indices(np.full(300, expected[1], dtype=np.uint64))
+	assert acc.count(expected[1]) == 255
+
+	with pytest.raises(IndexError):
+		acc.add(nk)
+
+	acc.clear()
+	assert len(acc) == 0
+	assert len(acc.counts()[0]) == 0
+
+	# Merging
+	acc1 = cls(k, min_count=2)
+	acc1.add_indices(indices[:nk // 2])
+	acc2 = cls(k, min_count=2)
+	acc2.add_indices(indices[nk // 2:])
+	acc1.merge(acc2)
+	assert np.array_equal(acc1.signature(), expected)
+	other = CountTableAccumulator(k) if cls is CountArrayAccumulator else CountArrayAccumulator(k)
+	other.add_indices(indices)
+	acc1.merge(other)
+	assert np.array_equal(acc1.signature(), unique)
+
+
+def test_scratch_accumulators():
+	"""Test default accumulators are reused between calls in the same thread."""
+	from gambit.sigs.calc import _scratch_accumulators
+
+	with _scratch_accumulators([KSPEC.k]) as (acc1,):
+		pass
+	with _scratch_accumulators([KSPEC.k, KSPEC.k]) as (acc2, acc3):
+		assert acc2 is acc1
+		assert acc3 is not acc1
+
+	np.random.seed(0)
+	for i in range(3):
+		seq, expected = make_kmer_seq(KSPEC, 10000, 20, 10)
+		assert np.array_equal(calc_signature(KSPEC, seq), expected)
+		assert len(acc1) == 0
+
+	# Cleared after error
+	with pytest.raises(RuntimeError):
+		with _scratch_accumulators([KSPEC.k]) as (acc,):
+			acc.add(1)
+			raise RuntimeError()
+	with _scratch_accumulators([KSPEC.k]) as (acc4,):
+		assert acc4 is acc
+		assert len(acc4) == 0
+
+
+@pytest.mark.parametrize('k', [7, 11, 16])
+def test_scratch_index_buffer(k):
+	"""Test index buffers are reused per value of k and sort indices of that length."""
+	from gambit.sigs.calc import _scratch_index_buffer
+
+	buf = _scratch_index_buffer(k)
+	assert _scratch_index_buffer(k) is buf
+	assert _scratch_index_buffer(k + 1) is not buf
+
+	np.random.seed(0)
+	indices = np.random.randint(0, 4 ** k, size=1000, dtype='u8')
+	buf.extend(indices)
+	buf.sort_unique()
+	assert np.array_equal(buf.indices(), np.unique(indices))
+	assert len(_scratch_index_buffer(k)) == 0
+
+
 class TestCalcSignature:
 	"""Test the calc_signature() function."""
 
@@ -110,6 +276,136 @@ class TestCalcSignature:
 			assert all(kmer in expected for kmer in found)
 
 
+def test_calc_signature_multi():
+	"""Test calculating signatures for several KmerSpecs in a single pass."""
+	kspecs = [
+		KSPEC,
+		KmerSpec(13, KSPEC.prefix + b'GT'),  # Shares prefix stem
+		KmerSpec(8, KSPEC.prefix),
+		KmerSpec(14, 'CCG'),
+		KmerSpec(30, 'AAAAA'),  # Too long for encoded scanner
+	]
+
+	np.random.seed(0)
+	seqs = [random_seq(10000, 'ACGTNacgt') for _ in range(5)]
+
+	sigs = calc_signature_multi(kspecs, seqs)
+	assert len(sigs) == len(kspecs)
+
+	for kspec, sig in zip(kspecs, sigs):
+		assert np.array_equal(sig, calc_signature(kspec, seqs))
+
+	with pytest.raises(ValueError):
+		calc_signature_multi(kspecs, seqs, accumulators=[])
+
+
+@pytest.mark.parametrize('kspec', [KSPEC, KmerSpec(16, 'ATG'), KmerSpec(30, 'AAAAA')])
+@pytest.mark.parametrize('nthreads', [1, 4])
+def test_calc_signature_parallel(kspec, nthreads):
+	"""Test calculating the signature of a single genome with multiple threads."""
+	np.random.seed(0)
+	seqs = [random_seq(n, 'ACGTNacgt') for n in [100000, 5000, 3, 0, 20000]]
+	expected = calc_signature(kspec, seqs)
+
+	for chunk_size in [100, 2 ** 20]:
+		sig = calc_signature_parallel(kspec, seqs, nthreads=nthreads, chunk_size=chunk_size)
+		assert np.array_equal(sig, expected)
+
+	with pytest.raises(TypeError):
+		calc_signature_parallel(kspec, seqs, accumulator_factory=SetAccumulator)
+
+
+@pytest.mark.parametrize('kspec', [KSPEC, KmerSpec(16, 'ATG'), KmerSpec(30, 'AAAAA')])
+@pytest.mark.parametrize('nthreads', [1, 4])
+def test_calc_signatures_batch(kspec, nthreads):
+	"""Test calculating signatures of in-memory sequences in a batch."""
+	np.random.seed(0)
+	seqs = [random_seq(n, 'ACGTNacgt') for n in [100000, 5000, 3, 0, 20000]]
+	expected = [calc_signature(kspec, seq) for seq in seqs]
+
+	# Different buffer types
+	seqs[1] = bytearray(seqs[1])
+	seqs[2] = memoryview(seqs[2])
+	seqs[4] = np.frombuffer(seqs[4], dtype=np.uint8)
+	seqs.append(Seq(seqs[0].decode()))
+	expected.append(expected[0])
+
+	sigs = calc_signatures_batch(kspec, seqs, nthreads=nthreads)
+	assert isinstance(sigs, SignatureArray)
+	assert sigs.kmerspec == kspec
+	assert sigs.values.dtype == kspec.index_dtype
+	assert sigarray_eq(sigs, expected)
+
+	assert len(calc_signatures_batch(kspec, [])) == 0
+
+	with pytest.raises(ValueError):
+		calc_signatures_batch(kspec, [np.zeros((10, 10), dtype=np.uint8)[:, 0]])
+
+
+def test_make_batches(tmp_path):
+	"""Test grouping of files into batches for concurrent processing."""
+	from gambit.sigs.calc import _make_batches
+
+	sizes = [10, 5000, 20, 0, 3000, 10, 8000, 1]
+	files = []
+	for i, size in enumerate(sizes):
+		path = tmp_path / f'{i}.fasta'
+		path.write_bytes(b'A' * size)
+		files.append(SequenceFile(path, 'fasta'))
+	files.append(SequenceFile(tmp_path / 'missing.fasta', 'fasta'))
+
+	batches = _make_batches(files, 1)
+	assert sorted(i for batch in batches for i in batch) == list(range(len(files)))
+	# Largest files first, in their own batches
+	assert batches[:2] == [[6], [1]]
+	# Remaining smaller files packed together
+	assert len(batches) == 3
+	assert batches[2][0] == 4
+
+	# Smaller batches with more workers
+	assert _make_batches(files, 4)[:3] == [[6], [1], [4]]
+
+
+@pytest.mark.parametrize('batch_size', [1, 1000, 2 ** 20])
+def test_calc_reads_signature(tmp_path, batch_size):
+	"""Test calculating signatures from paired FASTQ files."""
+	from gambit.sigs.calc import accumulate_kmers
+
+	np.random.seed(0)
+	genome, genome_sig = make_kmer_seq(KSPEC, 5000, 20, 10)
+
+	# Overlapping reads from both strands, plus a few random reads which should contribute
+	# only singleton k-mers.
+	reads = [genome[i:i + 150] for i in range(0, len(genome), 30)]
+	reads = [read if i % 2 else revcomp(read) for i, read in enumerate(reads)]
+	reads.extend(random_seq(150) for _ in range(5))
+
+	acc = CountTableAccumulator(KSPEC.k, min_count=2)
+	for read in reads:
+		accumulate_kmers(acc, KSPEC, read)
+	expected = acc.signature()
+	assert np.all(np.isin(expected, genome_sig))
+
+	files = []
+	for i, compression in enumerate(['gzip', None]):
+		file = SequenceFile(tmp_path / f'reads_{i}.fastq', 'fastq', compression)
+		with file.open('wb') as f:
+			for j, read in enumerate(reads[i::2]):
+				f.write(b'@read%d/%d\n%s\n+\n%s\n' % (j, i + 1, read, b'I' * len(read)))
+		files.append(file)
+
+	sig = calc_reads_signature(KSPEC, files, min_count=2, batch_size=batch_size)
+	assert np.array_equal(sig, expected)
+	assert sig.dtype == KSPEC.index_dtype
+
+	# min_count=1 includes every k-mer found
+	sig1 = calc_reads_signature(KSPEC, files, min_count=1, batch_size=batch_size)
+	assert np.array_equal(sig1, calc_signature(KSPEC, reads))
+
+	with pytest.raises(ValueError):
+		calc_reads_signature(KSPEC, SequenceFile(tmp_path / 'genome.fasta', 'fasta'))
+
+
 class TestCalcFileSignatures:
 
 	@pytest.fixture(scope='class')
@@ -136,7 +432,7 @@ class TestCalcFileSignatures:
 	def format(self, request):
 		return request.param
 
-	@pytest.fixture(scope='class', params=[None, 'gzip'])
+	@pytest.fixture(scope='class', params=[None, 'gzip', 'bgzf'])
 	def compression(self, request):
 		return request.param
 
@@ -155,6 +451,33 @@ class TestCalcFileSignatures:
 
 		return files
 
+	@pytest.fixture(scope='class')
+	def unique_record_sets(self, record_sets):
+		"""Same as record_sets but each record has a unique ID."""
+		items = []
+
+		for records, sig in record_sets:
+			renamed = [
+				SeqIO.SeqRecord(seq=record.seq, id=f'{record.id}_{j + 1}', description=record.description)
+				for j, record in enumerate(records)
+			]
+			items.append((renamed, sig))
+
+		return items
+
+	@pytest.fixture()
+	def unique_files(self, unique_record_sets, tmp_path, format, compression):
+		"""Files written from unique_record_sets."""
+		files = []
+
+		for i, (records, sig) in enumerate(unique_record_sets):
+			file = SequenceFile(tmp_path / f'unique{i + 1}.fasta', format, compression)
+			with file.open('wt') as f:
+				SeqIO.write(records, f, format)
+			files.append(file)
+
+		return files
+
 	def test_calc_file_signature(self, record_sets, files):
 		"""Test the calc_file_signature function."""
 
@@ -162,7 +485,276 @@ class TestCalcFileSignatures:
 			result = calc_file_signature(KSPEC, file)
 			assert np.array_equal(result, sig)
 
+	@pytest.mark.parametrize('block_size', [7, 100, 2 ** 20])
+	def test_block_size(self, record_sets, files, block_size):
+		"""Test streaming files in blocks gives the same result."""
+		for file, (records, sig) in zip(files, record_sets):
+			result = calc_file_signature(KSPEC, file, block_size=block_size)
+			assert np.array_equal(result, sig)
+
+		sigs = calc_file_signatures(KSPEC, files, concurrency=None, block_size=block_size)
+		assert sigarray_eq([sig for records, sig in record_sets], sigs)
+
+	def test_memory_map(self, record_sets, files):
+		"""Test memory-mapping uncompressed files gives the same results as parsing them."""
+		for file, (records, sig) in zip(files, record_sets):
+			assert np.array_equal(calc_file_signature(KSPEC, file, memory_map=True), sig)
+
+			sig1, stats1 = calc_file_signature(KSPEC, file, stats=True, memory_map=True)
+			sig2, stats2 = calc_file_signature(KSPEC, file, stats=True, memory_map=False)
+			assert np.array_equal(sig1, sig)
+			assert stats1 == stats2
+
+			sig1, records1, stats1 = calc_file_signature(KSPEC, file, records=True, stats=True, memory_map=True)
+			sig2, records2, stats2 = calc_file_signature(KSPEC, file, records=True, stats=True, memory_map=False)
+			assert np.array_equal(sig1, sig)
+			assert list(records1.ids) == list(records2.ids)
+			assert sigarray_eq(records1, records2)
+			assert stats1 == stats2
+
+	@pytest.mark.parametrize('archive_type', ['zip', 'tar.gz'])
+	@pytest.mark.parametrize('concurrency', [None, 'threads', 'processes'])
+	def test_archive(self, record_sets, files, tmp_path, archive_type, concurrency):
+		"""Test calculating signatures of files stored in an archive."""
+		sigs = [sig for records, sig in record_sets]
+
+		archive_path = tmp_path / ('genomes.' + archive_type)
+		if archive_type == 'zip':
+			with zipfile.ZipFile(archive_path, 'w') as zf:
+				for file in files:
+					zf.write(file.path, file.path.name)
+		else:
+			with tarfile.open(archive_path, 'w:gz') as tar:
+				for file in files:
+					tar.add(file.path, file.path.name)
+
+		members = SequenceFile.from_archive(archive_path, 'fasta', 'auto')
+		assert len(members) == len(files)
+
+		with check_progress(total=len(files)) as pconf:
+			result = calc_file_signatures(KSPEC, members, progress=pconf, concurrency=concurrency)
+		assert sigarray_eq(result, sigs)
+
+		sigs2, stats = calc_file_signatures(KSPEC, members, concurrency=concurrency, stats=True)
+		assert sigarray_eq(sigs2, sigs)
+		assert stats == calc_file_signatures(KSPEC, files, concurrency=None, stats=True)[1]
+
+		results = iter_file_signatures(KSPEC, members, ordered=True, concurrency=concurrency, max_pending=2)
+		for i, sig in results:
+			assert np.array_equal(sig, sigs[i])
+
+		# Mixed with other files, out of order
+		mixed = [files[0], *members[3:], members[1], files[2]]
+		result = calc_file_signatures(KSPEC, mixed, concurrency=concurrency)
+		assert sigarray_eq(result, [sigs[0], *sigs[3:], sigs[1], sigs[2]])
+
+		# Single member
+		for member, sig in zip(members, sigs):
+			assert np.array_equal(calc_file_signature(KSPEC, member), sig)
+			assert np.array_equal(calc_file_signature(KSPEC, member, memory_map=False), sig)
+			assert np.array_equal(calc_file_signature(KSPEC, member, nthreads=2), sig)
+
+	def test_leading_data(self, record_sets, files, tmp_path):
+		"""Test data before the first FASTA header is ignored by all methods of reading files."""
+		records, sig = record_sets[0]
+		file = SequenceFile(tmp_path / 'leading.fasta', files[0].format, files[0].compression)
+		junk = KSPEC.prefix + random_seq(1000)
+
+		with file.open('wt') as f:
+			f.write(junk.decode() + '\n\n')
+			SeqIO.write(records, f, file.format)
+
+		results = [
+			calc_file_signature(KSPEC, file),
+			calc_file_signature(KSPEC, file, memory_map=False),
+			calc_file_signature(KSPEC, file, nthreads=2),
+			calc_file_signature(KSPEC, file, records=True)[0],
+			calc_file_signature(KSPEC, file, stats=True)[0],
+		]
+		results += [calc_file_signature(KSPEC, file, block_size=bs, memory_map=False) for bs in [7, 100, 2 ** 20]]
+
+		for result in results:
+			assert np.array_equal(result, sig)
+
+	def test_stats(self, record_sets, files, tmp_path):
+		"""Test calculating assembly statistics in the same pass as the signature."""
+		expected = []
+		for records, sig in record_sets:
+			acc = AssemblyStatsAccumulator()
+			for record in records:
+				acc.add(bytes(record.seq))
+			expected.append(acc.stats())
+
+		for file, (records, sig), file_stats in zip(files, record_sets, expected):
+			assert file_stats.ncontigs == len(records)
+
+			for kw in [dict(), dict(block_size=100), dict(nthreads=2)]:
+				result, result_stats = calc_file_signature(KSPEC, file, stats=True, **kw)
+				assert np.array_equal(result, sig)
+				assert result_stats == file_stats
+
+			result, record_sigs, result_stats = calc_file_signature(KSPEC, file, records=True, stats=True)
+			assert np.array_equal(result, sig)
+			assert len(record_sigs) == len(records)
+			assert result_stats == file_stats
+
+		sigs, stats = calc_file_signatures(KSPEC, files, concurrency='threads', stats=True)
+		assert sigarray_eq(sigs, [sig for records, sig in record_sets])
+		assert stats == expected
+
+		with pytest.raises(ValueError):
+			calc_file_signatures(KSPEC, files, stats=True, cache=SignatureCache(tmp_path / 'cache.db'))
+
+	def test_records(self, unique_record_sets, unique_files, tmp_path):
+		"""Test calculating signatures of each record along with the whole file."""
+		record_sets = unique_record_sets
+		files = unique_files
+
+		for file, (records, sig) in zip(files, record_sets):
+			file_sig, record_sigs = calc_file_signature(KSPEC, file, records=True)
+			assert np.array_equal(file_sig, sig)
+			assert isinstance(record_sigs, AnnotatedSignatures)
+			assert record_sigs.kmerspec == KSPEC
+			assert list(record_sigs.ids) == [record.id for record in records]
+			assert sigarray_eq(record_sigs, [calc_signature(KSPEC, record.seq) for record in records])
+
+			# Group all but the first record together
+			group_by = lambda id: 'first' if id == records[0].id else 'rest'
+			file_sig2, groups = calc_file_signature(KSPEC, file, group_by=group_by)
+			assert np.array_equal(file_sig2, sig)
+			assert list(groups.ids) == ['first', 'rest'][:len(records)]
+			expected = [calc_signature(KSPEC, records[0].seq), calc_signature(KSPEC, [r.seq for r in records[1:]])]
+			assert sigarray_eq(groups, expected[:len(records)])
+
+		# Records with the same ID are only combined when grouping
+		records = record_sets[0][0]
+		dup = SequenceFile(tmp_path / 'dup.fasta', 'fasta')
+		with dup.open('wt') as f:
+			SeqIO.write([records[0], records[1], records[0]], f, 'fasta')
+		file_sig, record_sigs = calc_file_signature(KSPEC, dup, records=True)
+		assert list(record_sigs.ids) == [records[0].id, records[1].id, records[0].id]
+		file_sig, groups = calc_file_signature(KSPEC, dup, group_by=lambda id: id)
+		assert list(groups.ids) == [records[0].id, records[1].id]
+
+		with pytest.raises(ValueError):
+			calc_file_signature(KSPEC, files[0], records=True, block_size=100)
+
+		file_sigs, file_records = calc_file_signatures_with_records(KSPEC, files, concurrency='threads')
+		assert sigarray_eq(file_sigs, [sig for records, sig in record_sets])
+		for recs, (records, sig) in zip_strict(file_records, record_sets):
+			assert len(recs) == len(records)
+
+	@pytest.mark.parametrize('concurrency', [None, 'processes', 'pool'])
+	def test_shared_memory(self, record_sets, files, concurrency):
+		"""Test returning a SignatureArray transferred through shared memory."""
+		sigs = [sig for records, sig in record_sets]
+		shm_dir = Path('/dev/shm')
+		# Ignore semaphores, the persistent worker pool keeps its own open
+		list_segments = lambda: {p for p in shm_dir.iterdir() if not p.name.startswith('sem.')}
+		before = list_segments() if shm_dir.is_dir() else None
+
+		sigs2 = calc_file_signatures(KSPEC, files, concurrency=concurrency, shared_memory=True)
+		assert isinstance(sigs2, SignatureArray)
+		assert sigs2.kmerspec == KSPEC
+		assert sigs2.dtype == KSPEC.index_dtype
+		assert sigarray_eq(sigs, sigs2)
+
+		# Check shared memory segments were cleaned up
+		if before is not None:
+			assert list_segments() <= before
+
+		# Segments created for other files are cleaned up when one fails
+		missing = SequenceFile(files[0].path.parent / 'missing.fasta', 'fasta')
+		archive = files[0].path.parent / 'genomes.zip'
+		make_archive(archive, [file.path for file in files])
+		members = SequenceFile.from_archive(archive, 'fasta', 'auto')
+		for bad_files in [[*files, missing], [missing, *files], [*files[:2], missing, *files[2:]], [*members, missing]]:
+			with pytest.raises(FileNotFoundError):
+				calc_file_signatures(KSPEC, bad_files, concurrency=concurrency, shared_memory=True)
+			if before is not None:
+				assert list_segments() <= before
+
+	def test_shared_memory_batch(self, record_sets, files):
+		"""Test each batch of signatures is written to a single shared memory segment."""
+		from gambit.sigs.calc import _calc_batch_to_shared, _collect_shared
+
+		sigs = [sig for records, sig in record_sets]
+		func = partial(calc_file_signature, KSPEC)
+		results = _calc_batch_to_shared(func, files[:3]) + _calc_batch_to_shared(func, files[3:])
+		assert len({name for name, offset, length in results}) == 2
+		assert [length for name, offset, length in results] == list(map(len, sigs))
+
+		sigs2 = _collect_shared(results, KSPEC)
+		assert sigarray_eq(sigs2, sigs)
+
+		# Batch of only empty signatures has no segment
+		empty = lambda file: np.zeros(0, dtype=KSPEC.index_dtype)
+		assert _calc_batch_to_shared(empty, files) == [(None, 0, 0)] * len(files)
+
 	@pytest.mark.parametrize('concurrency', [None, 'threads', 'processes'])
+	@pytest.mark.parametrize('ordered', [False, True])
+	def test_iter_file_signatures(self, record_sets, files, concurrency, ordered):
+		"""Test the iter_file_signatures function."""
+		sigs = [sig for records, sig in record_sets]
+
+		with check_progress(total=len(files)) as pconf:
+			itr = iter_file_signatures(KSPEC, files, ordered=ordered, progress=pconf, concurrency=concurrency,
+			                           max_pending=2, reorder_buffer=1)
+			results = list(itr)
+
+		indices = [i for i, sig in results]
+		if ordered:
+			assert indices == list(range(len(files)))
+		else:
+			assert sorted(indices) == list(range(len(files)))
+
+		for i, sig in results:
+			assert np.array_equal(sig, sigs[i])
+
+		# Lazy consumption of input, stopping early
+		itr = iter_file_signatures(KSPEC, iter(files), ordered=ordered, concurrency=concurrency, max_pending=1)
+		i, sig = next(itr)
+		assert np.array_equal(sig, sigs[i])
+		itr.close()
+
+	def test_iter_file_signatures_args(self, files):
+		"""Test invalid arguments to iter_file_signatures are reported before iterating."""
+		for kw in [dict(max_pending=0), dict(reorder_buffer=-1), dict(concurrency='foo')]:
+			with pytest.raises(ValueError):
+				iter_file_signatures(KSPEC, files, ordered=True, **kw)
+
+	def test_nthreads(self, record_sets, files):
+		"""Test calculating signatures of single files with multiple threads."""
+		for file, (records, sig) in zip(files, record_sets):
+			assert np.array_equal(calc_file_signature(KSPEC, file, nthreads=3), sig)
+			assert sigarray_eq(calc_file_signatures(KSPEC, [file], max_workers=3, parallel_single=True), [sig])
+
+		# Explicit concurrency is respected by default
+		class CountingExecutor(ThreadPoolExecutor):
+			nsubmitted = 0
+
+			def submit(self, *args, **kwargs):
+				self.nsubmitted += 1
+				return super().submit(*args, **kwargs)
+
+		with CountingExecutor(max_workers=2) as executor:
+			assert sigarray_eq(calc_file_signatures(KSPEC, files[:1], executor=executor), [record_sets[0][1]])
+			assert executor.nsubmitted == 1
+
+		with mock.patch('gambit.sigs.calc.calc_signature_parallel') as parallel:
+			calc_file_signatures(KSPEC, files[:1], concurrency='threads', max_workers=3)
+			assert not parallel.called
+			calc_file_signatures(KSPEC, files[:1], concurrency='threads', max_workers=3, parallel_single=True)
+			assert parallel.call_count == 1
+			assert parallel.call_args.kwargs['nthreads'] == 3
+
+		# Only decompressed in the background if actually compressed
+		auto = SequenceFile(files[0].path, files[0].format, 'auto')
+		with mock.patch('gambit.sigs.calc.calc_file_signature', wraps=calc_file_signature) as calc:
+			assert sigarray_eq(calc_file_signatures(KSPEC, [auto], parallel_single=True), [record_sets[0][1]])
+			assert calc.call_args.kwargs['background'] == (files[0].compression is not None)
+
+	@pytest.mark.parametrize('concurrency', [None, 'threads', 'processes', 'pool'])
 	def test_calc_file_signatures(self, record_sets, files, concurrency):
 		"""Test the calc_file_signatures function."""
 		sigs = [sig for records, sig in record_sets]
@@ -171,3 +763,22 @@ class TestCalcFileSignatures:
 			sigs2 = calc_file_signatures(KSPEC, files, progress=pconf, concurrency=concurrency)
 
 		assert sigarray_eq(sigs, sigs2)
+
+	def test_calc_file_signatures_multi(self, record_sets, files):
+		"""Test the calc_file_signatures_multi function."""
+		kspecs = [KSPEC, KmerSpec(8, KSPEC.prefix + b'G')]
+		sigs = [sig for records, sig in record_sets]
+
+		result = calc_file_signatures_multi(kspecs, files, concurrency=None)
+		assert len(result) == 2
+		assert result[0].kmerspec == KSPEC
+		assert sigarray_eq(result[0], sigs)
+		assert result[1].kmerspec == kspecs[1]
+		assert sigarray_eq(result[1], calc_file_signatures(kspecs[1], files, concurrency=None))
+
+		# Streaming version
+		itr = iter_file_signatures_multi(kspecs, files, ordered=True, concurrency='threads')
+		for i, file_sigs in itr:
+			assert len(file_sigs) == 2
+			assert np.array_equal(file_sigs[0], result[0][i])
+			assert np.array_equal(file_sigs[1], result[1][i])
@@ -4,7 +4,8 @@ import pytest
 import h5py as h5
 import numpy as np
 
-from gambit.sigs.hdf5 import read_metadata, write_metadata, load_signatures_hdf5, dump_signatures_hdf5
+from gambit.sigs.hdf5 import read_metadata, write_metadata, load_signatures_hdf5, dump_signatures_hdf5, \
+	HDF5SignaturesWriter
 from gambit.sigs import SignaturesMeta, SignatureList, AnnotatedSignatures
 from gambit.sigs.test import AbstractSignatureArrayTests
 from gambit.kmers import KmerSpec
@@ -141,6 +142,76 @@ class TestHDF5Signatures:
 		with dump_load(create_from, tmp_path) as h5sigs:
 			assert h5sigs == sigs
 
+	@pytest.mark.parametrize('with_meta', [False, True])
+	def test_writer(self, sigs, with_meta, tmp_path):
+		"""Test writing signatures incrementally."""
+		fname = tmp_path / 'test.gs'
+		ids = [f'test-{i+1}' for i in range(len(sigs))] if with_meta else None
+		meta = SignaturesMeta(id='test', extra=EXTRA) if with_meta else None
+
+		with h5.File(fname, 'w') as f:
+			writer = HDF5SignaturesWriter(f, sigs.kmerspec, dtype=sigs.dtype)
+			writer.extend(sigs[:10])
+			for sig in sigs[10:]:
+				writer.append(sig)
+			assert len(writer) == len(sigs)
+
+			with pytest.raises(ValueError):
+				writer.finish(ids=['a'])
+
+			writer.finish(ids, meta)
+
+		with load_signatures_hdf5(fname) as h5sigs:
+			assert h5sigs == sigs
+			assert h5sigs.kmerspec == sigs.kmerspec
+			assert h5sigs.dtype == sigs.dtype
+			assert np.array_equal(h5sigs.ids, np.arange(len(sigs)) if ids is None else ids)
+			assert h5sigs.meta == (SignaturesMeta() if meta is None else meta)
+
+	@pytest.mark.parametrize('resizable', [True, False])
+	def test_append(self, sigs, resizable, tmp_path):
+		"""Test appending signatures to existing file."""
+		fname = tmp_path / 'test.gs'
+		ids = [f'test-{i}' for i in range(len(sigs))]
+		n = len(sigs) // 2
+
+		dump_signatures_hdf5(fname, AnnotatedSignatures(sigs[:n], ids[:n]), resizable=resizable)
+
+		with load_signatures_hdf5(fname, mode='r+') as h5sigs:
+			for name in ['ids', 'values', 'bounds']:
+				assert (h5sigs.group[name].maxshape == (None,)) == resizable
+
+			# Duplicate IDs
+			with pytest.raises(ValueError):
+				h5sigs.append(sigs[n:], ['x'] * (len(sigs) - n))
+			if n > 0:
+				with pytest.raises(ValueError):
+					h5sigs.append(sigs[n:n + 1], ids[:1])
+			# Wrong kmerspec
+			other = SignatureList(sigs[n:], KmerSpec(9, 'ATG'))
+			with pytest.raises(ValueError):
+				h5sigs.append(other, ids[n:])
+			with pytest.raises(ValueError):
+				h5sigs.append(iter(other), ids[n:], kmerspec=other.kmerspec)
+			with pytest.raises(ValueError):
+				h5sigs.append(sigs[n:], ids[n:], kmerspec=other.kmerspec)
+			# K-mer spec required for plain iterables
+			with pytest.raises(ValueError):
+				h5sigs.append(iter(sigs[n:]), ids[n:])
+			# Wrong number of IDs, data should be rolled back
+			if len(sigs) - n > 1:
+				with pytest.raises(ValueError):
+					h5sigs.append(sigs[n:], ids[n + 1:])
+			assert len(h5sigs) == n
+
+			h5sigs.append(iter(sigs[n:]), ids[n:], kmerspec=sigs.kmerspec)
+			assert h5sigs == sigs
+			assert list(h5sigs.ids) == ids
+
+		with load_signatures_hdf5(fname) as h5sigs:
+			assert h5sigs == sigs
+			assert list(h5sigs.ids) == ids
+
 	class TestAbstractSignatureArrayImplementation(AbstractSignatureArrayTests):
 		"""Test implementation of AbstractSignatureArray."""
 
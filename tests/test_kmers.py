@@ -7,7 +7,7 @@ from gambit.seq import SEQ_TYPES, NUCLEOTIDES, revcomp
 from gambit import kmers
 from gambit.kmers import KmerSpec
 import gambit.util.json as gjson
-from gambit.test import convert_seq, make_kmer_seq
+from gambit.test import convert_seq, make_kmer_seq, random_seq
 
 
 class TestIndices:
@@ -173,3 +173,160 @@ def test_find_kmers(seq_type, lower):
 		found.append(index)
 
 	assert np.array_equal(sorted(found), sig)
+
+
+@pytest.mark.parametrize('lower', [False, True])
+@pytest.mark.parametrize('seq_type', SEQ_TYPES)
+def test_find_kmer_indices(seq_type, lower):
+	"""Test the find_kmer_indices() function against find_kmers()."""
+
+	kspec = KmerSpec(11, 'ATGAC')
+
+	np.random.seed(0)
+	seq, sig = make_kmer_seq(kspec, 100000, kmer_interval=50, n_interval=10)
+
+	seq = convert_seq(seq, seq_type)
+	if lower:
+		seq = seq.lower()
+
+	expected = set()
+	for match in kmers.find_kmers(kspec, seq):
+		try:
+			expected.add((match.kmer_index(), match.pos, match.reverse))
+		except ValueError:
+			continue
+
+	indices = kmers.find_kmer_indices(kspec, seq)
+	assert indices.dtype == kspec.index_dtype
+	assert np.array_equal(np.unique(indices), sig)
+
+	indices2, pos, reverse = kmers.find_kmer_indices(kspec, seq, positions=True)
+	assert np.array_equal(indices, indices2)
+	assert len(indices2) == len(expected)
+	assert set(zip(indices2.tolist(), pos.tolist(), reverse.tolist())) == expected
+
+	# Sequence shorter than k-mer
+	assert len(kmers.find_kmer_indices(kspec, seq[:kspec.total_len - 1])) == 0
+
+
+@pytest.mark.parametrize('k,prefix', [
+	(11, 'ATGAC'),
+	(1, 'A'),
+	(5, 'AC'),
+	(20, 'ACG'),
+	(31, 'A'),
+	(32, 'ATG'),  # Total length > 32, falls back to byte scanner
+])
+def test_scan_encoded(k, prefix):
+	"""Check scanner using 2-bit codes gives identical results to byte comparison."""
+	from gambit._cython.kmers import scan_kmers, IndexBuffer
+
+	np.random.seed(0)
+	seq = random_seq(100000, 'ACGTNacgt')
+	results = []
+
+	for encoded in [True, False]:
+		buf = IndexBuffer(positions=True)
+		scan_kmers(seq, prefix.encode(), k, buf, encoded=encoded)
+		results.append(sorted(zip(buf.indices().tolist(), *(a.tolist() for a in buf.positions()))))
+
+	assert len(results[0]) > 0
+	assert results[0] == results[1]
+
+
+@pytest.mark.parametrize('k,prefix', [(11, 'ATGAC'), (32, 'ATG')])
+def test_scan_skip_whitespace(k, prefix):
+	"""Check scanning a sequence with whitespace skipped is the same as removing it first."""
+	from gambit._cython.kmers import scan_kmers, IndexBuffer
+
+	np.random.seed(0)
+	seq = random_seq(20000, 'ACGTNacgt')
+	# Lines of random length with different line endings
+	lines = []
+	pos = 0
+	while pos < len(seq):
+		n = np.random.randint(1, 100)
+		lines.append(seq[pos:pos + n] + [b'\n', b'\r\n', b' \t\n'][np.random.randint(3)])
+		pos += n
+	data = b''.join(lines)
+
+	for encoded in [True, False]:
+		buf = IndexBuffer(positions=True)
+		scan_kmers(seq, prefix.encode(), k, buf, encoded=encoded)
+		buf2 = IndexBuffer(positions=True)
+		scan_kmers(memoryview(data), prefix.encode(), k, buf2, encoded=encoded, skip_whitespace=True)
+
+		assert len(buf.indices()) > 0
+		assert np.array_equal(buf.indices(), buf2.indices())
+		for a1, a2 in zip(buf.positions(), buf2.positions()):
+			assert np.array_equal(a1, a2)
+
+
+@pytest.mark.parametrize('encoded', [True, False])
+def test_scan_kmers_parallel(encoded):
+	"""Test scanning chunks of sequences in multiple threads."""
+	from gambit._cython.kmers import scan_kmers, scan_kmers_parallel, IndexBuffer
+
+	np.random.seed(0)
+	seqs = [random_seq(n, 'ACGTNacgt') for n in [50000, 10, 0, 2000]]
+	kspec = KmerSpec(11, 'ATGAC')
+
+	expected = IndexBuffer()
+	for seq in seqs:
+		scan_kmers(seq, kspec.prefix, kspec.k, expected)
+	expected.sort_unique()
+
+	sinks = [IndexBuffer() for _ in range(4)]
+	scan_kmers_parallel(seqs, kspec.prefix, kspec.k, sinks, chunk_size=37, encoded=encoded)
+	found = np.unique(np.concatenate([sink.indices() for sink in sinks]))
+	assert np.array_equal(found, expected.indices())
+
+	with pytest.raises(ValueError):
+		scan_kmers_parallel(seqs, kspec.prefix, kspec.k, [sinks[0], sinks[0]])
+	with pytest.raises(ValueError):
+		scan_kmers_parallel(seqs, kspec.prefix, kspec.k, [IndexBuffer(positions=True)])
+	with pytest.raises(ValueError):
+		scan_kmers_parallel(seqs, kspec.prefix, kspec.k, [])
+
+
+@pytest.mark.parametrize('encoded', [True, False])
+def test_scan_kmers_batch(encoded):
+	"""Test scanning many sequences separately in multiple threads."""
+	from gambit._cython.kmers import scan_kmers, scan_kmers_batch, IndexBuffer
+
+	np.random.seed(0)
+	seqs = [random_seq(n, 'ACGTNacgt') for n in [50000, 10, 0, 2000]]
+	kspec = KmerSpec(11, 'ATGAC')
+
+	values, bounds = scan_kmers_batch(seqs, kspec.prefix, kspec.k, nthreads=3, encoded=encoded)
+	assert len(bounds) == len(seqs) + 1
+
+	for i, seq in enumerate(seqs):
+		expected = IndexBuffer()
+		scan_kmers(seq, kspec.prefix, kspec.k, expected)
+		expected.sort_unique()
+		assert np.array_equal(values[bounds[i]:bounds[i + 1]], expected.indices())
+
+	with pytest.raises(ValueError):
+		scan_kmers_batch(seqs, kspec.prefix, kspec.k, nthreads=0)
+
+
+def test_nucleotide_counts():
+	"""Test the nucleotide_counts() function."""
+	from gambit._cython.kmers import nucleotide_counts
+
+	counts = np.zeros(5, dtype=np.int64)
+	nucleotide_counts(b'AACGTTTNacgtnX', counts)
+	assert list(counts) == [3, 2, 2, 4, 3]
+	nucleotide_counts(b'', counts)
+	nucleotide_counts(b'GG', counts)
+	assert list(counts) == [3, 2, 4, 4, 3]
+
+	counts = np.zeros(5, dtype=np.int64)
+	assert nucleotide_counts(b'AC\nG T\r\n\tN', counts, skip_whitespace=True) == 5
+	assert list(counts) == [1, 1, 1, 1, 1]
+	assert nucleotide_counts(b'A\n', counts) == 2
+	assert list(counts) == [2, 1, 1, 1, 2]
+
+	with pytest.raises(ValueError):
+		nucleotide_counts(b'ACGT', np.zeros(4, dtype=np.int64))
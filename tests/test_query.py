@@ -2,8 +2,10 @@
 
 import pytest
 
-from gambit.query import QueryInput, query_parse, compare_result_items
+from gambit.query import QueryInput, query, query_parse, compare_result_items
+from gambit.classify import compare_classifier_results
 from gambit.seq import SequenceFile
+from gambit.sigs.calc import calc_signature
 from gambit.util.misc import zip_strict
 from gambit import __version__ as GAMBIT_VERSION
 
@@ -40,3 +42,73 @@ def test_query_python(testdb, strict):
 	for file, item, ref_item in zip_strict(query_files, results.items, ref_results.items):
 		assert item.input.file == file
 		compare_result_items(item, ref_item)
+
+
+def test_query_records(testdb):
+	"""Test classifying records of query files separately."""
+	ref_results = testdb.get_query_results(False)
+	params = ref_results.params
+	query_files = [item['file'] for item in testdb.query_genomes[:5]]
+
+	results = query_parse(testdb.refdb, query_files, params, records=True, parse_kw=dict(concurrency=None))
+
+	for file, item, ref_item in zip_strict(query_files, results.items, ref_results.items[:5]):
+		assert item.input.file == file
+		assert item.report_taxon == ref_item.report_taxon
+
+		with file.parse() as parsed:
+			records = list(parsed)
+
+		assert [r.input.label for r in item.records] == [record.id for record in records]
+		for record_item, record in zip_strict(item.records, records):
+			assert record_item.input.file == file
+			sig = calc_signature(testdb.kmerspec, record.seq)
+			expected = query(testdb.refdb, [sig], params).items[0]
+			assert compare_result_items(record_item, expected)
+
+	# Group all records together, should give same result as whole file
+	results2 = query_parse(testdb.refdb, query_files, params, group_by=lambda id: 'all',
+	                       parse_kw=dict(concurrency=None))
+
+	for item, item2 in zip_strict(results.items, results2.items):
+		assert len(item2.records) == 1
+		assert item2.records[0].input.label == 'all'
+		whole = item2.records.pop()
+		assert compare_result_items(whole, item2)
+
+
+def test_query_record_parents(testdb):
+	"""Test invalid record_parents arguments to query()."""
+	params = testdb.get_query_results(False).params
+	with testdb.query_genomes[0]['file'].parse() as parsed:
+		seqs = [record.seq for record in parsed]
+	queries = [calc_signature(testdb.kmerspec, seqs)] * 2
+	records = [calc_signature(testdb.kmerspec, seq) for seq in seqs[:2]]
+
+	with pytest.raises(ValueError):
+		query(testdb.refdb, queries, params, records=records)
+	with pytest.raises(ValueError):
+		query(testdb.refdb, queries, params, records=records, record_parents=[0])
+	for parents in [[0, 2], [-1, 0]]:
+		with pytest.raises(ValueError, match='out of range'):
+			query(testdb.refdb, queries, params, records=records, record_parents=parents)
+
+
+def test_query_stats(testdb):
+	"""Test calculating assembly statistics of query files."""
+	ref_results = testdb.get_query_results(False)
+	query_files = [item['file'] for item in testdb.query_genomes[:5]]
+
+	results = query_parse(testdb.refdb, query_files, ref_results.params, stats=True, parse_kw=dict(concurrency=None))
+
+	for file, item, ref_item in zip_strict(query_files, results.items, ref_results.items[:5]):
+		# Order of closest genomes with tied distances may differ, just check classification
+		assert item.report_taxon == ref_item.report_taxon
+		assert compare_classifier_results(item.classifier_result, ref_item.classifier_result)
+
+		with file.parse() as parsed:
+			seqs = [bytes(record.seq) for record in parsed]
+
+		stats = item.input.stats
+		assert stats.total_length == sum(map(len, seqs))
+		assert stats.ncontigs == len(seqs)
@@ -4,7 +4,7 @@ from gambit.query import QueryResults, QueryResultItem, QueryInput, QueryParams
 from gambit.classify import ClassifierResult, GenomeMatch
 from gambit.db import ReferenceGenomeSet, Genome
 from gambit.sigs import SignaturesMeta
-from gambit.seq import SequenceFile
+from gambit.seq import SequenceFile, AssemblyStats
 from gambit.results.base import export_to_buffer
 from gambit.results.json import JSONResultsExporter
 from gambit.results.csv import CSVResultsExporter
@@ -17,9 +17,9 @@ def session(testdb):
 	return testdb.Session()
 
 
-@pytest.fixture()
-def results(session):
-	"""Create a fake QueryResults object."""
+@pytest.fixture(params=[False, True])
+def results(request, session):
+	"""Create a fake QueryResults object, optionally with records and assembly stats for some items."""
 
 	gset = session.query(ReferenceGenomeSet).one()
 
@@ -79,6 +79,18 @@ def results(session):
 	# Set one input file to None
 	items[-1].input.file = None
 
+	if request.param:
+		for i, item in enumerate(items[:3]):
+			item.input.stats = AssemblyStats(1000 * (i + 1), i + 1, 1000, .5 - i / 10, i / 100)
+
+			for j, cr in enumerate(classifier_results[i + 1:i + 4]):
+				item.records.append(QueryResultItem(
+					input=QueryInput(f'contig-{j}', item.input.file),
+					classifier_result=cr,
+					report_taxon=cr.predicted_taxon,
+					closest_genomes=[cr.closest_match],
+				))
+
 	return QueryResults(
 		items=items,
 		params=QueryParams(chunksize=1234, classify_strict=True),
@@ -1,14 +1,17 @@
 """Test the gambit.seqs module."""
 
-from io import StringIO
+from io import StringIO, BytesIO
 from pathlib import Path
 import os
+import zipfile
+import tarfile
 
 import pytest
 import numpy as np
 from Bio import Seq, SeqIO
 
-from gambit.seq import SequenceFile, revcomp
+from gambit.seq import SequenceFile, revcomp, iter_fasta_blocks, iter_fasta_records, iter_fasta_regions, \
+	iter_fastq_seqs, AssemblyStats, AssemblyStatsAccumulator, stream_archive_members
 from gambit.kmers import nkmers, index_to_kmer
 from gambit.util.misc import zip_strict
 from gambit.test import random_seq
@@ -88,6 +91,142 @@ def test_validate_dna_seq_bytes():
 	# TODO
 
 
+@pytest.mark.parametrize('block_size', [1, 5, 64, 10000])
+def test_iter_fasta_blocks(block_size):
+	"""Test iter_fasta_blocks() function."""
+	np.random.seed(0)
+	seqs = [random_seq(n) for n in [100, 0, 1, 250]]
+
+	lines = []
+	for i, seq in enumerate(seqs):
+		lines.append(b'>seq%d some > description' % i)
+		lines.extend(seq[j:j + 60] for j in range(0, len(seq), 60))
+	fobj = BytesIO(b'\r\n'.join(lines) + b'\n')
+
+	records = []
+	for record_start, data in iter_fasta_blocks(fobj, block_size):
+		assert data
+		assert len(data) <= block_size
+		if record_start:
+			records.append(data)
+		else:
+			records[-1] += data
+
+	assert records == [seq for seq in seqs if seq]
+
+	# Data before first header is ignored
+	fobj = BytesIO(b'ACGT\nTTTT\n' + b'\r\n'.join(lines) + b'\n')
+	assert b''.join(data for _, data in iter_fasta_blocks(fobj, block_size)) == b''.join(seqs)
+	assert list(iter_fasta_blocks(BytesIO(b'ACGT\nTTTT\n'), block_size)) == []
+
+	with pytest.raises(ValueError):
+		next(iter_fasta_blocks(BytesIO(b''), 0))
+
+
+@pytest.mark.parametrize('block_size', [1, 5, 64, 10000])
+def test_iter_fasta_records(block_size):
+	"""Test iter_fasta_records() function against Biopython."""
+	np.random.seed(0)
+	seqs = [random_seq(n) for n in [100, 0, 1, 250]]
+
+	lines = []
+	for i, seq in enumerate(seqs):
+		lines.append(b'>seq%d some > description' % i)
+		lines.extend(seq[j:j + 60] for j in range(0, len(seq), 60))
+	lines.append(b'>')
+	data = b'\r\n'.join(lines) + b'\n'
+
+	records = list(iter_fasta_records(BytesIO(data), block_size))
+	expected = list(SeqIO.parse(StringIO(data.decode()), 'fasta'))
+	assert [r.id for r in records] == [r.id for r in expected] == ['seq0', 'seq1', 'seq2', 'seq3', '']
+	assert [r.seq for r in records] == [bytes(r.seq) for r in expected]
+	assert all(isinstance(r.seq, bytearray) for r in records)
+
+	# Data before first header is ignored (newer Biopython versions raise an error instead)
+	assert list(iter_fasta_records(BytesIO(b'\n\nfoo\n' + data), block_size)) == records
+
+	# Header without newline at end of file
+	records = list(iter_fasta_records(BytesIO(b'>a\nACGT\n\n>b c'), block_size))
+	assert records == [('a', b'ACGT'), ('b', b'')]
+
+	assert list(iter_fasta_records(BytesIO(b''), block_size)) == []
+
+	with pytest.raises(ValueError):
+		next(iter_fasta_records(BytesIO(b''), 0))
+
+
+def test_iter_fasta_regions():
+	"""Test iter_fasta_regions() gives the same records as iter_fasta_records()."""
+	np.random.seed(0)
+	seqs = [random_seq(n) for n in [100, 0, 1, 250]]
+
+	lines = [b'foo']
+	for i, seq in enumerate(seqs):
+		lines.append(b'>seq%d some > description' % i)
+		lines.extend(seq[j:j + 60] for j in range(0, len(seq), 60))
+	lines.append(b'>')
+	data = b'\r\n'.join(lines) + b'\n'
+
+	regions = list(iter_fasta_regions(data))
+	records = list(iter_fasta_records(BytesIO(data)))
+	assert [r.id for r in regions] == [r.id for r in records]
+	assert all(isinstance(r.seq, memoryview) for r in regions)
+	assert [bytes(r.seq).replace(b'\r\n', b'') for r in regions] == [r.seq for r in records]
+
+	# Header without newline at end of file
+	regions = list(iter_fasta_regions(b'>a\nACGT\n\n>b c'))
+	assert [(r.id, bytes(r.seq)) for r in regions] == [('a', b'ACGT\n\n'), ('b', b'')]
+
+	assert list(iter_fasta_regions(b'')) == []
+
+
+def test_iter_fastq_seqs():
+	"""Test iter_fastq_seqs() function."""
+	np.random.seed(0)
+	seqs = [random_seq(n) for n in [100, 0, 150]]
+
+	data = b''.join(b'@read%d\n%s\n+\n%s\n' % (i, seq, b'I' * len(seq)) for i, seq in enumerate(seqs))
+	assert list(iter_fastq_seqs(BytesIO(data))) == seqs
+	assert list(iter_fastq_seqs(BytesIO(data + b'\n'))) == seqs
+
+	with pytest.raises(ValueError):
+		list(iter_fastq_seqs(BytesIO(b'>seq\nACGT\n')))
+	with pytest.raises(ValueError):
+		list(iter_fastq_seqs(BytesIO(data + b'@read\nACGT\n')))
+
+
+def test_assembly_stats():
+	"""Test AssemblyStatsAccumulator class."""
+	acc = AssemblyStatsAccumulator()
+	assert acc.stats() == AssemblyStats(0, 0, 0, 0., 0.)
+
+	acc.add(b'ACGTNNNNNN')
+	acc.add(b'gg', record_start=False)
+	acc.add(b'')
+	acc.add(b'AAAAA')
+	acc.add(b'aacc')
+	acc.add(b'CC', record_start=False)
+
+	stats = acc.stats()
+	assert stats.total_length == 23
+	assert stats.ncontigs == 3
+	assert stats.n50 == 12
+	assert stats.gc_content == 8 / 17
+	assert stats.ambiguous_fraction == 6 / 23
+
+	acc2 = AssemblyStatsAccumulator()
+	for seq in [b'A' * 5, b'A' * 6, b'A' * 7]:
+		acc2.add(seq)
+	assert acc2.stats().n50 == 6
+
+	# Skip whitespace
+	acc3 = AssemblyStatsAccumulator()
+	for seq, record_start in [(b'ACGTN\nNNNNN\n', True), (b'gg\r\n', False), (b'\n', True), (b'AAA\nAA', True),
+	                          (b'aacc\nC', True), (b'C\n', False)]:
+		acc3.add(seq, record_start, skip_whitespace=True)
+	assert acc3.stats() == stats
+
+
 class TestSequenceFile:
 	"""Test the SequenceFile class."""
 
@@ -96,7 +235,7 @@ class TestSequenceFile:
 		"""SequenceFile.format attribute."""
 		return request.param
 
-	@pytest.fixture(params=[None, 'gzip'], scope='class')
+	@pytest.fixture(params=[None, 'gzip', 'bgzf', 'bz2', 'xz'], scope='class')
 	def compression(self, request):
 		"""SequenceFile.compression attribute."""
 		return request.param
@@ -208,6 +347,93 @@ class TestSequenceFile:
 			# includes the ID
 			assert parsed_req.description == orig_req.id + ' ' + orig_req.description
 
+	def test_parse_fasta(self, seqfile, seqrecords, file_contents):
+		"""Test the parse_fasta() and parse_seqs() methods."""
+		with seqfile.open('wt') as fobj:
+			fobj.write(file_contents)
+
+		for parsed in [list(seqfile.parse_fasta(block_size=100)), list(seqfile.parse_seqs())]:
+			for parsed_req, orig_req in zip_strict(parsed, seqrecords):
+				assert parsed_req.id == orig_req.id
+				assert parsed_req.seq == bytes(orig_req.seq)
+
+		with pytest.raises(ValueError):
+			SequenceFile(seqfile.path, 'genbank').parse_fasta()
+
+	def test_map_fasta(self, seqfile, seqrecords, file_contents):
+		"""Test the map_fasta() and resolve_compression() methods."""
+		with seqfile.open('wt') as fobj:
+			fobj.write(file_contents)
+
+		assert seqfile.resolve_compression() == seqfile.compression
+		auto = SequenceFile(seqfile.path, seqfile.format, 'auto')
+		assert auto.resolve_compression() == seqfile.compression
+
+		if seqfile.compression is not None:
+			with pytest.raises(ValueError):
+				seqfile.map_fasta()
+			return
+
+		with auto.map_fasta() as regions:
+			for region, orig_req in zip_strict(regions, seqrecords):
+				assert region.id == orig_req.id
+				assert bytes(region.seq).replace(b'\n', b'') == bytes(orig_req.seq)
+		assert regions.closed
+
+		with pytest.raises(ValueError):
+			SequenceFile(seqfile.path, 'genbank').map_fasta()
+
+		# Empty file can't actually be mapped
+		seqfile.path.write_bytes(b'')
+		assert list(seqfile.map_fasta()) == []
+
+	@pytest.mark.parametrize('archive_type', ['zip', 'tar.gz'])
+	def test_archive_member(self, tmp_path, seqfile, seqrecords, file_contents, archive_type):
+		"""Test reading files stored in an archive."""
+		with seqfile.open('wt') as fobj:
+			fobj.write(file_contents)
+
+		archive_path = tmp_path / ('test.' + archive_type)
+		if archive_type == 'zip':
+			with zipfile.ZipFile(archive_path, 'w') as zf:
+				zf.write(seqfile.path, 'dir/test.fasta')
+		else:
+			with tarfile.open(archive_path, 'w:gz') as tar:
+				tar.add(seqfile.path, 'dir/test.fasta')
+
+		member, = SequenceFile.from_archive(archive_path, seqfile.format, seqfile.compression)
+		assert member == SequenceFile(archive_path, seqfile.format, seqfile.compression, 'dir/test.fasta')
+		assert str(member) == f'{archive_path}/dir/test.fasta'
+		assert member.read_member() == seqfile.path.read_bytes()
+
+		auto = SequenceFile(archive_path, seqfile.format, 'auto', 'dir/test.fasta')
+		assert auto.resolve_compression() == seqfile.compression
+
+		for f in [member, auto]:
+			with f.open() as fobj:
+				assert fobj.read() == file_contents
+			with f.open('rb') as fobj:
+				assert fobj.read() == file_contents.encode()
+
+			for parsed in [list(f.parse()), list(f.parse_fasta())]:
+				for parsed_req, orig_req in zip_strict(parsed, seqrecords):
+					assert parsed_req.id == orig_req.id
+					assert parsed_req.seq == orig_req.seq
+
+			# Mapping is allowed for compressed members
+			with f.map_fasta() as regions:
+				for region, orig_req in zip_strict(regions, seqrecords):
+					assert region.id == orig_req.id
+					assert bytes(region.seq).replace(b'\n', b'') == bytes(orig_req.seq)
+			assert regions.closed
+
+		with pytest.raises(ValueError):
+			member.open('wt')
+		with pytest.raises(KeyError):
+			SequenceFile(archive_path, 'fasta', member='foo.fasta').open()
+		with pytest.raises(ValueError):
+			seqfile.read_member()
+
 	def test_path_arg(self):
 		"""Test the "path" argument to the constructor."""
 
@@ -232,6 +458,10 @@ class TestSequenceFile:
 		absseqfile2 = absseqfile.absolute()
 		assert absseqfile2 == absseqfile
 
+		member = SequenceFile('foo/bar.zip', 'fasta', member='bar.fasta').absolute()
+		assert member.path.is_absolute()
+		assert member.member == 'bar.fasta'
+
 	def test_from_paths(self, format, compression):
 		"""Test the from_paths() class method."""
 
@@ -247,3 +477,51 @@ class TestSequenceFile:
 			assert str(seqfile.path) == path
 			assert seqfile.format == format
 			assert seqfile.compression == compression
+
+
+@pytest.mark.parametrize('archive_type', ['zip', 'tar', 'tar.gz'])
+def test_stream_archive_members(tmp_path, archive_type):
+	"""Test reading archive members sequentially with stream_archive_members()."""
+	contents = {f'{i}.fasta': f'>seq{i}\nACGT\n'.encode() for i in range(5)}
+
+	archive_path = tmp_path / ('genomes.' + archive_type)
+	if archive_type == 'zip':
+		with zipfile.ZipFile(archive_path, 'w') as zf:
+			for name, data in contents.items():
+				zf.writestr(name, data)
+	else:
+		with tarfile.open(archive_path, 'w:gz' if archive_type == 'tar.gz' else 'w') as tar:
+			for name, data in contents.items():
+				info = tarfile.TarInfo(name)
+				info.size = len(data)
+				tar.addfile(info, BytesIO(data))
+
+	other = SequenceFile(tmp_path / 'other.fasta', 'fasta')
+	members = SequenceFile.from_archive(archive_path, 'fasta')
+	assert [m.member for m in members] == list(contents)
+
+	# Out of order and repeated members, and other files in between
+	files = [other, *members[:2], other, members[3], members[2], members[4], members[4], members[0]]
+	streamed = list(stream_archive_members(files))
+
+	for file, orig in zip_strict(streamed, files):
+		assert (file.path, file.format, file.compression, file.member) == \
+			(orig.path, orig.format, orig.compression, orig.member)
+		if orig.member is not None:
+			assert file.read_member() == contents[orig.member]
+			with file.open('rb') as fobj:
+				assert fobj.read() == contents[orig.member]
+
+	# Lazy
+	itr = stream_archive_members(iter(members))
+	assert next(itr).read_member() == contents['0.fasta']
+	itr.close()
+
+	# Members which were out of order are read again when opened, others already have their contents
+	archive_path.unlink()
+	for i in [1, 2, 4, 6, 8]:
+		assert streamed[i].read_member() == contents[files[i].member]
+	for i in [5, 7]:
+		with pytest.raises(FileNotFoundError):
+			streamed[i].read_member()
+
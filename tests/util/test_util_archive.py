@@ -0,0 +1,76 @@
+"""Test gambit.util.archive."""
+
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from gambit.util.archive import is_archive, list_members, read_member, iter_members
+
+
+# Regular files in order they are stored
+CONTENTS = {
+	'a.fasta': b'>a\nACGT\n',
+	'dir/b.fasta': b'>b\nGGCC\n',
+	'dir/.hidden': b'hidden',
+	'__MACOSX/dir/._b.fasta': b'metadata',
+	'c.fasta': b'',
+}
+
+
+def make_archive(path, kind):
+	"""Write CONTENTS to an archive, along with a directory entry."""
+	if kind == 'zip':
+		with zipfile.ZipFile(path, 'w') as zf:
+			zf.writestr('dir/', b'')
+			for name, data in CONTENTS.items():
+				zf.writestr(name, data)
+
+	else:
+		with tarfile.open(path, 'w' if kind == 'tar' else 'w:' + kind.split('.')[1]) as tar:
+			info = tarfile.TarInfo('dir')
+			info.type = tarfile.DIRTYPE
+			tar.addfile(info)
+			for name, data in CONTENTS.items():
+				info = tarfile.TarInfo(name)
+				info.size = len(data)
+				tar.addfile(info, io.BytesIO(data))
+
+
+@pytest.fixture(params=['zip', 'tar', 'tar.gz', 'tar.xz'])
+def archive(request, tmp_path):
+	path = tmp_path / ('test.' + request.param)
+	make_archive(path, request.param)
+	return path
+
+
+def test_is_archive():
+	for name in ['foo.zip', 'foo.tar', 'foo.tar.gz', 'foo.TGZ', 'dir/foo.tar.bz2', 'foo.txz']:
+		assert is_archive(name)
+	for name in ['foo.fasta', 'foo.fasta.gz', 'foo.gz', 'zip', 'foo.tar/bar.fasta']:
+		assert not is_archive(name)
+
+
+def test_list_members(archive):
+	assert list_members(archive) == ['a.fasta', 'dir/b.fasta', 'c.fasta']
+
+
+def test_read_member(archive):
+	for name, data in CONTENTS.items():
+		assert read_member(archive, name) == data
+
+	with pytest.raises(KeyError):
+		read_member(archive, 'foo')
+	with pytest.raises(KeyError):
+		read_member(archive, 'dir')
+
+
+def test_iter_members(archive):
+	assert [(name, fobj.read()) for name, fobj in iter_members(archive)] == list(CONTENTS.items())
+
+	# Skip contents of some members
+	names = [name for name, fobj in iter_members(archive)]
+	assert names == list(CONTENTS)
+	read = {name: fobj.read() for name, fobj in iter_members(archive) if name.endswith('.fasta')}
+	assert read == {name: data for name, data in CONTENTS.items() if name.endswith('.fasta')}
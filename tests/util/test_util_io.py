@@ -1,6 +1,7 @@
 """Test gambit.util.io."""
 
 from pathlib import Path
+from io import BytesIO, BufferedReader
 
 import pytest
 import numpy as np
@@ -17,7 +18,7 @@ class TestOpenCompressed:
 		random = np.random.RandomState()
 		return random.randint(32, 128, size=1000, dtype='b').tobytes()
 
-	@pytest.fixture(scope='class', params=[None, 'gzip'])
+	@pytest.fixture(scope='class', params=[None, 'gzip', 'bgzf', 'bz2', 'xz'])
 	def compression(self, request):
 		"""Compression method string."""
 		return request.param
@@ -93,6 +94,200 @@ class TestOpenCompressed:
 			assert isinstance(contents, str)
 			assert contents == text_data.decode('ascii')
 
+	@pytest.mark.parametrize('binary', [True, False])
+	def test_read_background(self, binary, text_data, text_file, compression):
+		"""Test reading with decompression in a background thread."""
+
+		mode = 'rb' if binary else 'rt'
+
+		with ioutil.open_compressed(compression, text_file, mode, background=True) as fobj:
+			contents = fobj.read()
+
+		assert contents == (text_data if binary else text_data.decode('ascii'))
+
+		with pytest.raises(ValueError):
+			ioutil.open_compressed(compression, text_file, 'wb', background=True)
+
+	def test_guess_compression(self, text_file, compression):
+		"""Test guessing compression type from magic bytes."""
+		with open(text_file, 'rb') as fobj:
+			assert ioutil.guess_compression(fobj) == compression
+
+	def test_decompress(self, text_data, text_file, compression):
+		"""Test decompressing data in memory."""
+		with open(text_file, 'rb') as fobj:
+			data = fobj.read()
+
+		assert ioutil.decompress(compression, data) == text_data
+		assert ioutil.decompress('auto', data) == text_data
+
+		with pytest.raises(ValueError):
+			ioutil.decompress('foo', data)
+
+
+class TestBgzf:
+	"""Test BgzfReader and BgzfWriter."""
+
+	@pytest.fixture(scope='class')
+	def data(self):
+		"""Data spanning multiple BGZF blocks."""
+		random = np.random.RandomState(0)
+		return random.randint(0, 4, size=200000, dtype='u1').tobytes()
+
+	@pytest.fixture()
+	def bgzf_file(self, data, tmp_path):
+		path = tmp_path / 'data.bgz'
+		with ioutil.open_compressed('bgzf', path, 'wb') as fobj:
+			fobj.write(data)
+		return path
+
+	def test_gzip_compatible(self, data, bgzf_file):
+		"""Test BGZF output is readable as a regular gzip file."""
+		import gzip
+
+		with gzip.open(bgzf_file, 'rb') as fobj:
+			assert fobj.read() == data
+
+	@pytest.mark.parametrize('nthreads', [1, 3])
+	@pytest.mark.parametrize('read_size', [1000, -1])
+	def test_read(self, data, bgzf_file, nthreads, read_size):
+		chunks = []
+
+		with ioutil.BgzfReader(open(bgzf_file, 'rb'), nthreads=nthreads, max_pending=2) as reader:
+			while True:
+				chunk = reader.read(read_size)
+				if not chunk:
+					break
+				chunks.append(chunk)
+
+		assert b''.join(chunks) == data
+
+	def test_nthreads(self, bgzf_file):
+		"""Test default and invalid number of threads."""
+		with ioutil.BgzfReader(open(bgzf_file, 'rb')) as reader:
+			assert reader.nthreads == ioutil.BGZF_DEFAULT_THREADS
+
+		with open(bgzf_file, 'rb') as fobj:
+			with pytest.raises(ValueError):
+				ioutil.BgzfReader(fobj, nthreads=0)
+
+	def test_concatenated(self, data, bgzf_file):
+		"""Test reading concatenated files, with an end-of-file marker block in the middle."""
+		with ioutil.open_compressed('bgzf', bgzf_file, 'ab') as fobj:
+			fobj.write(b'foo')
+
+		with ioutil.open_compressed('auto', bgzf_file, 'rb') as fobj:
+			assert fobj.read() == data + b'foo'
+
+	def test_invalid(self, bgzf_file, tmp_path):
+		"""Test errors for corrupt, truncated, or non-BGZF files."""
+		raw = bgzf_file.read_bytes()
+
+		corrupt = tmp_path / 'corrupt.bgz'
+		corrupt.write_bytes(raw[:100] + bytes([raw[100] ^ 0xff]) + raw[101:])
+		truncated = tmp_path / 'truncated.bgz'
+		truncated.write_bytes(raw[:len(raw) // 2])
+		plain = tmp_path / 'plain.gz'
+		with ioutil.open_compressed('gzip', plain, 'wb') as fobj:
+			fobj.write(b'foo')
+
+		for path, exc in [(corrupt, OSError), (truncated, EOFError), (plain, OSError)]:
+			with pytest.raises(exc):
+				with ioutil.open_compressed('bgzf', path, 'rb') as fobj:
+					fobj.read()
+
+
+class TestBackgroundReader:
+	"""Test the BackgroundReader class."""
+
+	@pytest.fixture()
+	def data(self):
+		random = np.random.RandomState(0)
+		return random.randint(0, 256, size=10000, dtype='u1').tobytes()
+
+	@pytest.mark.parametrize('block_size', [1, 7, 1000, 20000])
+	@pytest.mark.parametrize('read_size', [1, 13, 1000, -1])
+	def test_read(self, data, block_size, read_size):
+		"""Test reading in chunks of various sizes."""
+		source = BytesIO(data)
+		chunks = []
+
+		with ioutil.BackgroundReader(source, block_size=block_size, max_blocks=2) as reader:
+			while True:
+				chunk = reader.read(read_size)
+				if not chunk:
+					break
+				assert read_size < 0 or len(chunk) <= read_size
+				chunks.append(chunk)
+
+			assert reader.read() == b''
+
+		assert b''.join(chunks) == data
+		assert source.closed
+
+	def test_readinto(self, data):
+		"""Test reading through a BufferedReader, which uses readinto()."""
+		with BufferedReader(ioutil.BackgroundReader(BytesIO(data), block_size=100)) as reader:
+			assert reader.read(150) == data[:150]
+			assert reader.read() == data[150:]
+
+	def test_close_early(self, data):
+		"""Test closing before the end of the stream stops the background thread."""
+		source = BytesIO(data)
+		reader = ioutil.BackgroundReader(source, block_size=10, max_blocks=1)
+		assert reader.read(5) == data[:5]
+		reader.close()
+
+		assert source.closed
+		assert not reader._thread.is_alive()
+
+	def test_error(self, data):
+		"""Test errors raised while reading the source are propagated."""
+
+		class FailingStream:
+			def __init__(self):
+				self.nread = 0
+				self.closed = False
+
+			def read(self, size):
+				if self.nread >= 2:
+					raise IOError('read failed')
+				self.nread += 1
+				return data[:size]
+
+			def close(self):
+				self.closed = True
+
+		source = FailingStream()
+
+		with ioutil.BackgroundReader(source, block_size=10) as reader:
+			assert reader.read(20) == data[:10]
+			assert reader.read(20) == data[:10]
+			with pytest.raises(IOError, match='read failed'):
+				reader.read(20)
+
+		assert source.closed
+
+
+def test_mapped_file(tmp_path):
+	"""Test the MappedFile class."""
+	path = tmp_path / 'data'
+	path.write_bytes(b'foobar')
+
+	with ioutil.MappedFile(path) as mapped:
+		assert not mapped.closed
+		assert mapped.buffer.find(b'bar') == 3
+		view = memoryview(mapped.buffer)[3:]
+	assert mapped.closed
+
+	# Slice remains valid after closing
+	assert bytes(view) == b'bar'
+	view.release()
+
+	path.write_bytes(b'')
+	with ioutil.MappedFile(path) as mapped:
+		assert len(mapped.buffer) == 0
+
 
 class TestClosingIterator:
 	"""Test the ClosingIterator class."""
@@ -0,0 +1,51 @@
+"""Test gambit.util.pool."""
+
+import pytest
+
+from gambit.util.pool import WorkerPool, get_worker_pool, shutdown_worker_pool
+
+
+def test_worker_pool():
+	"""Test reusing and restarting executor of WorkerPool."""
+	with WorkerPool(max_workers=2) as pool:
+		assert pool.start_method in ('forkserver', 'spawn')
+		assert not pool.running
+
+		executor = pool.executor()
+		assert pool.running
+		assert executor.submit(pow, 2, 10).result() == 1024
+
+		# Same executor reused
+		assert pool.executor() is executor
+		assert pool.executor(2) is executor
+
+		# Replaced when number of workers changes
+		executor2 = pool.executor(1)
+		assert executor2 is not executor
+		assert executor2.submit(pow, 3, 2).result() == 9
+
+		pool.shutdown()
+		assert not pool.running
+
+		# Usable after shutdown
+		assert pool.executor().submit(pow, 2, 3).result() == 8
+
+	assert not pool.running
+
+	with pytest.raises(ValueError):
+		WorkerPool(start_method='fork')
+	with pytest.raises(ValueError):
+		WorkerPool(max_workers=0)
+
+
+def test_default_pool():
+	"""Test the module-level default pool."""
+	pool = get_worker_pool()
+	assert get_worker_pool() is pool
+
+	executor = pool.executor(1)
+	assert executor.submit(pow, 2, 4).result() == 16
+
+	shutdown_worker_pool()
+	assert not pool.running
+	assert get_worker_pool() is pool